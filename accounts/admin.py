@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
-from .models import User, VideoGeneration, ImageGeneration, Subscription, CreditPurchase, Payment
+from .models import User, VideoGeneration, ImageGeneration, Subscription, CreditPurchase, Payment, MediaBlob, PaymentWebhookEvent, GenerationLatencyRollup, RequestProfile, GenerationModelVersion, GenerationArchive
 from django.db.models import Sum, Count, Q
 from django.utils.html import format_html
 
@@ -33,12 +33,13 @@ class VideoGenerationAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'tool', 'status', 'credits_used', 'created_at']
     list_filter = ['status', 'tool', 'created_at']
     search_fields = ['user__email', 'prompt', 'fal_request_id']
-    readonly_fields = ['created_at', 'updated_at', 'credits_used']  # Credits are locked
+    readonly_fields = ['created_at', 'updated_at', 'model_id', 'credits_used', 'submitted_at', 'started_at', 'finished_at', 'overhead_ms']  # Credits are locked
     
     fieldsets = (
         ('User & Tool', {'fields': ('user', 'tool', 'model_id')}),
-        ('Content', {'fields': ('prompt', 'video_url')}),
+        ('Content', {'fields': ('prompt', 'video_url', 'media_path', 'thumbnail_path')}),
         ('Status', {'fields': ('status', 'credits_used', 'fal_request_id', 'error_message')}),
+        ('fal.ai timing', {'fields': ('submitted_at', 'started_at', 'finished_at', 'overhead_ms')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
     
@@ -47,17 +48,31 @@ class VideoGenerationAdmin(admin.ModelAdmin):
         return super().has_change_permission(request, obj)
 
 
+@admin.register(GenerationModelVersion)
+class GenerationModelVersionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'tool', 'model_id', 'created_at']
+    list_filter = ['kind', 'tool']
+    readonly_fields = ['kind', 'tool', 'model_id', 'created_at']  # Cached by every process; never edited
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ImageGeneration)
 class ImageGenerationAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'tool', 'status', 'credits_used', 'created_at']
     list_filter = ['status', 'tool', 'created_at']
     search_fields = ['user__email', 'prompt', 'fal_request_id']
-    readonly_fields = ['created_at', 'updated_at', 'credits_used']  # Credits are locked
+    readonly_fields = ['created_at', 'updated_at', 'model_id', 'credits_used', 'submitted_at', 'started_at', 'finished_at', 'overhead_ms']  # Credits are locked
     
     fieldsets = (
         ('User & Tool', {'fields': ('user', 'tool', 'model_id')}),
-        ('Content', {'fields': ('prompt', 'image_url')}),
+        ('Content', {'fields': ('prompt', 'image_url', 'media_path', 'thumbnail_path')}),
         ('Status', {'fields': ('status', 'credits_used', 'fal_request_id', 'error_message')}),
+        ('fal.ai timing', {'fields': ('submitted_at', 'started_at', 'finished_at', 'overhead_ms')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
     
@@ -182,3 +197,156 @@ class PaymentAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context)
 
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'sha256', 'size', 'content_type', 'ref_count', 'created_at', 'orphaned_at']
+    list_filter = ['content_type', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'path', 'size', 'content_type', 'ref_count', 'created_at', 'orphaned_at']
+
+
+@admin.register(GenerationLatencyRollup)
+class GenerationLatencyRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'kind', 'tool', 'completed', 'failed', 'queue_p50', 'queue_p95', 'inference_p50', 'inference_p95', 'overhead_p95']
+    list_filter = ['kind', 'tool', 'hour']
+    readonly_fields = ['kind', 'tool', 'hour', 'completed', 'failed', 'queue_ms', 'inference_ms', 'overhead_ms', 'total_ms', 'updated_at']
+    
+    def _percentile(self, histogram, p):
+        from .generation_timing import GenerationLatencyService
+        
+        value = GenerationLatencyService.percentile(histogram, p)
+        return f'{value / 1000:.1f}s' if value is not None else '-'
+    
+    @admin.display(description='Queue p50')
+    def queue_p50(self, obj):
+        return self._percentile(obj.queue_ms, 0.50)
+    
+    @admin.display(description='Queue p95')
+    def queue_p95(self, obj):
+        return self._percentile(obj.queue_ms, 0.95)
+    
+    @admin.display(description='Inference p50')
+    def inference_p50(self, obj):
+        return self._percentile(obj.inference_ms, 0.50)
+    
+    @admin.display(description='Inference p95')
+    def inference_p95(self, obj):
+        return self._percentile(obj.inference_ms, 0.95)
+    
+    @admin.display(description='Overhead p95')
+    def overhead_p95(self, obj):
+        return self._percentile(obj.overhead_ms, 0.95)
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(GenerationArchive)
+class GenerationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['month', 'kind', 'rows', 'size_bytes', 'file_name', 'created_at']
+    list_filter = ['kind']
+    readonly_fields = ['kind', 'month', 'file_name', 'rows', 'size_bytes', 'sha256', 'created_at']  # Written by archive_generations
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'mode', 'trigger', 'user', 'size_bytes', 'download']
+    list_filter = ['mode', 'trigger', 'view_name', 'created_at']
+    search_fields = ['path', 'view_name', 'user__email']
+    readonly_fields = ['method', 'path', 'view_name', 'status_code', 'duration_ms', 'mode', 'trigger', 'user', 'file_name', 'size_bytes', 'created_at', 'download', 'summary']
+    
+    def get_urls(self):
+        from django.urls import path
+        
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='accounts_requestprofile_download'),
+        ] + super().get_urls()
+    
+    def download_view(self, request, pk):
+        import os
+        from django.http import FileResponse, Http404
+        from .profiling import ProfileService
+        
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = self.get_object(request, pk)
+        if profile is None or not os.path.exists(ProfileService.path(profile)):
+            raise Http404('Profile file not found on this host')
+        return FileResponse(open(ProfileService.path(profile), 'rb'), as_attachment=True, filename=profile.file_name)
+    
+    @admin.display(description='File')
+    def download(self, obj):
+        from django.urls import reverse
+        
+        return format_html('<a href="{}">{}</a>', reverse('admin:accounts_requestprofile_download', args=[obj.pk]), obj.file_name.rsplit('.', 1)[-1])
+    
+    @admin.display(description='Top functions')
+    def summary(self, obj):
+        from .profiling import ProfileService
+        
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', ProfileService.summary(obj))
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def delete_queryset(self, request, queryset):
+        for profile in queryset:
+            self.delete_model(request, profile)
+    
+    def delete_model(self, request, obj):
+        import os
+        from .profiling import ProfileService
+        
+        try:
+            os.remove(ProfileService.path(obj))
+        except FileNotFoundError:
+            pass
+        super().delete_model(request, obj)
+
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'transaction_id', 'status', 'order_id', 'state', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['state', 'status', 'received_at']
+    search_fields = ['transaction_id', 'order_id']
+    readonly_fields = ['transaction_id', 'status', 'order_id', 'payload', 'attempts', 'last_error', 'received_at', 'processed_at']
+    actions = ['requeue']
+    
+    @admin.action(description='Requeue selected events')
+    def requeue(self, request, queryset):
+        from django.utils import timezone
+        
+        updated = queryset.exclude(state='done').update(state='pending', attempts=0, available_at=timezone.now())
+        self.message_user(request, f'{updated} webhook event(s) requeued')
+
+
+def slow_queries_view(request):
+    """Slow statements seen by this process (routed at admin/slow-queries/ in config/urls.py)"""
+    from django.core.exceptions import PermissionDenied
+    from django.shortcuts import redirect
+    from django.template.response import TemplateResponse
+    from .slow_queries import SlowQueryLog
+    
+    # Captured parameters can include personal data, so superusers only
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    if request.method == 'POST' and 'clear' in request.POST:
+        SlowQueryLog.clear()
+        return redirect(request.path)
+    
+    entries, fingerprints = SlowQueryLog.snapshot()
+    for row in fingerprints:
+        row['avg_ms'] = row['total_ms'] / row['count']
+    return TemplateResponse(request, 'admin/accounts/slow_queries.html', {
+        **admin.site.each_context(request),
+        'title': 'Slow queries',
+        'entries': entries,
+        'fingerprints': fingerprints[:50],
+        'threshold_ms': SlowQueryLog.THRESHOLD_MS,
+        'size': SlowQueryLog.SIZE,
+        'explain': SlowQueryLog.EXPLAIN,
+        'enabled': SlowQueryLog.ENABLED,
+    })
@@ -5,3 +5,8 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .slow_queries import install
+
+        install()
@@ -0,0 +1,37 @@
+"""
+System checks for the accounts app
+Run by `manage.py check` (and therefore runserver, migrate and CI) instead
+of at import time, so loading accounts.services stays cheap for every
+worker and management command.
+"""
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def check_locked_prices(app_configs, **kwargs):
+    """Tool prices in services.py must match the locked prices in constants.py"""
+    from .constants import validate_locked_prices
+    from .services import VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG
+
+    try:
+        validate_locked_prices(VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG)
+    except ValueError as e:
+        return [Error(
+            str(e),
+            hint='Update the credits in accounts/services.py or, if the price change is intended, accounts/constants.py.',
+            id='accounts.E001',
+        )]
+    return []
+
+
+@register(deploy=True)
+def check_metrics_token(app_configs, **kwargs):
+    """Without METRICS_TOKEN, /metrics refuses every scrape once DEBUG is off"""
+    if not settings.DEBUG and not getattr(settings, 'METRICS_TOKEN', ''):
+        return [Warning(
+            'METRICS_TOKEN is not set, so /metrics is disabled.',
+            hint='Set METRICS_TOKEN and configure the scraper to send it as a Bearer token.',
+            id='accounts.W001',
+        )]
+    return []
@@ -0,0 +1,137 @@
+"""
+Local E-point simulator for load and integration testing
+Extends the E-point stub with randomised behaviour so the production
+signing, HTTP client and webhook code run end to end, with
+EPOINT_TEST_MODE=False and EPOINT_API_URL pointing here:
+
+- response latency drawn from a log-normal distribution
+- a share of calls answered with 5xx, or held past the client's read timeout
+- every created transaction resolves after a delay to success/failed/returned
+  and a signed result callback is POSTed to the webhook URL, sometimes twice
+
+Start it with `python manage.py run_epoint_simulator`.
+"""
+import base64
+import heapq
+import json
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .epoint_stub import EPointStubServer, sign
+
+logger = logging.getLogger(__name__)
+
+
+class EPointSimulator(EPointStubServer):
+    def __init__(self, secret_key, host='127.0.0.1', port=0, callback_url=None,
+                 latency_ms=50.0, latency_sigma=0.5, error_rate=0.0, timeout_rate=0.0, timeout_seconds=60.0,
+                 success_rate=0.9, returned_rate=0.0, callback_delay=1.0, duplicate_rate=0.0,
+                 callback_workers=4, seed=None):
+        super().__init__(secret_key=secret_key, host=host, port=port, default_status='new')
+        self.callback_url = callback_url
+        self.latency_mu = math.log(max(latency_ms, 0.001) / 1000.0)  # Median latency in seconds
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.success_rate = success_rate
+        self.returned_rate = returned_rate
+        self.callback_delay = callback_delay
+        self.duplicate_rate = duplicate_rate
+        self.random = random.Random(seed)
+        self.counters.update({'callbacks_sent': 0, 'callbacks_failed': 0, 'faults': 0})
+
+        self._due = []  # Heap of (deliver_at, seq, transaction, order_id, status)
+        self._due_cond = threading.Condition()
+        self._seq = 0
+        self._session = requests.Session()
+        self._callback_pool = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix='epoint-sim-callback')
+        self._scheduler = threading.Thread(target=self._run_scheduler, name='epoint-sim-scheduler', daemon=True)
+
+    # Request behaviour
+
+    def _next_action(self):
+        scripted = super()._next_action()
+        if scripted != 'ok':
+            return scripted
+        with self._lock:
+            roll = self.random.random()
+            latency = self.random.lognormvariate(self.latency_mu, self.latency_sigma)
+        if roll < self.error_rate:
+            self._count('faults')
+            return self.random.choice(['500', '502', '503'])
+        if roll < self.error_rate + self.timeout_rate:
+            self._count('faults')
+            return f'delay:{self.timeout_seconds}'
+        return f'delay:{latency}'
+
+    def _final_status(self):
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.success_rate:
+            return 'success'
+        if roll < self.success_rate + self.returned_rate:
+            return 'returned'
+        return 'failed'
+
+    # Result callbacks
+
+    def on_created(self, transaction, data):
+        status = self._final_status()
+        with self._due_cond:
+            self._seq += 1
+            heapq.heappush(self._due, (time.monotonic() + self.callback_delay, self._seq, transaction, data.get('order_id'), status))
+            self._due_cond.notify()
+
+    def _run_scheduler(self):
+        while not self._stop.is_set():
+            with self._due_cond:
+                while not self._due and not self._stop.is_set():
+                    self._due_cond.wait(0.5)
+                if self._stop.is_set():
+                    return
+                deliver_at, _, transaction, order_id, status = self._due[0]
+                wait = deliver_at - time.monotonic()
+                if wait > 0:
+                    self._due_cond.wait(wait)
+                    continue
+                heapq.heappop(self._due)
+            self.transactions[transaction] = status
+            if self.callback_url:
+                self._callback_pool.submit(self._deliver, transaction, order_id, status)
+                with self._lock:
+                    duplicate = self.random.random() < self.duplicate_rate
+                if duplicate:
+                    self._callback_pool.submit(self._deliver, transaction, order_id, status)
+
+    def _deliver(self, transaction, order_id, status):
+        payload = {'order_id': order_id, 'status': status, 'transaction': transaction, 'code': '000' if status == 'success' else '100'}
+        data_encoded = base64.b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('utf-8')
+        try:
+            response = self._session.post(
+                self.callback_url,
+                data={'data': data_encoded, 'signature': sign(data_encoded, self.secret_key)},
+                timeout=(3.05, 15),
+            )
+            self._count('callbacks_sent' if response.status_code < 500 else 'callbacks_failed')
+        except requests.exceptions.RequestException as e:
+            self._count('callbacks_failed')
+            logger.warning("EPOINT SIMULATOR: callback for %s failed - %s", transaction, e)
+
+    def start(self):
+        super().start()
+        self._scheduler.start()
+        return self
+
+    def stop(self):
+        super().stop()
+        with self._due_cond:
+            self._due_cond.notify_all()
+        self._callback_pool.shutdown(wait=False)
+        self._session.close()
@@ -0,0 +1,145 @@
+"""
+Local stub of the E-point API
+A small threaded HTTP/1.1 server answering /request and /get-status the way
+epoint.az does, with scriptable faults so the pooled client's keep-alive,
+timeouts, retries and circuit breaker can be exercised without the network.
+
+    stub = EPointStubServer(secret_key='...')
+    stub.start()
+    stub.script(['503', '503', 'ok'])   # behaviour of the next three calls
+    ...
+    stub.stop()
+
+Fault keywords: 'ok', '<status code>', 'delay:<seconds>', 'reset' (close
+the socket without answering).
+"""
+import base64
+import hashlib
+import json
+import threading
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def sign(data_encoded, secret_key):
+    """E-point signature: base64(sha1(secret + data + secret))"""
+    digest = hashlib.sha1((secret_key + data_encoded + secret_key).encode('utf-8')).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def setup(self):
+        super().setup()
+        self.server.stub._count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        stub._count('requests')
+
+        action = stub._next_action()
+        if action == 'reset':
+            self.close_connection = True
+            self.connection.close()
+            return
+        if action.startswith('delay:'):
+            stub._stop.wait(float(action.split(':', 1)[1]))
+        elif action != 'ok':
+            self._reply(int(action), {'status': 'error', 'message': f'stub fault {action}'})
+            return
+
+        data_encoded = (form.get('data') or [''])[0]
+        signature = (form.get('signature') or [''])[0]
+        if signature != sign(data_encoded, stub.secret_key):
+            self._reply(200, {'status': 'error', 'message': 'Signature is invalid'})
+            return
+        data = json.loads(base64.b64decode(data_encoded))
+
+        if self.path.endswith('/request'):
+            transaction = f'te{uuid.uuid4().hex[:12]}'
+            stub.transactions[transaction] = stub.default_status
+            stub.on_created(transaction, data)
+            self._reply(200, {
+                'status': 'success',
+                'transaction': transaction,
+                'redirect_url': f'http://{self.server.server_address[0]}:{self.server.server_address[1]}/checkout/{transaction}',
+            })
+        elif self.path.endswith('/get-status'):
+            status = stub.transactions.get(data.get('transaction_id'), 'error')
+            self._reply(200, {'status': status, 'transaction': data.get('transaction_id')})
+        else:
+            self._reply(404, {'status': 'error', 'message': 'not found'})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-reply is expected when testing timeouts
+        pass
+
+
+class EPointStubServer:
+    def __init__(self, secret_key='stub-secret', host='127.0.0.1', port=0, default_status='success'):
+        self.secret_key = secret_key
+        self.default_status = default_status
+        self.transactions = {}
+        self.counters = {'connections': 0, 'requests': 0}
+        self._actions = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _next_action(self):
+        with self._lock:
+            return self._actions.popleft() if self._actions else 'ok'
+
+    def on_created(self, transaction, data):
+        """Hook called after /request registers a transaction"""
+
+    def script(self, actions):
+        """Queue behaviours for the next calls; afterwards calls succeed"""
+        with self._lock:
+            self._actions.extend(actions)
+
+    def reset_counters(self):
+        with self._lock:
+            self.counters = dict.fromkeys(self.counters, 0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='epoint-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
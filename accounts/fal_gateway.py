@@ -0,0 +1,72 @@
+"""
+Single entry point for calls to fal.ai
+Generation services submit through here rather than using fal_client
+directly, so the queue host can be switched to the local simulator
+(settings.FAL_SIMULATOR_URL, see accounts.fal_simulator) in one place.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from .server_timing import track
+
+logger = logging.getLogger(__name__)
+
+_configured = False
+_configure_lock = threading.Lock()
+_DEFAULT_QUEUE_URL_FORMAT = None  # fal_client's own queue host, kept so reset() can restore it
+
+
+def get_fal_client():
+    """Return the fal_client module, pointed at the simulator when one is configured"""
+    global _configured, _DEFAULT_QUEUE_URL_FORMAT
+    import fal_client
+
+    if not _configured:
+        with _configure_lock:
+            if not _configured:
+                simulator_url = getattr(settings, 'FAL_SIMULATOR_URL', '')
+                if simulator_url:
+                    import fal_client.client
+                    if _DEFAULT_QUEUE_URL_FORMAT is None:
+                        _DEFAULT_QUEUE_URL_FORMAT = fal_client.client.QUEUE_URL_FORMAT
+                    fal_client.client.QUEUE_URL_FORMAT = simulator_url.rstrip('/') + '/'
+                    logger.warning(f"fal.ai calls go to the local simulator at {simulator_url}")
+                _configured = True
+    return fal_client
+
+
+def submit(application, arguments, **kwargs):
+    """Queue a request with fal.ai and return its request handle"""
+    with track('fal'):
+        return get_fal_client().submit(application, arguments=arguments, **kwargs)
+
+
+def wait(handle):
+    """
+    Wait for a queued request and return (result, started_at).
+    started_at is when a status poll first saw the request leave the queue,
+    so it is accurate to the poll interval (0.1s by default).
+    """
+    fal_client = get_fal_client()
+    started_at = None
+    with track('fal'):
+        if hasattr(handle, 'iter_events'):  # Test doubles only implement get()
+            for status in handle.iter_events(with_logs=False):
+                if not isinstance(status, fal_client.Queued):
+                    started_at = timezone.now()
+                    break
+        result = handle.get()
+    return result, started_at or timezone.now()
+
+
+def reset():
+    """Forget the queue host so the next call re-reads FAL_SIMULATOR_URL (for tooling that changes it at runtime)"""
+    global _configured
+    with _configure_lock:
+        if _DEFAULT_QUEUE_URL_FORMAT is not None:
+            import fal_client.client
+            fal_client.client.QUEUE_URL_FORMAT = _DEFAULT_QUEUE_URL_FORMAT
+        _configured = False
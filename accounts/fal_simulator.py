@@ -0,0 +1,365 @@
+"""
+Local fal.ai queue simulator
+Speaks the subset of the fal queue API that fal_client uses - submit,
+status, result, cancel and the fal_webhook callback - for every model in
+TOOL_CONFIG, so generation can be load-tested without paying fal.
+
+Requests move through IN_QUEUE -> IN_PROGRESS -> COMPLETED on a timeline
+drawn from the model's latency profile; a share of them fail. Result
+payloads are deterministic for a given (model, prompt, seed) and use the
+`video` / `images` / `image` shapes the generation services parse; the
+files they point to are served by the simulator itself.
+
+Start it with `python manage.py run_fal_simulator` and set
+FAL_SIMULATOR_URL (see accounts.fal_gateway).
+"""
+import hashlib
+import heapq
+import json
+import logging
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Latency in milliseconds (log-normal medians) and failure share per kind of model
+DEFAULT_PROFILES = {
+    'video': {'queue_ms': 300, 'run_ms': 4000, 'sigma': 0.4, 'error_rate': 0.02},
+    'image': {'queue_ms': 100, 'run_ms': 1200, 'sigma': 0.3, 'error_rate': 0.01},
+}
+
+
+def _tiny_png(rgb):
+    """A valid 8x8 single-colour PNG, built with zlib only"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    raw = b''.join(b'\x00' + bytes(rgb) * 8 for _ in range(8))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 8, 8, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def build_model_registry(image_shape='alternate'):
+    """
+    model id -> {'tool', 'kind', 'shape'} for every model in TOOL_CONFIG.
+
+    image_shape: 'images', 'image', or 'alternate' (fixed per model, so
+    both result shapes the image service understands get exercised)
+    """
+    from .services import VIDEO_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG
+
+    registry = {}
+    for tools, kind in ((VIDEO_TOOL_CONFIG, 'video'), (IMAGE_TO_VIDEO_TOOL_CONFIG, 'video'), (IMAGE_TOOL_CONFIG, 'image')):
+        for tool, config in tools.items():
+            if kind == 'video':
+                shape = 'video'
+            elif image_shape == 'alternate':
+                shape = ('images', 'image')[zlib.crc32(config['model'].encode('utf-8')) % 2]
+            else:
+                shape = image_shape
+            registry[config['model']] = {'tool': tool, 'kind': kind, 'shape': shape}
+    return registry
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload=None, body=None, content_type='application/json'):
+        if body is None:
+            body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        return parts.path.strip('/'), parse_qs(parts.query)
+
+    def do_GET(self):
+        sim = self.server.simulator
+        path, query = self._route()
+        if path.startswith('files/'):
+            content = sim.files.get(path[len('files/'):])
+            if content is None:
+                return self._reply(404, {'detail': 'File not found'})
+            body, content_type = content
+            return self._reply(200, body=body, content_type=content_type)
+
+        request_id, action = sim.parse_request_path(path)
+        job = sim.jobs.get(request_id)
+        if job is None:
+            return self._reply(404, {'detail': 'Request not found'})
+        if action == 'status':
+            return self._reply(200, sim.status_payload(job))
+        if action == '':
+            return self._reply(*sim.result_payload(job))
+        return self._reply(404, {'detail': 'Not found'})
+
+    def do_PUT(self):
+        sim = self.server.simulator
+        path, _ = self._route()
+        request_id, action = sim.parse_request_path(path)
+        job = sim.jobs.get(request_id)
+        if job is None or action != 'cancel':
+            return self._reply(404, {'detail': 'Request not found'})
+        job['cancelled'] = True
+        return self._reply(202, {'status': 'CANCELLATION_REQUESTED'})
+
+    def do_POST(self):
+        sim = self.server.simulator
+        path, query = self._route()
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            arguments = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(422, {'detail': 'Invalid JSON body'})
+
+        model_id = sim.match_model(path)
+        if model_id is None:
+            return self._reply(404, {'detail': f'Application not found: {path}'})
+        status, payload = sim.submit(model_id, arguments, (query.get('fal_webhook') or [None])[0])
+        return self._reply(status, payload)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class FalSimulator:
+    def __init__(self, host='127.0.0.1', port=0, profiles=None, time_scale=1.0, error_rate=None,
+                 submit_error_rate=0.0, image_shape='alternate', seed=None, webhook_workers=4,
+                 retention_seconds=600):
+        self.registry = build_model_registry(image_shape)
+        self.profiles = {kind: dict(profile) for kind, profile in DEFAULT_PROFILES.items()}
+        self.model_profiles = {}
+        for key, override in (profiles or {}).items():
+            if key in self.profiles:
+                self.profiles[key].update(override)
+            else:
+                self.model_profiles[key] = override
+        self.time_scale = time_scale
+        self.error_rate = error_rate  # Overrides every profile when set
+        self.submit_error_rate = submit_error_rate
+        self.retention_seconds = retention_seconds  # Finished jobs are forgotten after this
+        self.random = random.Random(seed)
+        self.jobs = {}
+        self.files = {}
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'webhooks_sent': 0, 'webhooks_failed': 0}
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._due = []
+        self._due_cond = threading.Condition()
+        self._session = requests.Session()
+        self._webhook_pool = ThreadPoolExecutor(max_workers=webhook_workers, thread_name_prefix='fal-sim-webhook')
+        self._scheduler = threading.Thread(target=self._run_scheduler, name='fal-sim-scheduler', daemon=True)
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.simulator = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    # Routing
+
+    def match_model(self, path):
+        """Longest registered model id that prefixes the path (submit may add a subpath)"""
+        candidates = [m for m in self.registry if path == m or path.startswith(m + '/')]
+        return max(candidates, key=len) if candidates else None
+
+    def parse_request_path(self, path):
+        """'<model>/requests/<id>[/status|/cancel]' -> (id, action)"""
+        if '/requests/' not in path:
+            return None, None
+        tail = path.rsplit('/requests/', 1)[1].split('/')
+        return tail[0], tail[1] if len(tail) > 1 else ''
+
+    # Job lifecycle
+
+    def profile_for(self, model_id):
+        entry = self.registry[model_id]
+        profile = dict(self.profiles[entry['kind']])
+        profile.update(self.model_profiles.get(entry['tool'], {}))
+        profile.update(self.model_profiles.get(model_id, {}))
+        if self.error_rate is not None:
+            profile['error_rate'] = self.error_rate
+        return profile
+
+    def _draw(self, median_ms, sigma):
+        with self._lock:
+            value = self.random.lognormvariate(math.log(max(median_ms, 0.001) / 1000.0), sigma)
+        return value * self.time_scale
+
+    def submit(self, model_id, arguments, webhook_url=None):
+        with self._lock:
+            rejected = self.random.random() < self.submit_error_rate
+        if rejected:
+            self._count('rejected')
+            return 503, {'detail': 'Simulated ingress error'}
+
+        profile = self.profile_for(model_id)
+        now = time.monotonic()
+        queue_s = self._draw(profile['queue_ms'], profile['sigma'])
+        run_s = self._draw(profile['run_ms'], profile['sigma'])
+        with self._lock:
+            fails = self.random.random() < profile['error_rate']
+
+        request_id = str(uuid.uuid4())
+        base = f'{self.url}/{model_id}/requests/{request_id}'
+        job = {
+            'request_id': request_id,
+            'model': model_id,
+            'arguments': arguments,
+            'started_at': now + queue_s,
+            'completed_at': now + queue_s + run_s,
+            'fails': fails,
+            'cancelled': False,
+            'webhook_url': webhook_url,
+        }
+        self.jobs[request_id] = job
+        self._count('submitted')
+        with self._due_cond:
+            heapq.heappush(self._due, (job['completed_at'], request_id, 'complete'))
+            self._due_cond.notify()
+        return 200, {
+            'request_id': request_id,
+            'response_url': base,
+            'status_url': f'{base}/status',
+            'cancel_url': f'{base}/cancel',
+            'queue_position': 0,
+        }
+
+    def _state(self, job):
+        now = time.monotonic()
+        if job['cancelled'] or now >= job['completed_at']:
+            return 'COMPLETED'
+        if now >= job['started_at']:
+            return 'IN_PROGRESS'
+        return 'IN_QUEUE'
+
+    def status_payload(self, job):
+        state = self._state(job)
+        payload = {'status': state, 'request_id': job['request_id'], 'logs': []}
+        if state == 'IN_QUEUE':
+            payload['queue_position'] = 0
+        elif state == 'COMPLETED':
+            payload['metrics'] = {'inference_time': round(job['completed_at'] - job['started_at'], 3)}
+            if job['fails'] or job['cancelled']:
+                payload['error'] = 'Simulated generation failure' if job['fails'] else 'Request cancelled'
+                payload['error_type'] = 'simulated_error'
+        return payload
+
+    def result_payload(self, job):
+        """(http status, body) of the result endpoint"""
+        if self._state(job) != 'COMPLETED':
+            return 400, {'detail': 'Request is still in progress'}
+        if job['fails'] or job['cancelled']:
+            return 500, {'detail': 'Simulated generation failure', 'error_type': 'simulated_error'}
+        return 200, self.build_result(job['model'], job['arguments'])
+
+    def build_result(self, model_id, arguments):
+        """Deterministic payload for (model, prompt, seed), in the model's result shape"""
+        seed = arguments.get('seed')
+        if seed is None:
+            seed = zlib.crc32(str(arguments.get('prompt', '')).encode('utf-8'))
+        digest = hashlib.sha256(f"{model_id}|{arguments.get('prompt', '')}|{seed}".encode('utf-8')).hexdigest()
+        shape = self.registry[model_id]['shape']
+
+        if shape == 'video':
+            name = f'{digest[:32]}.mp4'
+            # Placeholder bytes: enough for mirroring/dedupe, not a playable video
+            self.files.setdefault(name, (b'\x00\x00\x00\x18ftypmp42' + bytes.fromhex(digest) * 64, 'video/mp4'))
+            return {'video': {'url': f'{self.url}/files/{name}', 'content_type': 'video/mp4',
+                              'file_name': name, 'file_size': len(self.files[name][0])}, 'seed': seed}
+
+        name = f'{digest[:32]}.png'
+        self.files.setdefault(name, (_tiny_png(bytes.fromhex(digest[:6])), 'image/png'))
+        image = {'url': f'{self.url}/files/{name}', 'width': 8, 'height': 8, 'content_type': 'image/png'}
+        if shape == 'image':
+            return {'image': image, 'seed': seed}
+        return {'images': [image], 'seed': seed, 'has_nsfw_concepts': [False], 'prompt': arguments.get('prompt', '')}
+
+    # Webhooks
+
+    def _run_scheduler(self):
+        while not self._stop.is_set():
+            with self._due_cond:
+                while not self._due and not self._stop.is_set():
+                    self._due_cond.wait(0.5)
+                if self._stop.is_set():
+                    return
+                due_at, request_id, event = self._due[0]
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self._due_cond.wait(wait)
+                    continue
+                heapq.heappop(self._due)
+                if event == 'complete':
+                    heapq.heappush(self._due, (due_at + self.retention_seconds, request_id, 'expire'))
+            if event == 'expire':
+                self.jobs.pop(request_id, None)
+                continue
+            job = self.jobs.get(request_id)
+            if job is None:
+                continue
+            self._count('failed' if job['fails'] else 'completed')
+            if job['webhook_url']:
+                self._webhook_pool.submit(self._deliver, job)
+
+    def _deliver(self, job):
+        status, result = self.result_payload(job)
+        body = {
+            'request_id': job['request_id'],
+            'gateway_request_id': job['request_id'],
+            'status': 'OK' if status == 200 else 'ERROR',
+            'payload': result if status == 200 else None,
+        }
+        if status != 200:
+            body['error'] = result.get('detail')
+        try:
+            response = self._session.post(job['webhook_url'], json=body, timeout=(3.05, 15))
+            self._count('webhooks_sent' if response.status_code < 500 else 'webhooks_failed')
+        except requests.exceptions.RequestException as e:
+            self._count('webhooks_failed')
+            logger.warning("FAL SIMULATOR: webhook for %s failed - %s", job['request_id'], e)
+
+    # Lifecycle
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fal-sim', daemon=True)
+        self._thread.start()
+        self._scheduler.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._due_cond:
+            self._due_cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._webhook_pool.shutdown(wait=False)
+        self._session.close()
@@ -0,0 +1,56 @@
+"""
+Custom model fields
+"""
+from django.core import exceptions
+from django.db import models
+from django.utils.functional import Promise, cached_property
+
+
+class CodedChoiceField(models.PositiveSmallIntegerField):
+    """
+    A choice field stored as a small integer but handled as its string value
+    everywhere in Python: model attributes, filters (status='completed',
+    status__in=[...]), values(), update(), admin filters and serializers.
+
+    `codes` maps each value to its number in the database. Codes are
+    permanent: add new values with new numbers, never renumber or reuse one.
+    """
+
+    def __init__(self, *args, codes=None, **kwargs):
+        self.codes = dict(codes or {})
+        self.values_by_code = {code: value for value, code in self.codes.items()}
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['codes'] = self.codes
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # Values are strings in Python; the integer range checks only apply to the stored code
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.values_by_code.get(value, value)
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        if isinstance(value, int) and value in self.values_by_code:
+            return self.values_by_code[value]
+        raise exceptions.ValidationError(
+            self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+        )
+
+    def get_prep_value(self, value):
+        if isinstance(value, Promise):
+            value = str(value)
+        if value is None:
+            return value
+        try:
+            return self.codes[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"{value!r} is not a valid value for {self.model.__name__}.{self.name}") from None
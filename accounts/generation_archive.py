@@ -0,0 +1,503 @@
+"""
+Monthly partitions and cold archival of generations
+On PostgreSQL the video and image generation tables are range-partitioned
+by created_at, one partition per month plus a DEFAULT partition (migration
+0027). `archive_generations` keeps partitions created a few months ahead,
+moving rows that a missed run left in DEFAULT into their own month, and
+moves months older than GENERATION_ARCHIVE_AFTER_MONTHS out of the
+database. Each month is exported to a gzipped JSONL file in
+GENERATION_ARCHIVE_DIR, then its partition is detached and dropped. On
+other databases (SQLite in development) the month's rows are deleted in
+chunks instead.
+
+Archived generations keep their media: their MediaBlob references move to
+GenerationArchiveBlob, and are released when the user's account is deleted
+(which also rewrites the files without the user's rows) or when the archive
+expires after GENERATION_ARCHIVE_RETENTION_MONTHS. Their credit holds are
+unlinked, not deleted. List views page through live rows and then the
+user's archived rows. Detail views fall back to the archive, so old
+history stays visible.
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()  # Full precision, unlike DjangoJSONEncoder
+    if isinstance(value, (date, Decimal)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GenerationArchiveService:
+    """Partition upkeep, archiving and read-through for the generation tables"""
+
+    # Configuration from Django settings
+    DIRECTORY = getattr(settings, 'GENERATION_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+    AFTER_MONTHS = getattr(settings, 'GENERATION_ARCHIVE_AFTER_MONTHS', 12)
+    MONTHS_AHEAD = getattr(settings, 'GENERATION_PARTITION_MONTHS_AHEAD', 3)
+    RETENTION_MONTHS = getattr(settings, 'GENERATION_ARCHIVE_RETENTION_MONTHS', 0)  # 0 keeps archives forever
+    CHUNK_SIZE = 2000
+
+    @staticmethod
+    def models():
+        from .models import VideoGeneration, ImageGeneration
+        return {'video': VideoGeneration, 'image': ImageGeneration}
+
+    @staticmethod
+    def partitioned():
+        return connection.vendor == 'postgresql'
+
+    # Partitions (PostgreSQL) ------------------------------------------------
+
+    @staticmethod
+    def partition_name(table, month):
+        return f'{table}_p{month:%Y%m}'
+
+    @staticmethod
+    def partitions(table):
+        """{month: partition name} for the monthly partitions of table (the DEFAULT partition is left out)"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = %s",
+                [table],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        prefix = f'{table}_p'
+        return {
+            date(int(name[-6:-2]), int(name[-2:]), 1): name
+            for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()
+        }
+
+    @staticmethod
+    def default_months(table):
+        """Months that have rows in table's DEFAULT partition (their own partition was missing when they arrived)"""
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') FROM {quote(table + '_default')}"
+            )
+            return {row[0].date() for row in cursor.fetchall()}
+
+    @staticmethod
+    def create_partition(table, month, from_default=False):
+        """
+        Create the partition for month. With from_default, the month's rows are
+        moved out of the DEFAULT partition first: PostgreSQL refuses to create a
+        partition while DEFAULT holds rows that belong in it.
+        """
+        quote = connection.ops.quote_name
+        name = GenerationArchiveService.partition_name(table, month)
+        bounds = f"FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not from_default:
+                cursor.execute(f'CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES {bounds}')
+                return
+            default = quote(table + '_default')
+            start, end = GenerationArchiveService.month_range(month)
+            cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                [start, end],
+            )
+            logger.warning("Moved %s rows of %s out of %s", cursor.rowcount, month, default)
+            cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES {bounds}')
+
+    @staticmethod
+    def ensure_partitions(months_ahead=None):
+        """
+        Create monthly partitions from the current month through months_ahead,
+        and for any earlier month whose rows ended up in DEFAULT (a missed run).
+        Returns the names created.
+        """
+        from .models import GenerationArchive
+
+        if not GenerationArchiveService.partitioned():
+            return []
+        months_ahead = GenerationArchiveService.MONTHS_AHEAD if months_ahead is None else months_ahead
+        current = _month_start(timezone.now())
+        created = []
+        for kind, model in GenerationArchiveService.models().items():
+            table = model._meta.db_table
+            existing = GenerationArchiveService.partitions(table)
+            stranded = GenerationArchiveService.default_months(table)
+            archived = set(GenerationArchive.objects.filter(kind=kind).values_list('month', flat=True))
+            for month in sorted(stranded & archived):
+                # A new partition would be archived again and replace the month's file
+                logger.error("%s DEFAULT partition holds rows of archived month %s; left in place", table, month)
+            wanted = {_add_months(current, offset) for offset in range(months_ahead + 1)} | (stranded - archived)
+            for month in sorted(wanted - set(existing)):
+                GenerationArchiveService.create_partition(table, month, from_default=month in stranded)
+                created.append(GenerationArchiveService.partition_name(table, month))
+        return created
+
+    # Archiving --------------------------------------------------------------
+
+    @staticmethod
+    def archivable_months(kind, months=None):
+        """Months older than the retention window that still have rows in the database, oldest first"""
+        model = GenerationArchiveService.models()[kind]
+        months = GenerationArchiveService.AFTER_MONTHS if months is None else months
+        cutoff = _add_months(_month_start(timezone.now()), -months)
+        if GenerationArchiveService.partitioned():
+            return sorted(
+                month for month, name in GenerationArchiveService.partitions(model._meta.db_table).items()
+                if month < cutoff
+            )
+        cutoff_at, _ = GenerationArchiveService.month_range(cutoff)
+        months = model.objects.filter(created_at__lt=cutoff_at).datetimes('created_at', 'month', tzinfo=dt_timezone.utc)
+        return [value.date() for value in months]
+
+    @staticmethod
+    def month_range(month):
+        start = datetime.combine(month, datetime.min.time(), tzinfo=dt_timezone.utc)
+        return start, datetime.combine(_add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc)
+
+    @staticmethod
+    def export(kind, month):
+        """
+        Write the month's generations to a gzipped JSONL file, one gzip member
+        per user (each newest first), so one user's rows can be read without
+        decompressing the rest. Returns (file name, rows, bytes, sha256,
+        {user_id: segment}), a segment being the offset, length, rows and id
+        range of the user's member, and {blob_id: references} of its media.
+        """
+        from .models import MediaBlob
+
+        model = GenerationArchiveService.models()[kind]
+        start, end = GenerationArchiveService.month_range(month)
+        fields = [field.attname for field in model._meta.concrete_fields]
+        blob_fields = [field.attname for field in model._meta.concrete_fields if field.related_model is MediaBlob]
+        os.makedirs(GenerationArchiveService.DIRECTORY, exist_ok=True)
+        file_name = f'{kind}-{month:%Y-%m}.jsonl.gz'
+        path = os.path.join(GenerationArchiveService.DIRECTORY, file_name)
+        temp_path = f'{path}.part'
+
+        rows, users = 0, {}
+        queryset = model.objects.filter(created_at__gte=start, created_at__lt=end).order_by('user_id', '-created_at', '-id')
+        with open(temp_path, 'wb') as f:
+            member, segment = None, None
+            for row in queryset.values(*fields).iterator(chunk_size=GenerationArchiveService.CHUNK_SIZE):
+                if segment is None or row['user_id'] != segment['user_id']:
+                    if member is not None:
+                        member.close()  # Ends the gzip member; f stays open
+                        segment['length'] = f.tell() - segment['offset']
+                    segment = users[row['user_id']] = {
+                        'user_id': row['user_id'], 'offset': f.tell(), 'rows': 0, 'first_id': row['id'], 'last_id': row['id'],
+                        'blobs': {},
+                    }
+                    member = gzip.GzipFile(fileobj=f, mode='wb', mtime=0)
+                member.write((json.dumps(row, default=_encode, separators=(',', ':')) + '\n').encode())
+                rows += 1
+                segment['rows'] += 1
+                segment['first_id'] = min(segment['first_id'], row['id'])
+                segment['last_id'] = max(segment['last_id'], row['id'])
+                for field in blob_fields:
+                    if row[field]:
+                        segment['blobs'][row[field]] = segment['blobs'].get(row[field], 0) + 1
+            if member is not None:
+                member.close()
+                segment['length'] = f.tell() - segment['offset']
+
+        sha256 = _sha256(temp_path)
+        os.replace(temp_path, path)
+        return file_name, rows, os.path.getsize(path), sha256, users
+
+    @staticmethod
+    def archive_month(kind, month):
+        """Export one month, then remove it from the database; returns the GenerationArchive row"""
+        from .models import CreditHold, GenerationArchive, GenerationArchiveBlob, GenerationArchiveUser
+
+        model = GenerationArchiveService.models()[kind]
+        table = model._meta.db_table
+        start, end = GenerationArchiveService.month_range(month)
+        quote = connection.ops.quote_name
+
+        file_name, rows, size, sha256, users = GenerationArchiveService.export(kind, month)
+        hold_field = 'video_generation' if kind == 'video' else 'image_generation'
+        with transaction.atomic():
+            archive, _ = GenerationArchive.objects.update_or_create(
+                kind=kind, month=month,
+                defaults={'file_name': file_name, 'rows': rows, 'size_bytes': size, 'sha256': sha256},
+            )
+            replaced = GenerationArchiveUser.objects.filter(archive=archive)
+            GenerationArchiveService._release(replaced)
+            replaced.delete()
+            blobs = {user_id: segment.pop('blobs') for user_id, segment in users.items()}
+            GenerationArchiveUser.objects.bulk_create(
+                [GenerationArchiveUser(archive=archive, **segment) for segment in users.values()],
+                batch_size=GenerationArchiveService.CHUNK_SIZE,
+            )
+            # The rows leave the database without releasing their media: the archive holds those references now
+            segment_ids = dict(GenerationArchiveUser.objects.filter(archive=archive).values_list('user_id', 'id'))
+            GenerationArchiveBlob.objects.bulk_create(
+                [
+                    GenerationArchiveBlob(segment_id=segment_ids[user_id], blob_id=blob_id, refs=refs)
+                    for user_id, counts in blobs.items() for blob_id, refs in counts.items()
+                ],
+                batch_size=GenerationArchiveService.CHUNK_SIZE,
+            )
+            # Settled holds stay for accounting, without the link to a row that is leaving
+            CreditHold.objects.filter(**{
+                f'{hold_field}__created_at__gte': start, f'{hold_field}__created_at__lt': end,
+            }).update(**{hold_field: None})
+
+            if GenerationArchiveService.partitioned():
+                name = GenerationArchiveService.partition_name(table, month)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+                return archive
+
+        # No partitions: delete the month in id chunks. Raw SQL on purpose: a model delete
+        # would release the media the archived rows still point at (signals.release_generation_media)
+        ids = list(model.objects.filter(created_at__gte=start, created_at__lt=end).values_list('id', flat=True))
+        for index in range(0, len(ids), GenerationArchiveService.CHUNK_SIZE):
+            chunk = ids[index:index + GenerationArchiveService.CHUNK_SIZE]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {quote(table)} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk,
+                )
+        return archive
+
+    # Deleted accounts and expiry -----------------------------------------------
+
+    @staticmethod
+    def _release(segments):
+        """Release the media references held by a queryset of GenerationArchiveUser rows"""
+        from .media_service import MediaBlobService
+        from .models import GenerationArchiveBlob
+
+        counts = {}
+        for blob_id, refs in GenerationArchiveBlob.objects.filter(segment__in=segments).values_list('blob_id', 'refs'):
+            counts[blob_id] = counts.get(blob_id, 0) + refs
+        blob_ids = list(counts)
+        for index in range(0, len(blob_ids), GenerationArchiveService.CHUNK_SIZE):
+            chunk = blob_ids[index:index + GenerationArchiveService.CHUNK_SIZE]
+            MediaBlobService.release_many({blob_id: counts[blob_id] for blob_id in chunk})
+
+    @staticmethod
+    def forget_user(user):
+        """
+        Account deletion (signals.forget_archived_generations): release the
+        media the user's archived generations hold and drop their segments.
+        Once the deletion commits, the files are rewritten without them.
+        """
+        from .models import GenerationArchiveUser
+
+        segments = GenerationArchiveUser.objects.filter(user=user)
+        archive_ids = list(segments.values_list('archive_id', flat=True))
+        if not archive_ids:
+            return
+        GenerationArchiveService._release(segments)
+        segments.delete()
+        # A failed rewrite is retried by `archive_generations` (uncompacted())
+        transaction.on_commit(
+            lambda: [GenerationArchiveService.compact(archive_id) for archive_id in archive_ids], robust=True,
+        )
+
+    @staticmethod
+    def uncompacted():
+        """Ids of archives whose file still holds rows of users no longer in it"""
+        from .models import GenerationArchive
+
+        return list(
+            GenerationArchive.objects.annotate(kept=Coalesce(Sum('users__rows'), 0))
+            .exclude(rows=F('kept')).values_list('id', flat=True)
+        )
+
+    @staticmethod
+    def compact(archive_id):
+        """
+        Rewrite an archive file with only the members its segments still
+        point at, under a new name. Returns whether anything was rewritten.
+        """
+        from .models import GenerationArchive, GenerationArchiveUser
+
+        directory = GenerationArchiveService.DIRECTORY
+        with transaction.atomic():
+            # The row lock serialises compactions of one archive
+            archive = GenerationArchive.objects.select_for_update().filter(pk=archive_id).first()
+            if archive is None:
+                return False
+            segments = list(archive.users.order_by('offset'))
+            rows = sum(segment.rows for segment in segments)
+            if rows == archive.rows:
+                return False
+
+            old_path = os.path.join(directory, archive.file_name)
+            temp_path = f'{old_path}.part'
+            with open(old_path, 'rb') as source, open(temp_path, 'wb') as target:
+                for segment in segments:
+                    source.seek(segment.offset)
+                    data = source.read(segment.length)
+                    segment.offset = target.tell()
+                    target.write(data)
+            sha256 = _sha256(temp_path)
+            # A new name, so a reader holding the old name and offsets still finds its file
+            file_name = f'{archive.kind}-{archive.month:%Y-%m}-{sha256[:12]}.jsonl.gz'
+            os.replace(temp_path, os.path.join(directory, file_name))
+
+            GenerationArchiveUser.objects.bulk_update(segments, ['offset'], batch_size=GenerationArchiveService.CHUNK_SIZE)
+            archive.file_name, archive.rows, archive.sha256 = file_name, rows, sha256
+            archive.size_bytes = os.path.getsize(os.path.join(directory, file_name))
+            archive.save(update_fields=['file_name', 'rows', 'size_bytes', 'sha256'])
+            transaction.on_commit(lambda: _remove(old_path))
+        logger.info("Compacted generation archive %s to %s rows", file_name, rows)
+        return True
+
+    @staticmethod
+    def expired_archives(months=None):
+        """Archives older than GENERATION_ARCHIVE_RETENTION_MONTHS (0 keeps them forever), oldest first"""
+        from .models import GenerationArchive
+
+        months = GenerationArchiveService.RETENTION_MONTHS if months is None else months
+        if not months:
+            return GenerationArchive.objects.none()
+        cutoff = _add_months(_month_start(timezone.now()), -months)
+        return GenerationArchive.objects.filter(month__lt=cutoff).order_by('month', 'kind')
+
+    @staticmethod
+    def expire(archive):
+        """Delete an archive and its file, releasing the media its generations held"""
+        path = os.path.join(GenerationArchiveService.DIRECTORY, archive.file_name)
+        with transaction.atomic():
+            GenerationArchiveService._release(archive.users.all())
+            archive.delete()
+            transaction.on_commit(lambda: _remove(path))
+
+    # Read-through -------------------------------------------------------------
+
+    @staticmethod
+    def _instance(model, row):
+        fields = {field.attname: field.to_python(row.get(field.attname)) for field in model._meta.concrete_fields}
+        instance = model(**fields)
+        instance._state.adding = False
+        instance.archived = True
+        return instance
+
+    @staticmethod
+    def user_segments(kind, user, **filters):
+        """The user's GenerationArchiveUser entries (archive selected), newest month first"""
+        from .models import GenerationArchiveUser
+
+        entries = GenerationArchiveUser.objects.filter(user=user, archive__kind=kind, **filters).select_related('archive')
+        return list(entries.order_by('-archive__month'))
+
+    @staticmethod
+    def iter_rows(kind, segment):
+        """Model instances from one user's segment of an archive file, newest first"""
+        model = GenerationArchiveService.models()[kind]
+        path = os.path.join(GenerationArchiveService.DIRECTORY, segment.archive.file_name)
+        with open(path, 'rb') as f:
+            f.seek(segment.offset)
+            data = f.read(segment.length)
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as member:
+            for line in member:
+                yield GenerationArchiveService._instance(model, json.loads(line))
+
+    @staticmethod
+    def get(kind, user, pk):
+        """An archived generation of this user, or None"""
+        for segment in GenerationArchiveService.user_segments(kind, user, first_id__lte=pk, last_id__gte=pk):
+            try:
+                for instance in GenerationArchiveService.iter_rows(kind, segment):
+                    if instance.pk == pk:
+                        return instance
+            except FileNotFoundError:
+                logger.error("Generation archive file missing: %s", segment.archive.file_name)
+        return None
+
+
+class HistoryWithArchive:
+    """
+    A user's live generations followed by their archived ones, as one
+    sequence the paginator can count and slice. Archived rows are always
+    older than live rows, so the -created_at order holds across the seam.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, kind, user):
+        self.queryset = queryset
+        self.kind = kind
+        self.user = user
+        self._live = None
+        self._segments = None
+
+    def _counts(self):
+        if self._live is None:
+            self._live = self.queryset.count()
+            self._segments = GenerationArchiveService.user_segments(self.kind, self.user)
+        return self._live, sum(segment.rows for segment in self._segments)
+
+    def count(self):
+        live, archived = self._counts()
+        return live + archived
+
+    __len__ = count
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        live, _ = self._counts()
+        start, stop = key.start or 0, key.stop if key.stop is not None else self.count()
+        items = list(self.queryset[start:min(stop, live)]) if start < live else []
+        skip, wanted = max(0, start - live), stop - max(start, live)
+        for segment in self._segments:
+            if wanted <= 0:
+                break
+            if skip >= segment.rows:
+                skip -= segment.rows
+                continue
+            for instance in GenerationArchiveService.iter_rows(self.kind, segment):
+                if skip:
+                    skip -= 1
+                    continue
+                items.append(instance)
+                wanted -= 1
+                if not wanted:
+                    break
+        return items
@@ -0,0 +1,188 @@
+"""
+fal.ai latency telemetry for generations
+Each generation row records when fal.ai accepted the request (submitted_at),
+when it left the queue (started_at), when we had the result (finished_at)
+and how long the request spent in our own code (overhead_ms). Hourly
+histograms per kind and tool are kept in GenerationLatencyRollup so the
+stats endpoint can report p50/p95 over weeks without scanning generations.
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+class GenerationTimer:
+    """Splits a request's wall time into time blocked on fal.ai and time spent in our code"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._external = 0.0
+
+    @contextmanager
+    def external(self):
+        """Wrap calls whose time belongs to fal.ai (submit, waiting for the result)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._external += time.perf_counter() - start
+
+    def overhead_ms(self):
+        return int(round((time.perf_counter() - self._start - self._external) * 1000))
+
+
+class GenerationLatencyService:
+    """Builds and queries the hourly latency rollups"""
+
+    # Upper bounds of the histogram buckets in ms; the last bucket is open-ended.
+    # Changing them invalidates existing rollups: rebuild with `rollup_generation_latency --hours N`.
+    BUCKETS_MS = tuple(getattr(settings, 'GENERATION_LATENCY_BUCKETS_MS', (
+        10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 45000,
+        60000, 90000, 120000, 180000, 300000, 600000, 1200000,
+    )))
+    PHASES = ('queue_ms', 'inference_ms', 'overhead_ms', 'total_ms')
+
+    @staticmethod
+    def _empty():
+        return [0] * (len(GenerationLatencyService.BUCKETS_MS) + 1)
+
+    @staticmethod
+    def _bucket(ms):
+        from bisect import bisect_left
+        return bisect_left(GenerationLatencyService.BUCKETS_MS, ms)
+
+    @staticmethod
+    def phases(generation):
+        """Phase durations in ms for one finished generation; None where a timestamp is missing"""
+        def between(start, end):
+            if start is None or end is None:
+                return None
+            return max(0, int((end - start).total_seconds() * 1000))
+
+        return {
+            'queue_ms': between(generation['submitted_at'], generation['started_at']),
+            'inference_ms': between(generation['started_at'], generation['finished_at']),
+            'overhead_ms': generation['overhead_ms'],
+            'total_ms': between(generation['created_at'], generation['finished_at']),
+        }
+
+    @staticmethod
+    def rollup(since, until=None):
+        """
+        Recompute the rollup rows for every hour in [since, until).
+        Reads only generations finished in that window (indexed on finished_at)
+        and overwrites the rows, so re-running is safe.
+        """
+        from .models import VideoGeneration, ImageGeneration, GenerationLatencyRollup
+
+        until = until or timezone.now()
+        start = since.replace(minute=0, second=0, microsecond=0)
+        rows = 0
+        while start < until:
+            end = start + timedelta(hours=1)
+            buckets = {}
+            for kind, model in (('video', VideoGeneration), ('image', ImageGeneration)):
+                generations = model.objects.filter(
+                    finished_at__gte=start, finished_at__lt=end, status__in=['completed', 'failed'],
+                ).values('tool', 'status', 'created_at', 'submitted_at', 'started_at', 'finished_at', 'overhead_ms')
+                for generation in generations.iterator(chunk_size=2000):
+                    entry = buckets.setdefault((kind, generation['tool']), {
+                        'completed': 0, 'failed': 0,
+                        **{phase: GenerationLatencyService._empty() for phase in GenerationLatencyService.PHASES},
+                    })
+                    entry[generation['status']] += 1
+                    if generation['status'] != 'completed':
+                        continue  # Failures are counted, but their timings would skew the percentiles
+                    for phase, ms in GenerationLatencyService.phases(generation).items():
+                        if ms is not None:
+                            entry[phase][GenerationLatencyService._bucket(ms)] += 1
+
+            with transaction.atomic():
+                GenerationLatencyRollup.objects.filter(hour=start).delete()
+                GenerationLatencyRollup.objects.bulk_create([
+                    GenerationLatencyRollup(kind=kind, tool=tool, hour=start, **entry)
+                    for (kind, tool), entry in buckets.items()
+                ])
+            rows += len(buckets)
+            start = end
+        return rows
+
+    @staticmethod
+    def percentile(histogram, p):
+        """Estimate the p-th quantile (0-1) from bucket counts, interpolating inside the bucket"""
+        total = sum(histogram)
+        if not total:
+            return None
+        bounds = GenerationLatencyService.BUCKETS_MS
+        rank = p * total
+        cumulative = 0
+        for index, count in enumerate(histogram):
+            if count and cumulative + count >= rank:
+                lower = bounds[index - 1] if index > 0 else 0
+                if index >= len(bounds):
+                    return lower  # Open-ended last bucket: report its lower edge
+                return round(lower + (bounds[index] - lower) * (rank - cumulative) / count)
+            cumulative += count
+        return bounds[-1]
+
+    @staticmethod
+    def _summary(entry):
+        result = {'completed': entry['completed'], 'failed': entry['failed']}
+        for phase in GenerationLatencyService.PHASES:
+            histogram = entry[phase]
+            result[phase.replace('_ms', '')] = {
+                'p50_ms': GenerationLatencyService.percentile(histogram, 0.50),
+                'p95_ms': GenerationLatencyService.percentile(histogram, 0.95),
+            }
+        return result
+
+    @staticmethod
+    def stats(hours=24, interval='hour', kind=None, tool=None):
+        """p50/p95 per phase for each kind/tool, overall and per hour or day"""
+        from .models import GenerationLatencyRollup
+
+        since = (timezone.now() - timedelta(hours=hours)).replace(minute=0, second=0, microsecond=0)
+        rollups = GenerationLatencyRollup.objects.filter(hour__gte=since)
+        if kind:
+            rollups = rollups.filter(kind=kind)
+        if tool:
+            rollups = rollups.filter(tool=tool)
+
+        size = len(GenerationLatencyService.BUCKETS_MS) + 1
+        overall, series = {}, {}
+        for rollup in rollups.order_by('hour'):
+            if len(rollup.queue_ms) != size:
+                continue  # Built with other BUCKETS_MS; rebuild to include it
+            key = f"{rollup.kind}:{rollup.tool}"
+            period = rollup.hour if interval == 'hour' else rollup.hour.replace(hour=0)
+            for container, container_key in ((overall, key), (series.setdefault(key, {}), period)):
+                entry = container.get(container_key) or {
+                    'completed': 0, 'failed': 0,
+                    **{phase: [0] * size for phase in GenerationLatencyService.PHASES},
+                }
+                entry['completed'] += rollup.completed
+                entry['failed'] += rollup.failed
+                for phase in GenerationLatencyService.PHASES:
+                    entry[phase] = [a + b for a, b in zip(entry[phase], getattr(rollup, phase))]
+                container[container_key] = entry
+
+        return {
+            'since': since.isoformat(),
+            'interval': interval,
+            'tools': [
+                {
+                    'kind': key.split(':', 1)[0],
+                    'tool': key.split(':', 1)[1],
+                    **GenerationLatencyService._summary(entry),
+                    'series': [
+                        {'period': period.isoformat(), **GenerationLatencyService._summary(bucket)}
+                        for period, bucket in sorted(series[key].items())
+                    ],
+                }
+                for key, entry in sorted(overall.items())
+            ],
+        }
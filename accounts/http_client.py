@@ -0,0 +1,292 @@
+"""
+Pooled HTTP client for outbound provider APIs
+One shared requests.Session per upstream keeps TCP+TLS connections alive
+between calls. Adds separate connect/read timeouts, bounded retries with
+jittered exponential backoff, a circuit breaker, and in-process metrics.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from . import server_timing
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+FAILURE_STATUSES = frozenset(range(500, 600))  # Count against the circuit breaker
+
+
+def _never_sent(exc):
+    """True if the request failed before any bytes reached the server"""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        return isinstance(getattr(exc.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed    - calls go through; consecutive failures are counted
+    open      - calls fail fast with CircuitOpenError until reset_timeout passes
+    half_open - one trial call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Let a call through or raise CircuitOpenError; returns True if the call is the half-open trial"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError('Circuit breaker is open')
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError('Circuit breaker is half-open, trial call in flight')
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def abandon_trial(self):
+        """The trial call ended without an upstream verdict (e.g. a local error); let the next call try"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class PooledHTTPClient:
+    """
+    Thread-safe wrapper around a shared requests.Session.
+
+    Only requests marked idempotent are retried after the request may have
+    reached the server (read timeouts, 502/503/504); everything else is
+    retried only when the connection could not be established. Responses
+    with a status in failure_statuses (every 5xx by default) count as
+    breaker failures.
+    """
+
+    def __init__(self, name, base_url, pool_size=10, connect_timeout=3.05, read_timeout=15.0,
+                 max_retries=2, backoff_factor=0.25, backoff_max=5.0,
+                 failure_threshold=5, reset_timeout=30.0, latency_window=1000,
+                 failure_statuses=FAILURE_STATUSES):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.failure_statuses = frozenset(failure_statuses)
+
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {
+            'requests': 0,
+            'attempts': 0,
+            'retries': 0,
+            'errors': 0,
+            'rejected_open_circuit': 0,
+        }
+        self._in_flight = 0
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counters[key] += n
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads retries from many workers over the window
+        ceiling = min(self.backoff_max, self.backoff_factor * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        time.sleep(delay)
+        server_timing.add(self.name, delay)
+
+    def post(self, path, idempotent=False, **kwargs):
+        """
+        POST to base_url + path.
+
+        Raises:
+            CircuitOpenError: the breaker was open before the first attempt
+            requests.exceptions.RequestException: after retries are exhausted
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault('timeout', self.timeout)
+        self._count('requests')
+        attempt = 0
+        last_error = last_response = None
+
+        while True:
+            try:
+                trial = self.breaker.before_call()
+            except CircuitOpenError:
+                # A failed attempt may itself have opened the breaker: report that failure, not the breaker
+                if last_error is not None:
+                    self._count('errors')
+                    raise last_error
+                if last_response is not None:
+                    self._count('errors')
+                    return last_response
+                self._count('rejected_open_circuit')
+                raise
+            if last_response is not None:
+                last_response.close()
+                last_response = None
+
+            self._count('attempts')
+            with self._lock:
+                self._in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                if attempt < self.max_retries and (idempotent or _never_sent(e)):
+                    logger.warning("%s: %s on %s, retrying (attempt %s)", self.name, type(e).__name__, path, attempt + 1)
+                    self._count('retries')
+                    self._backoff(attempt)
+                    attempt += 1
+                    last_error = e
+                    continue
+                self._count('errors')
+                raise
+            except BaseException:
+                # Anything else (a bug, KeyboardInterrupt) says nothing about upstream, but must not leave
+                # the half-open trial in flight forever
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                server_timing.add(self.name, elapsed)
+                with self._lock:
+                    self._in_flight -= 1
+                    self._latencies.append(elapsed)
+
+            failed = response.status_code in self.failure_statuses
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code in RETRY_STATUSES and idempotent and attempt < self.max_retries:
+                logger.warning("%s: HTTP %s on %s, retrying (attempt %s)", self.name, response.status_code, path, attempt + 1)
+                self._count('retries')
+                self._backoff(attempt)
+                attempt += 1
+                last_error, last_response = None, response
+                continue
+            if failed:
+                self._count('errors')
+            return response
+
+    def metrics(self):
+        """Snapshot of call counters, latency percentiles and connection pool use"""
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        pools = []
+        manager = self.adapter.poolmanager
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                'host': f'{pool.scheme}://{pool.host}:{pool.port}',
+                'connections_opened': pool.num_connections,
+                'requests_served': pool.num_requests,
+                'idle': pool.pool.qsize() if pool.pool is not None else 0,
+                'max_size': pool.pool.maxsize if pool.pool is not None else 0,
+            })
+
+        return {
+            'name': self.name,
+            **counters,
+            'in_flight': in_flight,
+            'circuit_state': self.breaker.state,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'pools': pools,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, **kwargs):
+    """Return the process-wide client for `name`, creating it on first use"""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = PooledHTTPClient(name, **kwargs)
+        return client
+
+
+def clients():
+    """Clients created so far in this process (without creating any)"""
+    with _clients_lock:
+        return list(_clients.values())
+
+
+def _reset_after_fork():
+    # Pooled sockets must not be shared between a parent and its forked workers
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,55 @@
+"""
+CPU-bound image helpers for the media pipeline.
+
+These functions run inside a process pool (see thumbnail_service.py), so this
+module must not import Django or anything that needs configured settings.
+"""
+import os
+import subprocess
+
+
+def render_image_thumbnail(src_path, dest_path, size, quality):
+    """
+    Resize an image to fit in a size x size box and write it as WebP.
+    """
+    from PIL import Image
+
+    with Image.open(src_path) as img:
+        # draft() lets JPEG decode at a reduced scale, which is much cheaper
+        img.draft('RGB', (size, size))
+        img.thumbnail((size, size))
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        img.save(dest_path, 'WEBP', quality=quality, method=4)
+    return dest_path
+
+
+def render_video_poster(src_path, dest_path, size, quality, ffmpeg_binary='ffmpeg', seek_seconds=1.0):
+    """
+    Grab a single frame from a video with ffmpeg and write it as a WebP poster.
+    Falls back to the first frame for clips shorter than seek_seconds.
+    """
+    frame_path = dest_path + '.frame.png'
+    for seek in (seek_seconds, 0):
+        result = subprocess.run(
+            [
+                ffmpeg_binary, '-v', 'error', '-y',
+                '-ss', str(seek),
+                '-i', src_path,
+                '-frames:v', '1',
+                frame_path,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=60,
+        )
+        if result.returncode == 0:
+            break
+    else:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace')[:500]}")
+
+    try:
+        return render_image_thumbnail(frame_path, dest_path, size, quality)
+    finally:
+        if os.path.exists(frame_path):
+            os.remove(frame_path)
@@ -0,0 +1,262 @@
+"""
+End-to-end load test harness
+Virtual users walk the whole API the way the frontend does - register, log
+in, buy a top-up, receive the E-point result webhook, generate videos and
+images and poll the lists - while every call is timed under the URL name it
+has in accounts/urls.py.
+
+Driven by `python manage.py loadtest`, which can also start the app, the
+fal.ai simulator and the E-point simulator in-process.
+"""
+import base64
+import json
+import logging
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.urls import reverse
+
+from .epoint_stub import sign
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+class LatencyRecorder:
+    """Thread-safe per-endpoint latency samples and outcome counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}  # endpoint -> [ms, ...]
+        self._statuses = {}  # endpoint -> {status: count}
+        self._errors = {}  # endpoint -> error count
+        self._error_samples = {}  # endpoint -> first few error bodies, to tell failures apart
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, endpoint, elapsed_ms, status, ok, detail=None):
+        with self._lock:
+            self._samples.setdefault(endpoint, []).append(elapsed_ms)
+            statuses = self._statuses.setdefault(endpoint, {})
+            statuses[status] = statuses.get(status, 0) + 1
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+                samples = self._error_samples.setdefault(endpoint, [])
+                if len(samples) < 3:
+                    samples.append(f'{status}: {(detail or "")[:200]}')
+
+    def stop(self):
+        self.finished = time.monotonic()
+
+    def summary(self):
+        """Per-endpoint and overall p50/p95/p99, throughput and error rate"""
+        duration = (self.finished or time.monotonic()) - self.started
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            statuses = {name: dict(counts) for name, counts in self._statuses.items()}
+            errors = dict(self._errors)
+            error_samples = {name: list(values) for name, values in self._error_samples.items()}
+
+        def describe(values, error_count, status_counts):
+            return {
+                'requests': len(values),
+                'errors': error_count,
+                'error_rate': round(error_count / len(values), 4) if values else 0.0,
+                'throughput_rps': round(len(values) / duration, 2) if duration else 0.0,
+                'mean_ms': round(statistics.fmean(values), 2) if values else None,
+                'p50_ms': round(percentile(values, 0.50), 2) if values else None,
+                'p95_ms': round(percentile(values, 0.95), 2) if values else None,
+                'p99_ms': round(percentile(values, 0.99), 2) if values else None,
+                'max_ms': round(values[-1], 2) if values else None,
+                'statuses': {str(code): count for code, count in sorted(status_counts.items(), key=lambda item: str(item[0]))},
+            }
+
+        endpoints = {
+            name: describe(values, errors.get(name, 0), statuses.get(name, {}))
+            for name, values in sorted(samples.items())
+        }
+        for name, messages in error_samples.items():
+            endpoints[name]['error_samples'] = messages
+        all_values = sorted(value for values in samples.values() for value in values)
+        all_statuses = {}
+        for counts in statuses.values():
+            for code, count in counts.items():
+                all_statuses[code] = all_statuses.get(code, 0) + count
+        return {
+            'duration_s': round(duration, 3),
+            'overall': describe(all_values, sum(errors.values()), all_statuses),
+            'endpoints': endpoints,
+        }
+
+
+class ApiClient:
+    """requests.Session wrapper that times each call under its URL name"""
+
+    def __init__(self, base_url, recorder, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.access_token = None
+
+    def call(self, method, url_name, kwargs=None, expect=(200, 201), **request_kwargs):
+        url = self.base_url + reverse(url_name, kwargs=kwargs)
+        headers = request_kwargs.pop('headers', {})
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **request_kwargs)
+        except requests.exceptions.RequestException as e:
+            self.recorder.record(url_name, (time.perf_counter() - start) * 1000, type(e).__name__, ok=False, detail=str(e))
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        ok = response.status_code in expect
+        self.recorder.record(url_name, elapsed_ms, response.status_code, ok=ok, detail=None if ok else response.text)
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class VirtualUser:
+    """One scripted user session; every step is timed and failures never abort the run early"""
+
+    def __init__(self, index, base_url, recorder, options):
+        self.index = index
+        self.options = options
+        self.client = ApiClient(base_url, recorder, timeout=options['request_timeout'])
+        self.email = f"loadtest-{options['run_id']}-{index}@example.com"
+        self.password = f'Lt-{uuid.uuid4().hex[:12]}'
+        self.credits = 0
+
+    def run(self):
+        try:
+            if not self.sign_up():
+                return
+            self.top_up()
+            for _ in range(self.options['iterations']):
+                self.iteration()
+        except Exception:
+            logger.exception("Load test user %s aborted", self.index)
+        finally:
+            self.client.close()
+
+    def _json(self, response):
+        if response is None:
+            return {}
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    def sign_up(self):
+        credentials = {'email': self.email, 'password': self.password}
+        registered = self._json(self.client.call('POST', 'register', json=credentials))
+        if not registered.get('tokens'):
+            return False
+        logged_in = self._json(self.client.call('POST', 'login', json=credentials))
+        tokens = logged_in.get('tokens') or registered['tokens']
+        self.client.access_token = tokens['access']
+        self.client.call('POST', 'token_refresh', json={'refresh': tokens['refresh']})
+        self.client.call('GET', 'profile')
+        return True
+
+    def top_up(self):
+        """Buy a package, deliver the provider's signed result webhook, then wait for the credits"""
+        self.client.call('GET', 'topup-packages')
+        created = self._json(self.client.call('POST', 'topup-create', json={'package': self.options['package']}))
+        payment_id, transaction = created.get('payment_id'), created.get('transaction_id')
+        if payment_id and transaction and self.options['epoint_secret']:
+            self.send_webhook(payment_id, transaction, 'success')
+            if self.options['duplicate_webhooks']:
+                self.send_webhook(payment_id, transaction, 'success')
+
+        deadline = time.monotonic() + self.options['credit_wait']
+        while True:
+            profile = self._json(self.client.call('GET', 'profile'))
+            self.credits = profile.get('credits', 0) or 0
+            if self.credits > 0 or time.monotonic() >= deadline:
+                break
+            time.sleep(0.2)
+        self.client.call('GET', 'topup-history')
+
+    def send_webhook(self, order_id, transaction, status):
+        payload = {'order_id': order_id, 'status': status, 'transaction': transaction, 'code': '000'}
+        data_encoded = base64.b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('utf-8')
+        self.client.call(
+            'POST', 'payment-webhook',
+            data={'data': data_encoded, 'signature': sign(data_encoded, self.options['epoint_secret'])},
+        )
+
+    def iteration(self):
+        prompt = f'Load test scene {uuid.uuid4().hex[:8]}: a lighthouse on a cliff at dusk, slow dolly in'
+        video = self._json(self.client.call(
+            'POST', 'video-generate',
+            json={'prompt': prompt, 'tool': self.options['video_tool'], 'options': {'duration': '5'}},
+        ))
+        image = self._json(self.client.call(
+            'POST', 'image-generate',
+            json={'prompt': prompt, 'tool': self.options['image_tool']},
+        ))
+        self.client.call('GET', 'video-list')
+        self.client.call('GET', 'image-list')
+        if video.get('id'):
+            self.client.call('GET', 'video-detail', kwargs={'pk': video['id']})
+        if image.get('id'):
+            self.client.call('GET', 'image-detail', kwargs={'pk': image['id']})
+        self.client.call('GET', 'tools-list')
+        self.client.call('GET', 'locked-pricing')
+        self.client.call('GET', 'subscription-info')
+        self.client.call('GET', 'profile')
+
+
+def run_load(base_url, options, progress=None):
+    """Run options['users'] virtual users, options['concurrency'] at a time; returns the summary"""
+    recorder = LatencyRecorder()
+    with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='loadtest-user') as pool:
+        futures = [
+            pool.submit(VirtualUser(index, base_url, recorder, options).run)
+            for index in range(options['users'])
+        ]
+        for done, future in enumerate(futures, start=1):
+            future.result()
+            if progress:
+                progress(done, len(futures))
+    recorder.stop()
+    return recorder.summary()
+
+
+def compare(current, baseline):
+    """Per-endpoint p50/p95/p99 and error-rate deltas of `current` against a previous run"""
+    rows = []
+    names = sorted(set(current['endpoints']) | set(baseline.get('endpoints', {})))
+    for name in ['overall'] + names:
+        now = current['overall'] if name == 'overall' else current['endpoints'].get(name)
+        before = baseline.get('overall') if name == 'overall' else baseline.get('endpoints', {}).get(name)
+        if not now or not before:
+            continue
+        row = {'endpoint': name}
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'error_rate'):
+            if now.get(key) is None or before.get(key) is None:
+                row[key] = None
+                continue
+            delta = now[key] - before[key]
+            row[key] = {
+                'before': before[key],
+                'after': now[key],
+                'change_pct': round(delta / before[key] * 100, 1) if before[key] else None,
+            }
+        rows.append(row)
+    return rows
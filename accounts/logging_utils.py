@@ -0,0 +1,144 @@
+"""
+Logging helpers
+Structured JSON output, per-event sampling, and a queue-backed handler so
+request threads never block on log I/O. Wired up in settings.LOGGING.
+
+Usage in code (lazy formatting, event name for sampling/JSON):
+    logger.info("Video generation submitted - ID: %s", video_gen.id,
+                extra={'event': 'generation.submitted', 'generation_id': video_gen.id})
+"""
+import atexit
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _snapshot(value):
+    """An immutable copy of an `extra` value as it is at the log call"""
+    if isinstance(value, (dict, list, tuple)):
+        return json.loads(json.dumps(value, default=str))
+    return str(value)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, event, message
+    plus any `extra` fields passed to the log call.
+    """
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc_info'] = record.exc_text  # Already formatted by AsyncHandler.prepare
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records for noisy events.
+
+    rates maps an event name (the `event` extra) to a keep probability.
+    Records without an event, or at WARNING and above, are always kept.
+    """
+
+    def __init__(self, rates=None, default_rate=1.0):
+        super().__init__()
+        self.rates = rates or {}
+        self.default_rate = default_rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        event = getattr(record, 'event', None)
+        if event is None:
+            return True
+        rate = self.rates.get(event, self.default_rate)
+        return rate >= 1.0 or random.random() < rate
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Queue-backed handler: the calling thread only enqueues the record, a
+    QueueListener thread formats and writes it through the target handler.
+
+    Like the stock QueueHandler.prepare, the message and traceback are
+    rendered on the calling thread, so the listener never sees arguments
+    that changed after the call and the queue holds no traceback frames.
+    The JSON/line layout is still done on the listener. Records are dropped
+    rather than blocking when the queue is full.
+
+    settings.LOGGING example:
+        'async_console': {
+            '()': 'accounts.logging_utils.AsyncHandler',
+            'target': 'logging.StreamHandler',
+            'formatter': 'json',
+        }
+    """
+
+    def __init__(self, target='logging.StreamHandler', target_kwargs=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.target = import_string(target)(**(target_kwargs or {}))
+        self.dropped = 0
+        self.listener = None
+        self._start_listener()
+        atexit.register(self._stop_listener)
+        # The listener thread does not survive fork (gunicorn --preload)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start_listener)
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def _stop_listener(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def setFormatter(self, fmt):
+        # Formatting happens in the listener thread, on the target handler
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = (self.target.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not isinstance(value, (str, int, float, bool, type(None))):
+                record.__dict__[key] = _snapshot(value)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._stop_listener()
+        self.target.close()
+        super().close()
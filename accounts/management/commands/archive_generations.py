@@ -0,0 +1,63 @@
+"""
+Management command to move old generations to the cold archive.
+Creates the coming months' partitions (PostgreSQL), then exports every
+month older than GENERATION_ARCHIVE_AFTER_MONTHS to a gzipped JSONL file in
+GENERATION_ARCHIVE_DIR and detaches and drops its partition (or deletes its
+rows on other databases). It also finishes rewriting archive files that
+still hold rows of deleted accounts, and deletes archives older than
+GENERATION_ARCHIVE_RETENTION_MONTHS. Run it daily from cron; months already
+archived are skipped. See accounts/generation_archive.py.
+
+Usage:
+    python manage.py archive_generations
+    python manage.py archive_generations --months 6 --kind video
+    python manage.py archive_generations --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.generation_archive import GenerationArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming generation partitions, archive months past the retention window and expire old archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=None,
+                            help='Keep this many months in the database (default: GENERATION_ARCHIVE_AFTER_MONTHS)')
+        parser.add_argument('--kind', choices=['video', 'image'], default=None, help='Only archive this kind')
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        if options['months'] is not None and options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+
+        if not options['dry_run']:
+            for name in GenerationArchiveService.ensure_partitions():
+                self.stdout.write(f'Created partition {name}')
+
+        kinds = [options['kind']] if options['kind'] else ['video', 'image']
+        archived = 0
+        for kind in kinds:
+            for month in GenerationArchiveService.archivable_months(kind, options['months']):
+                if options['dry_run']:
+                    self.stdout.write(f'Would archive {kind} {month:%Y-%m}')
+                    continue
+                archive = GenerationArchiveService.archive_month(kind, month)
+                archived += 1
+                self.stdout.write(
+                    f'Archived {kind} {month:%Y-%m}: {archive.rows} rows, '
+                    f'{archive.size_bytes / 1024:.1f} KB -> {archive.file_name}'
+                )
+
+        for archive in GenerationArchiveService.expired_archives():
+            if options['dry_run']:
+                self.stdout.write(f'Would expire {archive.kind} {archive.month:%Y-%m}')
+                continue
+            GenerationArchiveService.expire(archive)
+            self.stdout.write(f'Expired {archive.kind} {archive.month:%Y-%m} ({archive.file_name})')
+
+        if not options['dry_run']:
+            # Account deletions rewrite their archives on commit; pick up any rewrite that did not happen
+            for archive_id in GenerationArchiveService.uncompacted():
+                GenerationArchiveService.compact(archive_id)
+            self.stdout.write(self.style.SUCCESS(f'Archived {archived} month(s)'))
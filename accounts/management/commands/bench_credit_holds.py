@@ -0,0 +1,339 @@
+"""
+Management command to benchmark the credit hold/confirm/release path under contention.
+Many workers generate at once for the same account - one user double-clicking,
+or an agency team sharing one balance - through the real
+create_video_generation / create_image_generation code. fal.ai is stubbed
+out, so every call ends in confirm() or, for a share of them, release().
+
+Each run reports throughput, per-generate latency, time spent in write
+statements (where SQLite's busy wait and Postgres row-lock waits show up),
+lock errors and, on Postgres, how many backends were seen waiting on locks.
+It then checks the ledger of every account:
+
+    balance + open holds == granted credits - confirmed spend
+
+Any drift means credits were created or lost by a race. Runs are made with
+threads and/or forked processes against a throwaway test database (a file
+database on SQLite so that every worker has its own connection). The
+command exits non-zero when the invariant fails, so it can gate changes.
+
+Usage:
+    python manage.py bench_credit_holds
+    python manage.py bench_credit_holds --workers 50 --ops 4 --mode both --fail-rate 0.3
+    python manage.py bench_credit_holds --accounts 5 --kind image --output /tmp/holds.json
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, models, OperationalError
+from django.test.utils import override_settings
+from accounts.loadtest import percentile
+from accounts.media_service import MediaMirrorService
+from accounts.models import CreditHold
+from accounts.services import VideoGenerationService, ImageGenerationService, VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG
+
+FAIL_MARKER = '[bench-fail]'
+LOCK_ERROR_HINTS = ('locked', 'deadlock', 'could not serialize', 'lock timeout')
+
+
+class _FakeHandle:
+    """Stands in for fal_client's request handle; prompts carrying FAIL_MARKER get an empty result"""
+
+    def __init__(self, kind, arguments):
+        self.request_id = uuid.uuid4().hex
+        self.kind = kind
+        self.failed = FAIL_MARKER in arguments.get('prompt', '')
+
+    def get(self):
+        if self.failed:
+            return {}  # No media in the result -> the service releases the hold
+        if self.kind == 'video':
+            return {'video': {'url': f'https://bench.invalid/{self.request_id}.mp4'}}
+        return {'images': [{'url': f'https://bench.invalid/{self.request_id}.png'}]}
+
+
+class _StatementTimer:
+    """execute_wrapper timing write statements, where lock waits are spent"""
+
+    def __init__(self):
+        self.write_ms = 0.0
+        self.statements = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements += 1
+            if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+                self.write_ms += (time.perf_counter() - start) * 1000
+
+
+def _run_worker(kind, tool, user_ids, ops, fail_rate, barrier, worker_index):
+    """One worker: `ops` generates spread over the accounts; returns one record per generate"""
+    create = VideoGenerationService.create_video_generation if kind == 'video' else ImageGenerationService.create_image_generation
+    User = get_user_model()
+    records = []
+    try:
+        barrier.wait(timeout=60)
+        for op in range(ops):
+            sequence = worker_index * ops + op
+            user_id = user_ids[sequence % len(user_ids)]
+            fail = int((sequence + 1) * fail_rate) > int(sequence * fail_rate)  # Spread evenly
+            prompt = f"Bench {sequence} {FAIL_MARKER if fail else ''}"
+            timer = _StatementTimer()
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(timer):
+                    user = User.objects.get(pk=user_id)  # Loaded per request, as the views do
+                    generation = create(user=user, prompt=prompt, tool=tool, options={'duration': '5'})
+                outcome = 'confirmed' if generation.status == 'completed' else 'released'
+            except ValueError as e:
+                outcome = 'rejected' if 'Insufficient credits' in str(e) else f'error:{type(e).__name__}'
+            except OperationalError as e:
+                message = str(e).lower()
+                outcome = 'lock_error' if any(hint in message for hint in LOCK_ERROR_HINTS) else f'error:{type(e).__name__}'
+            except Exception as e:
+                outcome = f'error:{type(e).__name__}'
+            records.append({
+                'ms': (time.perf_counter() - start) * 1000,
+                'write_ms': timer.write_ms,
+                'statements': timer.statements,
+                'outcome': outcome,
+            })
+    except threading.BrokenBarrierError:
+        records.append({'ms': 0.0, 'write_ms': 0.0, 'statements': 0, 'outcome': 'error:BrokenBarrierError'})
+    finally:
+        connections.close_all()
+    return records
+
+
+def _process_entry(queue, *args):
+    try:
+        queue.put(_run_worker(*args))
+    except Exception:
+        queue.put([{'ms': 0.0, 'write_ms': 0.0, 'statements': 0, 'outcome': 'error:' + traceback.format_exc(limit=1)}])
+
+
+class _LockSampler(threading.Thread):
+    """Postgres only: samples how many backends are waiting on a lock"""
+
+    def __init__(self, interval=0.02):
+        super().__init__(name='bench-lock-sampler', daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop_event.is_set():
+                    cursor.execute('SELECT count(*) FROM pg_locks WHERE NOT granted')
+                    self.samples.append(cursor.fetchone()[0])
+                    self._stop_event.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return {
+            'peak_waiting': max(self.samples, default=0),
+            'mean_waiting': round(statistics.fmean(self.samples), 2) if self.samples else 0.0,
+            'samples': len(self.samples),
+        }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark credit hold/confirm/release under concurrent generates and check the credit ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['threads', 'processes', 'both'], default='both')
+        parser.add_argument('--workers', type=int, default=50, help='Concurrent generates in flight')
+        parser.add_argument('--ops', type=int, default=2, help='Generates per worker')
+        parser.add_argument('--accounts', type=int, default=1, help='Accounts the workers share (1 = worst case)')
+        parser.add_argument('--kind', choices=['video', 'image'], default='video')
+        parser.add_argument('--fail-rate', type=float, default=0.2, help='Share of generates whose hold is released')
+        parser.add_argument('--credits', type=int, default=None,
+                            help='Credits granted per account (default: enough for every generate)')
+        parser.add_argument('--output', default=None, help='Also write the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['mode'] != 'threads' and 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Process mode needs the fork start method; use --mode threads on this platform')
+
+        modes = ['threads', 'processes'] if options['mode'] == 'both' else [options['mode']]
+        old_name = connection.settings_dict['NAME']
+        temp_dir = None
+        if connection.vendor == 'sqlite':
+            # A file database so every worker thread/process gets its own connection
+            temp_dir = tempfile.mkdtemp(prefix='bench-holds-')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        results = []
+        try:
+            with override_settings(FAL_KEY='bench'), \
+                    mock.patch('accounts.fal_gateway.submit',
+                               side_effect=lambda model, arguments, **kw: _FakeHandle(options['kind'], arguments)), \
+                    mock.patch.object(MediaMirrorService, 'schedule'):
+                logging.disable(logging.CRITICAL)
+                try:
+                    for mode in modes:
+                        results.append(self._run(mode, options))
+                finally:
+                    logging.disable(logging.NOTSET)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if temp_dir:
+                connection.settings_dict['TEST']['NAME'] = None
+                try:
+                    os.rmdir(temp_dir)
+                except OSError:
+                    pass
+
+        for result in results:
+            self._print_result(result)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'database': connection.vendor, 'runs': results}, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        broken = [result['mode'] for result in results if not result['invariant_ok']]
+        if broken:
+            raise CommandError(f"Credit ledger invariant violated in: {', '.join(broken)}")
+        self.stdout.write(self.style.SUCCESS('Credit ledger invariant holds'))
+
+    def _run(self, mode, options):
+        kind = options['kind']
+        config = VIDEO_TOOL_CONFIG if kind == 'video' else IMAGE_TOOL_CONFIG
+        tool = min(config, key=lambda name: config[name]['credits'])
+        total_ops = options['workers'] * options['ops']
+        grant = options['credits']
+        if grant is None:
+            grant = config[tool]['credits'] * -(-total_ops // options['accounts'])
+
+        User = get_user_model()
+        run_id = uuid.uuid4().hex[:8]
+        user_ids = [
+            User.objects.create_user(email=f'bench-holds-{run_id}-{i}@example.com', password=None, credits=grant).pk
+            for i in range(options['accounts'])
+        ]
+
+        sampler = _LockSampler() if connection.vendor == 'postgresql' else None
+        args = (kind, tool, user_ids, options['ops'], options['fail_rate'])
+        records = []
+        if mode == 'threads':
+            barrier = threading.Barrier(options['workers'])
+            if sampler:
+                sampler.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='bench-holds') as pool:
+                futures = [pool.submit(_run_worker, *args, barrier, index) for index in range(options['workers'])]
+                for future in futures:
+                    records.extend(future.result())
+            elapsed = time.perf_counter() - start
+        else:
+            context = multiprocessing.get_context('fork')
+            barrier = context.Barrier(options['workers'])
+            queue = context.Queue()
+            connections.close_all()  # Children must not inherit the parent's sockets
+            processes = [
+                context.Process(target=_process_entry, args=(queue, *args, barrier, index), daemon=True)
+                for index in range(options['workers'])
+            ]
+            if sampler:
+                sampler.start()
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            for _ in processes:
+                records.extend(queue.get())
+            elapsed = time.perf_counter() - start
+            for process in processes:
+                process.join()
+        lock_waits = sampler.stop() if sampler else None
+
+        return self._summarise(mode, options, tool, grant, user_ids, records, elapsed, lock_waits)
+
+    def _summarise(self, mode, options, tool, grant, user_ids, records, elapsed, lock_waits):
+        outcomes = {}
+        for record in records:
+            outcomes[record['outcome']] = outcomes.get(record['outcome'], 0) + 1
+        latencies = sorted(record['ms'] for record in records)
+        write_times = sorted(record['write_ms'] for record in records)
+
+        accounts = []
+        User = get_user_model()
+        for user_id in user_ids:
+            holds = CreditHold.objects.filter(user_id=user_id)
+            totals = dict(holds.values_list('status').annotate(total=models.Sum('credits_held')).order_by())
+            balance = User.objects.values_list('credits', flat=True).get(pk=user_id)
+            held, confirmed = totals.get('hold', 0), totals.get('confirmed', 0)
+            drift = (balance + held) - (grant - confirmed)
+            accounts.append({
+                'user_id': user_id,
+                'granted': grant,
+                'balance': balance,
+                'held': held,
+                'confirmed': confirmed,
+                'released': totals.get('released', 0),
+                'drift': drift,
+            })
+
+        def ms(values, p):
+            return round(percentile(values, p), 2) if values else None
+
+        return {
+            'mode': mode,
+            'database': connection.vendor,
+            'tool': tool,
+            'workers': options['workers'],
+            'ops_per_worker': options['ops'],
+            'accounts': options['accounts'],
+            'fail_rate': options['fail_rate'],
+            'elapsed_s': round(elapsed, 3),
+            'throughput_ops': round(len(records) / elapsed, 1) if elapsed else 0.0,
+            'outcomes': outcomes,
+            'latency_ms': {'p50': ms(latencies, 0.50), 'p95': ms(latencies, 0.95), 'p99': ms(latencies, 0.99), 'max': ms(latencies, 1.0)},
+            'write_ms': {'p50': ms(write_times, 0.50), 'p95': ms(write_times, 0.95), 'max': ms(write_times, 1.0)},
+            'lock_errors': outcomes.get('lock_error', 0),
+            'lock_waits': lock_waits,
+            'ledger': accounts,
+            'invariant_ok': all(account['drift'] == 0 for account in accounts),
+        }
+
+    def _print_result(self, result):
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{result['mode']} on {result['database']}: {result['workers']} workers x {result['ops_per_worker']} "
+            f"{result['tool']} generates over {result['accounts']} account(s)"
+        ))
+        latency, writes = result['latency_ms'], result['write_ms']
+        self.stdout.write(f"  throughput   {result['throughput_ops']} generates/s in {result['elapsed_s']}s")
+        self.stdout.write(f"  latency ms   p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+        self.stdout.write(f"  writes ms    p50 {writes['p50']}  p95 {writes['p95']}  max {writes['max']}  (per generate)")
+        self.stdout.write(f"  lock errors  {result['lock_errors']}")
+        if result['lock_waits']:
+            waits = result['lock_waits']
+            self.stdout.write(f"  lock waits   peak {waits['peak_waiting']} backends, mean {waits['mean_waiting']}")
+        self.stdout.write(f"  outcomes     {result['outcomes']}")
+        for account in result['ledger']:
+            line = (
+                f"  ledger #{account['user_id']}: balance {account['balance']} + held {account['held']} "
+                f"vs granted {account['granted']} - confirmed {account['confirmed']} -> drift {account['drift']:+d}"
+            )
+            self.stdout.write(self.style.SUCCESS(line) if account['drift'] == 0 else self.style.ERROR(line))
@@ -0,0 +1,144 @@
+"""
+Management command to measure how much logging costs on the generate path.
+Runs create_video_generation / create_image_generation against a throwaway
+test database with fal.ai stubbed out, once per logging mode:
+
+    off    - logging disabled entirely (baseline)
+    sync   - the old setup: DEBUG level, plain formatter, synchronous stream
+    async  - the current setup: INFO level, JSON, sampling, queue handler
+
+Log output goes to /dev/null so only formatting and handoff cost is measured.
+
+Usage:
+    python manage.py bench_generate_logging
+    python manage.py bench_generate_logging --iterations 500 --kind image
+"""
+
+import logging
+import os
+import statistics
+import time
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from accounts.logging_utils import AsyncHandler, JSONFormatter, SamplingFilter
+from accounts.media_service import MediaMirrorService
+from accounts.services import VideoGenerationService, ImageGenerationService, VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG
+
+MODES = ('off', 'sync', 'async')
+
+
+class _FakeHandle:
+    """Stands in for fal_client's request handle; returns immediately"""
+
+    def __init__(self, kind):
+        self.request_id = uuid.uuid4().hex
+        self.kind = kind
+
+    def get(self):
+        if self.kind == 'video':
+            return {'video': {'url': f'https://bench.invalid/{self.request_id}.mp4'}}
+        return {'images': [{'url': f'https://bench.invalid/{self.request_id}.png'}]}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark generate-path latency with logging off, synchronous, and asynchronous'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--kind', choices=['video', 'image'], default='video')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        baseline = results['off']['mean']
+        self.stdout.write(f"{'mode':<8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'overhead':>12}")
+        for mode in MODES:
+            row = results[mode]
+            overhead = (row['mean'] - baseline) / baseline * 100 if baseline else 0
+            self.stdout.write(
+                f"{mode:<8}{row['mean']:>10.3f}{row['p50']:>10.3f}{row['p95']:>10.3f}{overhead:>11.1f}%"
+            )
+
+    def _run(self, options):
+        kind = options['kind']
+        if kind == 'video':
+            create, tool = VideoGenerationService.create_video_generation, next(iter(VIDEO_TOOL_CONFIG))
+        else:
+            create, tool = ImageGenerationService.create_image_generation, next(iter(IMAGE_TOOL_CONFIG))
+
+        user = get_user_model().objects.create_user(
+            email='bench-logging@example.com', password=None, credits=10 ** 9
+        )
+        prompt = 'A slow pan across a misty mountain lake at sunrise, cinematic lighting'
+
+        results = {}
+        with override_settings(FAL_KEY=settings.FAL_KEY or 'bench'), \
+                mock.patch('accounts.fal_gateway.submit', side_effect=lambda *a, **kw: _FakeHandle(kind)), \
+                mock.patch.object(MediaMirrorService, 'schedule'):
+            for mode in MODES:
+                with self._logging_mode(mode):
+                    for _ in range(options['warmup']):
+                        create(user=user, prompt=prompt, tool=tool, options={'duration': '5'})
+                    timings = []
+                    for _ in range(options['iterations']):
+                        start = time.perf_counter()
+                        create(user=user, prompt=prompt, tool=tool, options={'duration': '5'})
+                        timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                results[mode] = {
+                    'mean': statistics.fmean(timings),
+                    'p50': timings[len(timings) // 2],
+                    'p95': timings[int(len(timings) * 0.95) - 1],
+                }
+        return results
+
+    def _logging_mode(self, mode):
+        """Context manager swapping the accounts logger's handlers for one mode"""
+        command = self
+
+        class _Mode:
+            def __enter__(self):
+                self.logger = logging.getLogger('accounts')
+                self.saved = (self.logger.handlers[:], self.logger.level)
+                self.devnull = open(os.devnull, 'w')
+                self.handler = None
+                if mode == 'off':
+                    logging.disable(logging.CRITICAL)
+                    return self
+                if mode == 'sync':
+                    self.handler = logging.StreamHandler(self.devnull)
+                    self.handler.setFormatter(logging.Formatter('{levelname} {asctime} {module} {message}', style='{'))
+                    level = logging.DEBUG
+                else:
+                    self.handler = AsyncHandler(target_kwargs={'stream': self.devnull})
+                    self.handler.setFormatter(JSONFormatter())
+                    self.handler.addFilter(SamplingFilter(getattr(settings, 'LOG_SAMPLING_RATES', {})))
+                    level = logging.INFO
+                self.logger.handlers = [self.handler]
+                self.logger.setLevel(level)
+                return self
+
+            def __exit__(self, *exc):
+                logging.disable(logging.NOTSET)
+                if self.handler is not None:
+                    self.handler.close()
+                    if isinstance(self.handler, AsyncHandler) and self.handler.dropped:
+                        command.stdout.write(f'  async handler dropped {self.handler.dropped} records (queue full)')
+                self.logger.handlers, level = self.saved
+                self.logger.setLevel(level)
+                self.devnull.close()
+                return False
+
+        return _Mode()
@@ -0,0 +1,123 @@
+"""
+Management command to exercise the pooled E-point client against a local stub.
+Checks keep-alive reuse, pool bounds under concurrency, retry rules,
+read timeouts and the circuit breaker, then prints the client metrics.
+Exits non-zero if any check fails; no network access needed.
+
+Usage:
+    python manage.py check_epoint_client
+    python manage.py check_epoint_client --calls 50 --threads 16
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.epoint_stub import EPointStubServer
+from accounts.http_client import PooledHTTPClient, CircuitBreaker
+from accounts.payment_service import EPointService
+
+
+class Command(BaseCommand):
+    help = 'Run the E-point HTTP client through a local stub server and report pool/latency metrics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--pool-size', type=int, default=EPointService.POOL_SIZE)
+
+    def handle(self, *args, **options):
+        stub = EPointStubServer(secret_key='stub-secret').start()
+        client = PooledHTTPClient(
+            'epoint-stub',
+            base_url=stub.url,
+            pool_size=options['pool_size'],
+            connect_timeout=1.0,
+            read_timeout=0.3,
+            max_retries=2,
+            backoff_factor=0.01,
+            failure_threshold=3,
+            reset_timeout=0.5,
+        )
+        self.failures = []
+        try:
+            with mock.patch.multiple(
+                EPointService, TEST_MODE=False, API_URL=stub.url,
+                PUBLIC_KEY='stub-public', SECRET_KEY='stub-secret',
+            ), mock.patch.object(EPointService, 'get_client', staticmethod(lambda: client)):
+                self._run_checks(stub, client, options)
+            self.stdout.write(json.dumps(client.metrics(), indent=2))
+        finally:
+            client.close()
+            stub.stop()
+
+        if self.failures:
+            raise CommandError(f'{len(self.failures)} check(s) failed: {", ".join(self.failures)}')
+        self.stdout.write(self.style.SUCCESS('All E-point client checks passed'))
+
+    def _check(self, name, ok, detail=''):
+        self.stdout.write(f"  [{'ok' if ok else 'FAIL'}] {name}{f' - {detail}' if detail else ''}")
+        if not ok:
+            self.failures.append(name)
+
+    def _run_checks(self, stub, client, options):
+        created = EPointService.create_payment(10, order_id='stub-order-1')
+        self._check('create_payment succeeds', created['success'], created.get('message', ''))
+        transaction_id = created.get('transaction_id')
+
+        # Keep-alive: sequential calls share the connection opened above
+        stub.reset_counters()
+        for _ in range(options['calls']):
+            EPointService.check_payment_status(transaction_id)
+        self._check(
+            'sequential calls reuse one connection',
+            stub.counters['connections'] == 0,
+            f"{stub.counters['requests']} requests over {stub.counters['connections']} connections",
+        )
+
+        # Concurrency never opens more sockets than threads, and the pool keeps at most pool_size idle
+        stub.reset_counters()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            results = list(executor.map(
+                lambda _: EPointService.check_payment_status(transaction_id),
+                range(options['calls'] * options['threads'] // 2),
+            ))
+        self._check(
+            'concurrent calls succeed over a bounded set of connections',
+            all(r['success'] for r in results) and stub.counters['connections'] <= options['threads'],
+            f"{stub.counters['requests']} requests over {stub.counters['connections']} connections",
+        )
+
+        # Idempotent status checks retry 5xx
+        stub.reset_counters()
+        stub.script(['503', '502'])
+        result = EPointService.check_payment_status(transaction_id)
+        self._check('get-status retries 502/503', result['success'] and stub.counters['requests'] == 3)
+
+        # Payment creation is never retried once the request was sent
+        stub.reset_counters()
+        stub.script(['503'])
+        result = EPointService.create_payment(10, order_id='stub-order-2')
+        self._check('create_payment is not retried on 503', not result['success'] and stub.counters['requests'] == 1)
+
+        # Read timeout on a status check is retried
+        stub.reset_counters()
+        stub.script(['delay:1'])
+        result = EPointService.check_payment_status(transaction_id)
+        self._check('get-status retries a read timeout', result['success'] and stub.counters['requests'] == 2)
+
+        # Breaker opens after consecutive failures, then recovers after reset_timeout
+        stub.script(['503'] * 3)
+        EPointService.check_payment_status(transaction_id)
+        stub.reset_counters()
+        result = EPointService.check_payment_status(transaction_id)
+        self._check(
+            'open breaker fails fast without calling the server',
+            client.breaker.state == CircuitBreaker.OPEN and not result['success'] and stub.counters['requests'] == 0,
+        )
+        time.sleep(client.breaker.reset_timeout + 0.1)
+        result = EPointService.check_payment_status(transaction_id)
+        self._check('breaker closes after a successful trial call',
+                    result['success'] and client.breaker.state == CircuitBreaker.CLOSED)
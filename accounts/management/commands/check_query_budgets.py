@@ -0,0 +1,103 @@
+"""
+Management command to enforce per-endpoint query-count and latency budgets.
+Runs one scenario per URL name in accounts/urls.py on a throwaway database
+(see accounts/query_budgets.py) and fails if any endpoint issues more SQL
+queries or takes longer than its budget, answers with an unexpected status,
+or has no scenario at all. Offenders are printed with every query, its time
+and the project frames that issued it, plus repeated query shapes (N+1).
+
+Query counts are exact and make a stable CI gate; the time budgets are
+deliberately loose and only catch gross regressions.
+
+Usage:
+    python manage.py check_query_budgets
+    python manage.py check_query_budgets --only video-list image-list --verbose
+    python manage.py check_query_budgets --suggest   # print observed counts as a BUDGETS dict
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from accounts.query_budgets import BUDGETS, SKIPPED, run_budgets, url_names
+from accounts.slow_queries import fingerprint
+
+
+class Command(BaseCommand):
+    help = 'Fail when an endpoint exceeds its SQL query-count or latency budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', default=None, metavar='URL_NAME', help='Check only these URL names')
+        parser.add_argument('--repeat', type=int, default=3, help='Requests per endpoint; the time budget uses the median')
+        parser.add_argument('--verbose', action='store_true', help='Print the query log of every endpoint')
+        parser.add_argument('--suggest', action='store_true', help='Print observed values in BUDGETS format')
+
+    def handle(self, *args, **options):
+        names = url_names()
+        if options['only']:
+            unknown = sorted(set(options['only']) - set(names))
+            if unknown:
+                raise CommandError(f"Unknown URL names: {', '.join(unknown)}")
+            names = [name for name in names if name in options['only']]
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = list(run_budgets(names, repeat=max(1, options['repeat'])))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(f"{'endpoint':<24}{'queries':>9}{'budget':>8}{'ms':>9}{'budget':>8}  status")
+        failures = []
+        for result in results:
+            name = result['name']
+            if 'skipped' in result:
+                self.stdout.write(f"{name:<24}{'skipped':>9}  {result['skipped']}")
+                continue
+            if 'missing' in result:
+                self.stdout.write(self.style.ERROR(f"{name:<24}{'MISSING':>9}  {result['missing']} in accounts/query_budgets.py"))
+                failures.append(result)
+                continue
+            budget = result['budget']
+            failed = result['over_queries'] or result['over_time'] or result['wrong_status']
+            line = (
+                f"{name:<24}{result['queries']:>9}{budget['queries']:>8}{result['ms']:>9.1f}{budget['ms']:>8}"
+                f"  {result['status']}" + (f" (expected {result['expected_status']})" if result['wrong_status'] else '')
+            )
+            self.stdout.write(self.style.ERROR(line) if failed else line)
+            if failed:
+                failures.append(result)
+            if failed or options['verbose']:
+                self._print_log(result)
+
+        stale = sorted(set(BUDGETS) - set(url_names()))
+        if stale:
+            self.stdout.write(self.style.WARNING(f"Budgets for URL names that no longer exist: {', '.join(stale)}"))
+
+        if options['suggest']:
+            self._print_suggestion(results)
+
+        if failures:
+            raise CommandError(f"{len(failures)} endpoint(s) over budget: {', '.join(r['name'] for r in failures)}")
+        checked = sum(1 for r in results if 'queries' in r)
+        self.stdout.write(self.style.SUCCESS(f'{checked} endpoints within budget ({len(SKIPPED)} skipped)'))
+
+    def _print_log(self, result):
+        for index, query in enumerate(result['log'], 1):
+            self.stdout.write(f"    {index:>3}. {query['ms']:7.2f}ms  {query['sql'][:300]}")
+            for frame in reversed(query['stack']):
+                self.stdout.write(f"              <- {frame}")
+        repeated = [(shape, n) for shape, n in Counter(fingerprint(q['sql']) for q in result['log']).items() if n > 1]
+        for shape, n in repeated:
+            self.stdout.write(self.style.WARNING(f"    repeated {n}x: {shape[:200]}"))
+
+    def _print_suggestion(self, results):
+        self.stdout.write('')
+        self.stdout.write('BUDGETS = {')
+        for result in results:
+            if 'queries' in result:
+                ms = max(150, int(result['ms'] * 5 + 49) // 50 * 50)
+                self.stdout.write(f"    '{result['name']}': {{'queries': {result['queries']}, 'ms': {ms}}},")
+            else:
+                self.stdout.write(f"    '{result['name']}': None,")
+        self.stdout.write('}')
@@ -0,0 +1,49 @@
+"""
+Management command to check that the hot queries can use their indexes.
+Migrates a throwaway database, runs EXPLAIN on every query listed in
+accounts/query_plans.py and fails when a plan does not use the index the
+query was given. Works on SQLite and PostgreSQL.
+
+Usage:
+    python manage.py check_query_plans
+    python manage.py check_query_plans --only held-credits --verbose
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from accounts.query_plans import check_plans, names
+
+
+class Command(BaseCommand):
+    help = 'Fail when a hot query shape cannot use its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', default=None, metavar='QUERY', help='Check only these queries')
+        parser.add_argument('--verbose', action='store_true', help='Print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        if options['only']:
+            unknown = sorted(set(options['only']) - set(names()))
+            if unknown:
+                raise CommandError(f"Unknown queries: {', '.join(unknown)}")
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = list(check_plans(options['only']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        failures = []
+        for result in results:
+            line = f"{result['name']:<32}{result['index']:<30}{'ok' if result['uses_index'] else 'NOT USED'}"
+            self.stdout.write(line if result['uses_index'] else self.style.ERROR(line))
+            if not result['uses_index']:
+                failures.append(result['name'])
+            if options['verbose'] or not result['uses_index']:
+                for plan_line in result['plan'].splitlines():
+                    self.stdout.write(f"    {plan_line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) without their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} hot queries use their indexes ({connection.vendor})'))
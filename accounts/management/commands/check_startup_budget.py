@@ -0,0 +1,102 @@
+"""
+Management command to enforce a cold-start budget.
+Imports config.wsgi (settings, app registry, middleware and, through
+MetricsMiddleware, the URLconf and views) in fresh interpreters and fails if
+the median import time exceeds STARTUP_BUDGET_MS, or if any module that
+should only load on demand (fal_client, the E-point client, the pooled HTTP
+client, load-test tooling) was imported during boot.
+
+`requests` cannot be kept out of boot: Django REST framework imports it
+whenever it is installed. Our own modules import it lazily all the same.
+
+Usage:
+    python manage.py check_startup_budget
+    python manage.py check_startup_budget --repeat 9 --top 20   # also list the slowest imports
+"""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that must stay off the boot path; each is imported inside the function that needs it
+LAZY_MODULES = (
+    'fal_client',
+    'httpx',
+    'accounts.payment_service',
+    'accounts.http_client',
+    'accounts.thumbnail_service',
+    'accounts.loadtest',
+    'accounts.fal_simulator',
+    'accounts.epoint_simulator',
+)
+
+_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import config.wsgi\n"
+    "print(json.dumps({'ms': (time.perf_counter() - start) * 1000, 'modules': sorted(sys.modules)}))\n"
+)
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Fail when a cold import of config.wsgi exceeds its time budget or loads lazy integrations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to start; the budget uses the median')
+        parser.add_argument('--budget-ms', type=float, default=None, help='Override STARTUP_BUDGET_MS')
+        parser.add_argument('--top', type=int, default=0, help='Print the N slowest modules by self time')
+
+    def _run(self, *flags):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings')}
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', _PROBE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Importing config.wsgi failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        budget = options['budget_ms'] or getattr(settings, 'STARTUP_BUDGET_MS', 1500)
+
+        samples, modules = [], set()
+        for _ in range(options['repeat']):
+            probe, _ = self._run()
+            samples.append(probe['ms'])
+            modules.update(probe['modules'])
+        median = statistics.median(samples)
+        self.stdout.write(
+            f"config.wsgi cold import: median {median:.0f}ms, min {min(samples):.0f}ms, max {max(samples):.0f}ms "
+            f"over {len(samples)} run(s); budget {budget:.0f}ms"
+        )
+
+        if options['top']:
+            _, stderr = self._run('-X', 'importtime')
+            rows = []
+            for line in stderr.splitlines():
+                match = _IMPORTTIME.match(line)
+                if match:
+                    rows.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+            self.stdout.write(f"\n{'self ms':>8}  {'cum ms':>8}  module")
+            for self_us, cumulative_us, name in sorted(rows, reverse=True)[:options['top']]:
+                self.stdout.write(f"{self_us / 1000:8.1f}  {cumulative_us / 1000:8.1f}  {name}")
+
+        failures = []
+        if median > budget:
+            failures.append(f'median cold import {median:.0f}ms exceeds the {budget:.0f}ms budget')
+        loaded = [name for name in LAZY_MODULES if name in modules]
+        if loaded:
+            failures.append(f"loaded at boot but should be imported lazily: {', '.join(loaded)}")
+        if failures:
+            raise CommandError('Startup budget exceeded: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Startup within budget'))
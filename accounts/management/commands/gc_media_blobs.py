@@ -0,0 +1,138 @@
+"""
+Management command to garbage-collect unreferenced media blobs.
+Works incrementally in small chunks so it can run from cron next to live
+traffic; each chunk is its own short transaction.
+
+Usage:
+    python manage.py gc_media_blobs
+    python manage.py gc_media_blobs --batch-size 200 --max-batches 10 --sleep 0.5
+    python manage.py gc_media_blobs --recount      # repair ref_count drift first
+    python manage.py gc_media_blobs --stats-only   # just print the dedupe report
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from accounts.models import MediaBlob, VideoGeneration, ImageGeneration, GenerationArchiveBlob
+from accounts.media_service import MediaMirrorService, MediaBlobService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every foreign key to MediaBlob (all PROTECT), with how many references a row holds
+REFERENCES = [
+    (VideoGeneration, 'media_blob', Count('id')), (VideoGeneration, 'thumbnail_blob', Count('id')),
+    (VideoGeneration, 'reference_blob', Count('id')),
+    (ImageGeneration, 'media_blob', Count('id')), (ImageGeneration, 'thumbnail_blob', Count('id')),
+    (GenerationArchiveBlob, 'blob', Sum('refs')),  # Archived generations (accounts.generation_archive)
+]
+
+
+class Command(BaseCommand):
+    help = 'Delete media blobs nobody references any more and report the dedupe ratio'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--grace-hours', type=float, default=MediaBlobService.GC_GRACE_HOURS)
+        parser.add_argument('--recount', action='store_true', help='Recompute ref_count from generation and archive rows')
+        parser.add_argument('--stats-only', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['stats_only']:
+            if options['recount']:
+                self._recount(options['batch_size'])
+            self._collect(options)
+
+        stats = MediaBlobService.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Media blobs: {stats['blobs']} live, {stats['orphaned_blobs']} orphaned, "
+                f"{stats['physical_bytes']} bytes stored for {stats['logical_bytes']} bytes referenced "
+                f"(dedupe ratio {stats['dedupe_ratio']}x)"
+            )
+        )
+
+    def _recount(self, batch_size):
+        """Rebuild ref_count from the generation tables and archives, one chunk of blob IDs at a time"""
+        last_id = 0
+        fixed = 0
+        while True:
+            ids = list(
+                MediaBlob.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            counts = dict.fromkeys(ids, 0)
+            for model, field, references in REFERENCES:
+                rows = (
+                    model.objects.filter(**{f'{field}__in': ids})
+                    .values(field)
+                    .annotate(n=references)
+                )
+                for row in rows:
+                    counts[row[field]] += row['n']
+            with transaction.atomic():
+                for blob in MediaBlob.objects.select_for_update().filter(id__in=ids):
+                    if blob.ref_count != counts[blob.id]:
+                        blob.ref_count = counts[blob.id]
+                        blob.orphaned_at = timezone.now() if blob.ref_count <= 0 else None
+                        blob.save(update_fields=['ref_count', 'orphaned_at'])
+                        fixed += 1
+            last_id = ids[-1]
+        self.stdout.write(f'Recount completed: {fixed} blobs corrected')
+
+    def _collect(self, options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        storage = MediaMirrorService.get_storage()
+        last_id = 0
+        batches = deleted = freed = 0
+
+        while options['max_batches'] is None or batches < options['max_batches']:
+            ids = list(
+                MediaBlob.objects.filter(id__gt=last_id, ref_count__lte=0, orphaned_at__lte=cutoff)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+
+            with transaction.atomic():
+                # Re-check under lock: a new reference or upload (store() clears or
+                # renews orphaned_at) may have arrived since the scan
+                doomed = list(
+                    MediaBlob.objects.select_for_update(skip_locked=True)
+                    .filter(id__in=ids, ref_count__lte=0, orphaned_at__lte=cutoff)
+                )
+                # ref_count can drift below the real count; a blob a row still points at is kept (PROTECT)
+                referenced = set()
+                for model, field, _ in REFERENCES:
+                    referenced.update(
+                        model.objects.filter(**{f'{field}__in': [blob.id for blob in doomed]})
+                        .values_list(field, flat=True)
+                    )
+                if referenced:
+                    logger.warning(f"Media blob GC skipped {len(referenced)} blob(s) still referenced; run with --recount")
+                doomed = [blob for blob in doomed if blob.id not in referenced]
+                MediaBlob.objects.filter(id__in=[blob.id for blob in doomed]).delete()
+                # Files go while the row locks are held, so a concurrent store() of the
+                # same content waits and then writes the file again. Nothing references
+                # these rows, so a failed commit only leaves orphans for the next run.
+                for blob in doomed:
+                    storage.delete(blob.path)
+                freed += sum(blob.size for blob in doomed)
+                deleted += len(doomed)
+
+            batches += 1
+            last_id = ids[-1]
+            self.stdout.write(f'  Batch {batches}: deleted {len(doomed)} blobs, last ID {last_id}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        logger.info(f"Media blob GC completed - Deleted: {deleted}, Freed bytes: {freed}")
+        self.stdout.write(f'GC completed: {deleted} blobs deleted, {freed} bytes freed')
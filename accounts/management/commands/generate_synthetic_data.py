@@ -0,0 +1,97 @@
+"""
+Management command to fill the database with synthetic data for scale testing.
+Writes users, video/image generations with their credit holds, top-up
+purchases and subscriptions with their payments, in streamed batches
+(bulk_create, or COPY on Postgres). Activity is Zipf-skewed, so a few users
+end up with tens of thousands of generations. Run it against a scratch
+database; the rows are real rows.
+
+All synthetic users share one password (--password) and have emails at
+--email-domain.
+
+Usage:
+    python manage.py generate_synthetic_data
+    python manage.py generate_synthetic_data --users 50000 --videos 2000000 --images 8000000 --skew 1.2
+    python manage.py generate_synthetic_data --users 100 --videos 50000 --images 0 --skew 3   # one giant user
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from accounts.models import User, VideoGeneration, ImageGeneration, CreditHold, Payment, Subscription, CreditPurchase
+from accounts.synthetic_data import BatchWriter, SyntheticDataGenerator, historical_timestamps
+
+MODELS = (User, VideoGeneration, ImageGeneration, CreditHold, Payment, Subscription, CreditPurchase)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert realistic, skewed synthetic users, generations, holds, payments and subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--videos', type=int, default=10000)
+        parser.add_argument('--images', type=int, default=10000)
+        parser.add_argument('--purchases', type=int, default=2000, help='Top-up purchases (each with a payment)')
+        parser.add_argument('--subscribed-share', type=float, default=0.2, help='Share of users with a subscription')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for per-user activity (0 = uniform)')
+        parser.add_argument('--days', type=int, default=365, help='History window the rows are spread over')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on Postgres')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--password', default='synthetic')
+        parser.add_argument('--email-domain', default='synthetic.invalid')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG=False')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to write synthetic data with DEBUG=False; pass --force if this is a scratch database')
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+        if not 0 <= options['subscribed_share'] <= 1:
+            raise CommandError('--subscribed-share must be between 0 and 1')
+
+        writer = BatchWriter(use_copy=False if options['no_copy'] else None, batch_size=options['batch_size'])
+        generator = SyntheticDataGenerator(
+            users=options['users'],
+            videos=options['videos'],
+            images=options['images'],
+            purchases=options['purchases'],
+            subscribed_share=options['subscribed_share'],
+            skew=options['skew'],
+            days=options['days'],
+            seed=options['seed'],
+            password=options['password'],
+            email_domain=options['email_domain'],
+        )
+        self.stdout.write(
+            f"Writing to {connection.vendor} with {'COPY' if writer.use_copy else 'bulk_create'} "
+            f"in batches of {options['batch_size']}"
+        )
+
+        started = time.perf_counter()
+        totals = {}
+        with historical_timestamps(*MODELS):
+            for label, rows in (
+                ('users', generator.user_rows()),
+                ('videos + holds', generator.generation_rows('video')),
+                ('images + holds', generator.generation_rows('image')),
+                ('top-ups + payments', generator.purchase_rows()),
+                ('subscriptions + payments', generator.subscription_rows()),
+            ):
+                step_started = time.perf_counter()
+                counts = writer.write(rows)
+                elapsed = time.perf_counter() - step_started
+                rows_written = sum(counts.values())
+                for name, count in counts.items():
+                    totals[name] = totals.get(name, 0) + count
+                rate = rows_written / elapsed if elapsed else 0
+                self.stdout.write(f'  {label:<26}{rows_written:>12,} rows in {elapsed:8.1f}s ({rate:,.0f} rows/s)')
+        writer.reset_sequences(*MODELS)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {sum(totals.values()):,} rows in {elapsed:.1f}s - "
+            + ', '.join(f'{name} {count:,}' for name, count in sorted(totals.items()))
+        ))
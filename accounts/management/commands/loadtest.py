@@ -0,0 +1,331 @@
+"""
+Management command to load test the API end to end.
+Virtual users register, log in, buy a top-up (and deliver its signed E-point
+webhook), generate videos and images and poll the lists and details. The
+report shows p50/p95/p99 latency, throughput and error rate for each URL name
+in accounts/urls.py. It is saved as JSON so runs can be compared across commits.
+
+Without --base-url everything runs in-process on a throwaway test database:
+the app is served by a threaded WSGI server, fal.ai by accounts.fal_simulator
+and E-point by accounts.epoint_simulator. The load generator shares the GIL
+with the server, so treat in-process numbers as relative (before/after a
+change), not absolute capacity. Use Postgres (DB_ENGINE=postgresql) for
+anything write-heavy; SQLite serialises writers.
+
+On SQLite the throwaway database runs in WAL mode with a 30 s busy timeout
+and transactions take the write lock up front, so concurrent writers wait
+instead of failing with "database is locked".
+Webhook retries use --webhook-retry-backoff and are drained by a background
+thread (standing in for process_payment_webhooks). The run fails if any
+webhook event is still pending or failed at the end.
+
+With --base-url the users hit an already running server. That server should
+be pointed at the simulators (FAL_SIMULATOR_URL, EPOINT_API_URL,
+EPOINT_TEST_MODE=False), and --epoint-secret must match its EPOINT_SECRET_KEY.
+
+Usage:
+    python manage.py loadtest
+    python manage.py loadtest --users 50 --concurrency 20 --iterations 5
+    python manage.py loadtest --compare loadtest-results/loadtest-abc1234-20250101T120000.json
+    python manage.py loadtest --base-url http://127.0.0.1:8000 --epoint-secret sim-secret
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler, _StaticFilesHandler
+from django.test.utils import override_settings
+from accounts import fal_gateway
+from accounts.epoint_simulator import EPointSimulator
+from accounts.fal_simulator import FalSimulator
+from accounts.loadtest import compare, run_load
+from accounts.media_service import MediaMirrorService
+from accounts.models import PaymentWebhookEvent
+from accounts.payment_service import EPointService
+from accounts.services import VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG
+from accounts.topup_constants import TOPUP_PACKAGES
+from accounts.webhook_service import PaymentWebhookService
+
+
+class _NoDelayRequestHandler(QuietWSGIRequestHandler):
+    # Headers and body are separate writes; with Nagle on, every keep-alive
+    # response stalls ~40ms on the client's delayed ACK and hides real latency
+    disable_nagle_algorithm = True
+
+
+class _AppServerThread(LiveServerThread):
+    def _create_server(self, connections_override=None):
+        return self.server_class(
+            (self.host, self.port), _NoDelayRequestHandler,
+            allow_reuse_address=False, connections_override=connections_override,
+        )
+
+
+class Command(BaseCommand):
+    help = 'Run an end-to-end load test and save per-endpoint latency, throughput and error rates as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None, help='Target a running server instead of serving in-process')
+        parser.add_argument('--users', type=int, default=20, help='Virtual users in total')
+        parser.add_argument('--concurrency', type=int, default=10, help='Virtual users active at once')
+        parser.add_argument('--iterations', type=int, default=3, help='Generate/list rounds per user')
+        parser.add_argument('--video-tool', choices=sorted(VIDEO_TOOL_CONFIG), default='seedance')
+        parser.add_argument('--image-tool', choices=sorted(IMAGE_TOOL_CONFIG), default='gpt-image')
+        parser.add_argument('--package', choices=sorted(TOPUP_PACKAGES), default='small')
+        parser.add_argument('--epoint-secret', default=None,
+                            help='Key used to sign webhooks (default: EPOINT_SECRET_KEY, or a generated one in-process)')
+        parser.add_argument('--duplicate-webhooks', action='store_true', help='Deliver every payment webhook twice')
+        parser.add_argument('--credit-wait', type=float, default=15.0, help='Seconds to wait for top-up credits')
+        parser.add_argument('--request-timeout', type=float, default=120.0)
+        parser.add_argument('--time-scale', type=float, default=0.05,
+                            help='In-process only: fal.ai simulator time scale')
+        parser.add_argument('--fal-error-rate', type=float, default=None,
+                            help='In-process only: failure share for all fal.ai models')
+        parser.add_argument('--epoint-latency-ms', type=float, default=50.0, help='In-process only')
+        parser.add_argument('--epoint-error-rate', type=float, default=0.0, help='In-process only')
+        parser.add_argument('--mirror-media', action='store_true', help='In-process only: keep media mirroring on')
+        parser.add_argument('--webhook-retry-backoff', type=float, default=0.5,
+                            help='In-process only: seconds before a failed webhook is retried (doubled per attempt)')
+        parser.add_argument('--output', default=None,
+                            help='Result file (default: loadtest-results/loadtest-<commit>-<timestamp>.json)')
+        parser.add_argument('--compare', default=None, help='Previous result file to compare against')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read --compare file: {e}")
+
+        options['run_id'] = uuid.uuid4().hex[:8]
+        started_at = datetime.now()
+        if options['base_url']:
+            options['epoint_secret'] = options['epoint_secret'] or getattr(settings, 'EPOINT_SECRET_KEY', '')
+            if not options['epoint_secret']:
+                self.stdout.write(self.style.WARNING('No --epoint-secret: top-ups will wait for the provider\'s own webhook'))
+            summary = self._run(options['base_url'], options)
+            target = {'mode': 'remote', 'base_url': options['base_url']}
+        else:
+            summary, target = self._run_in_process(options)
+
+        commit = self._git_commit()
+        result = {
+            'run_id': options['run_id'],
+            'commit': commit,
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'target': target,
+            'config': {
+                key: options[key] for key in (
+                    'users', 'concurrency', 'iterations', 'video_tool', 'image_tool', 'package',
+                    'duplicate_webhooks', 'time_scale', 'fal_error_rate', 'epoint_latency_ms', 'epoint_error_rate',
+                )
+            },
+            **summary,
+        }
+
+        self._print_summary(result)
+        if baseline:
+            self._print_comparison(compare(result, baseline), baseline)
+        unapplied = {
+            state: count for state, count in target.get('webhook_events', {}).items() if state in ('pending', 'failed')
+        }
+        if unapplied:
+            self.stderr.write(self.style.ERROR(
+                f"Payment webhooks not applied: {unapplied}; errors: {target.get('webhook_errors')}. "
+                f"Top-up credits and generation results are not trustworthy."
+            ))
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'loadtest-results',
+            f"loadtest-{commit or 'nocommit'}-{started_at.strftime('%Y%m%dT%H%M%S')}.json",
+        )
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+        if unapplied:
+            raise CommandError('Load test finished with unapplied payment webhooks')
+
+    def _run(self, base_url, options):
+        self.stdout.write(
+            f"Running {options['users']} users x {options['iterations']} iterations "
+            f"({options['concurrency']} concurrent) against {base_url}"
+        )
+        step = max(1, options['users'] // 10)
+
+        def progress(done, total):
+            if done % step == 0 or done == total:
+                self.stdout.write(f'  {done}/{total} users finished')
+
+        return run_load(base_url, options, progress=progress)
+
+    def _run_in_process(self, options):
+        """Serve the app, fal.ai and E-point locally against a throwaway database"""
+        secret = options['epoint_secret'] or f'loadtest-{uuid.uuid4().hex}'
+        options['epoint_secret'] = secret
+
+        old_name = connection.settings_dict['NAME']
+        old_options = connection.settings_dict['OPTIONS']
+        temp_dir = None
+        if connection.vendor == 'sqlite':
+            # A file database so every server thread gets its own connection; writers
+            # wait for the lock (sqlite3 busy timeout) instead of failing at once
+            temp_dir = tempfile.mkdtemp(prefix='loadtest-')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'loadtest.sqlite3')
+            connection.settings_dict['OPTIONS'] = {**old_options, 'timeout': 30}
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                # Readers no longer block the writer (persistent for the database file)
+                cursor.execute('PRAGMA journal_mode=WAL')
+
+        fal = FalSimulator(time_scale=options['time_scale'], error_rate=options['fal_error_rate']).start()
+        epoint = EPointSimulator(
+            secret_key=secret,
+            callback_url=None,  # The virtual users deliver webhooks themselves so they are timed
+            latency_ms=options['epoint_latency_ms'],
+            error_rate=options['epoint_error_rate'],
+        ).start()
+        server = None
+        drain_stop = threading.Event()
+        drainer = threading.Thread(target=self._drain_webhooks, args=(drain_stop,), daemon=True)
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(mock.patch.dict(os.environ, {'FAL_KEY': os.environ.get('FAL_KEY') or 'loadtest'}))
+                stack.enter_context(override_settings(
+                    FAL_KEY=settings.FAL_KEY or 'loadtest', FAL_SIMULATOR_URL=fal.url,
+                ))
+                stack.enter_context(mock.patch.multiple(
+                    EPointService, TEST_MODE=False, API_URL=epoint.url,
+                    PUBLIC_KEY='loadtest-public', SECRET_KEY=secret,
+                ))
+                if not options['mirror_media']:
+                    stack.enter_context(mock.patch.object(MediaMirrorService, 'schedule'))
+                stack.enter_context(mock.patch.object(
+                    PaymentWebhookService, 'RETRY_BACKOFF', options['webhook_retry_backoff'],
+                ))
+                if connection.vendor == 'sqlite':
+                    # A deferred transaction that reads and then writes cannot wait for the
+                    # lock; take it up front so the busy timeout applies (Django 5.1's
+                    # transaction_mode='IMMEDIATE')
+                    stack.enter_context(mock.patch.object(
+                        type(connections[DEFAULT_DB_ALIAS]), '_start_transaction_under_autocommit',
+                        lambda wrapper: wrapper.cursor().execute('BEGIN IMMEDIATE'),
+                    ))
+                fal_gateway.reset()
+                stack.callback(fal_gateway.reset)
+
+                server = _AppServerThread('127.0.0.1', _StaticFilesHandler)
+                server.daemon = True
+                server.start()
+                server.is_ready.wait()
+                if server.error:
+                    raise CommandError(f'Could not start the in-process server: {server.error}')
+                base_url = f'http://127.0.0.1:{server.port}'
+                self.stdout.write(f'Serving on {base_url} (fal.ai {fal.url}, E-point {epoint.url}, {connection.vendor})')
+
+                drainer.start()
+                summary = self._run(base_url, options)
+                drain_stop.set()
+                drainer.join()
+                # Give retries still waiting on their backoff the full retry schedule
+                self._settle_webhooks(PaymentWebhookService.RETRY_BACKOFF * 2 ** PaymentWebhookService.MAX_ATTEMPTS)
+                target = {
+                    'mode': 'in-process',
+                    'database': connection.vendor,
+                    'fal_simulator': dict(fal.counters),
+                    'epoint_simulator': dict(epoint.counters),
+                    'epoint_client': EPointService.get_client().metrics(),
+                    'webhook_events': dict(
+                        PaymentWebhookEvent.objects.values_list('state').annotate(n=Count('id')).order_by()
+                    ),
+                    'webhook_errors': list(
+                        PaymentWebhookEvent.objects.exclude(last_error__isnull=True).exclude(last_error='').values_list('last_error', flat=True)[:3]
+                    ),
+                }
+                return summary, target
+        finally:
+            drain_stop.set()
+            if drainer.is_alive():
+                drainer.join()
+            if server is not None:
+                server.terminate()
+            fal.stop()
+            epoint.stop()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['OPTIONS'] = old_options
+            if temp_dir:
+                connection.settings_dict['TEST']['NAME'] = None
+                try:
+                    os.rmdir(temp_dir)
+                except OSError:
+                    pass
+
+    def _drain_webhooks(self, stop):
+        """Apply due payment webhook retries until `stop` is set, as process_payment_webhooks would"""
+        try:
+            while not stop.wait(0.2):
+                PaymentWebhookService.process_pending()
+        finally:
+            connection.close()
+
+    def _settle_webhooks(self, timeout):
+        """Keep applying due webhook events until none is pending or `timeout` seconds pass"""
+        deadline = time.monotonic() + timeout
+        while PaymentWebhookEvent.objects.filter(state='pending').exists() and time.monotonic() < deadline:
+            PaymentWebhookService.process_pending()
+            time.sleep(0.2)
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10, check=True,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _print_summary(self, result):
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'endpoint':<22}{'reqs':>7}{'err%':>8}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses"
+        )
+        rows = list(result['endpoints'].items()) + [('overall', result['overall'])]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<22}{row['requests']:>7}{row['error_rate'] * 100:>7.1f}%{row['throughput_rps']:>8.1f}"
+                f"{self._ms(row['p50_ms'])}{self._ms(row['p95_ms'])}{self._ms(row['p99_ms'])}  "
+                f"{' '.join(f'{code}:{count}' for code, count in row['statuses'].items())}"
+            )
+        self.stdout.write(f"Duration {result['duration_s']}s, commit {result['commit'] or 'unknown'}")
+
+    def _print_comparison(self, rows, baseline):
+        self.stdout.write('')
+        self.stdout.write(f"Compared with {baseline.get('commit') or 'unknown'} ({baseline.get('started_at', '?')}):")
+        self.stdout.write(f"{'endpoint':<22}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}{'err%':>10}")
+        for row in rows:
+            cells = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+                change = row[key] and row[key]['change_pct']
+                cells.append(f'{change:>+9.1f}%' if change is not None else f"{'-':>10}")
+            error = row['error_rate']
+            cells.append(f"{(error['after'] - error['before']) * 100:>+9.1f}pt" if error else f"{'-':>10}")
+            self.stdout.write(f"{row['endpoint']:<22}{''.join(cells)}")
+
+    def _ms(self, value):
+        return f'{value:>10.1f}' if value is not None else f"{'-':>10}"
@@ -0,0 +1,48 @@
+"""
+Management command to apply queued E-point payment webhooks.
+Picks up events the in-process dispatcher missed (worker restart) and
+retries failed ones once their backoff has passed. Several copies can run
+side by side; each event is locked while it is applied.
+
+Usage:
+    python manage.py process_payment_webhooks            # run forever
+    python manage.py process_payment_webhooks --once     # drain and exit (cron)
+    python manage.py process_payment_webhooks --batch-size 200 --sleep 1
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from accounts.webhook_service import PaymentWebhookService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply stored E-point payment webhooks to their payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when no due events are left')
+
+    def handle(self, *args, **options):
+        total_applied = total_skipped = 0
+        while True:
+            close_old_connections()
+            applied, skipped = PaymentWebhookService.process_pending(options['batch_size'])
+            total_applied += applied
+            total_skipped += skipped
+            if applied or skipped:
+                self.stdout.write(f'  Applied {applied}, not applied {skipped}')
+
+            if applied + skipped < options['batch_size']:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Payment webhooks: {total_applied} applied, {total_skipped} failed or skipped')
+        )
@@ -0,0 +1,57 @@
+"""
+Management command to delete failed generations and settled credit holds
+past their retention period (RETENTION_FAILED_GENERATION_DAYS,
+RETENTION_SETTLED_HOLD_DAYS). Deletes in small id-ordered batches, each its
+own short transaction, with a pause between batches, so it can run from cron
+next to live traffic. Reports rows per second for every target.
+See accounts/retention.py.
+
+Usage:
+    python manage.py purge_retention
+    python manage.py purge_retention --only settled-holds --batch-size 200 --sleep 0.5
+    python manage.py purge_retention --max-batches 20
+    python manage.py purge_retention --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.retention import RetentionService
+
+
+class Command(BaseCommand):
+    help = 'Delete failed generations and settled credit holds older than their retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', default=None, metavar='TARGET',
+                            help='failed-videos, failed-images and/or settled-holds')
+        parser.add_argument('--batch-size', type=int, default=RetentionService.BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=RetentionService.SLEEP, help='Seconds to pause between batches')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop each target after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count the expired rows without deleting them')
+        parser.add_argument('--verbose', action='store_true', help='Print every batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        targets = RetentionService.targets()
+        if options['only']:
+            unknown = sorted(set(options['only']) - set(targets))
+            if unknown:
+                raise CommandError(f"Unknown or disabled targets: {', '.join(unknown)}")
+            targets = {name: queryset for name, queryset in targets.items() if name in options['only']}
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for name, queryset in targets.items():
+            total, elapsed = 0, 0.0
+            for batch, total, elapsed in RetentionService.purge(
+                queryset,
+                batch_size=options['batch_size'],
+                sleep=0 if options['dry_run'] else options['sleep'],
+                max_batches=options['max_batches'],
+                dry_run=options['dry_run'],
+            ):
+                if options['verbose']:
+                    self.stdout.write(f'  {name}: batch of {batch}, {total} so far')
+            rate = total / elapsed if elapsed else 0
+            self.stdout.write(
+                self.style.SUCCESS(f'{verb} {total} {name} in {elapsed:.1f}s ({rate:.0f} rows/s)')
+            )
@@ -0,0 +1,136 @@
+"""
+Management command to reconcile payments stuck in 'processing' (the E-point
+callback never arrived). Streams stragglers in ID order, asks E-point for
+their status through a bounded thread pool, and applies each answer in its
+own short transaction under a row lock. Progress is checkpointed to a file
+after every batch so an interrupted run can --resume. Refuses to run in
+EPOINT_TEST_MODE, where every status check answers 'completed', and skips
+mock transaction IDs. Returned (refunded) payments are only flagged for
+manual review.
+
+Usage:
+    python manage.py reconcile_payments
+    python manage.py reconcile_payments --older-than 30 --workers 16 --batch-size 500
+    python manage.py reconcile_payments --checkpoint /var/run/reconcile.json --resume
+    python manage.py reconcile_payments --dry-run
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import Payment
+from accounts.payment_service import EPointService, PaymentService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Check E-point for payments stuck in 'processing' and apply completions or failures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=15, help='Minutes in processing before a payment is checked')
+        parser.add_argument('--workers', type=int, default=EPointService.POOL_SIZE)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many payments')
+        parser.add_argument('--checkpoint', default=None, help='File recording the last reconciled payment ID')
+        parser.add_argument('--resume', action='store_true', help='Start after the ID stored in --checkpoint')
+        parser.add_argument('--dry-run', action='store_true', help='Query E-point but do not change payments')
+
+    def handle(self, *args, **options):
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume needs --checkpoint')
+        if EPointService.TEST_MODE:
+            raise CommandError('EPOINT_TEST_MODE is on: status checks are mocked and would complete every payment')
+
+        last_id = self._read_checkpoint(options['checkpoint']) if options['resume'] else 0
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        stragglers = Payment.objects.filter(
+            Q(processed_at__lt=cutoff) | Q(processed_at__isnull=True, created_at__lt=cutoff),
+            status='processing',
+        )
+
+        counts = dict.fromkeys(['completed', 'failed', 'refunded', 'pending', 'unknown', 'errors', 'skipped'], 0)
+        processed = 0
+        started = time.monotonic()
+        self.stdout.write(f'Reconciling processing payments older than {options["older_than"]} min after ID {last_id}...')
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='reconcile') as executor:
+            while options['limit'] is None or processed < options['limit']:
+                batch_size = options['batch_size']
+                if options['limit'] is not None:
+                    batch_size = min(batch_size, options['limit'] - processed)
+                rows = list(
+                    stragglers.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'epoint_transaction_id')[:batch_size]
+                )
+                if not rows:
+                    break
+
+                # Network calls only in the pool; the DB work stays on this thread
+                checkable = [
+                    (pk, txn) for pk, txn in rows
+                    if txn and not txn.startswith(EPointService.MOCK_TRANSACTION_PREFIX)
+                ]
+                counts['skipped'] += len(rows) - len(checkable)
+                results = executor.map(lambda row: EPointService.check_payment_status(row[1]), checkable)
+
+                for (payment_id, transaction_id), result in zip(checkable, results):
+                    if not result.get('success'):
+                        counts['errors'] += 1
+                        continue
+                    counts[self._apply(payment_id, transaction_id, result.get('status'), options['dry_run'])] += 1
+
+                processed += len(rows)
+                last_id = rows[-1][0]
+                if options['checkpoint'] and not options['dry_run']:
+                    self._write_checkpoint(options['checkpoint'], last_id)
+                self.stdout.write(
+                    f'  Processed {processed} (completed {counts["completed"]}, failed {counts["failed"]}, '
+                    f'still pending {counts["pending"]}, errors {counts["errors"]}), last ID {last_id}'
+                )
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Payment reconciliation completed - Processed: {processed}, Results: {counts}, Seconds: {elapsed:.1f}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Reconciled {processed} payments in {elapsed:.1f}s: {counts["completed"]} completed, '
+                f'{counts["failed"]} failed, {counts["refunded"]} returned (flagged for review), '
+                f'{counts["pending"] + counts["unknown"]} unchanged, {counts["errors"]} status check errors, '
+                f'{counts["skipped"]} without a real transaction ID'
+            )
+        )
+
+    def _apply(self, payment_id, transaction_id, provider_status, dry_run):
+        """Apply one E-point answer in its own transaction; returns the normalized outcome"""
+        outcome = EPointService.normalize_status(provider_status)
+        if dry_run or outcome not in ('completed', 'failed', 'refunded'):
+            return outcome
+        with transaction.atomic():
+            # Re-check under lock: a webhook may have settled it meanwhile
+            payment = Payment.objects.select_for_update().filter(id=payment_id, status='processing').first()
+            if payment is None:
+                return 'skipped'
+            return PaymentService.apply_provider_status(
+                payment, provider_status, transaction_id, 'reconciled by status check'
+            )
+
+    def _read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(json.load(f).get('last_id', 0))
+        except FileNotFoundError:
+            return 0
+
+    def _write_checkpoint(self, path, last_id):
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'last_id': last_id, 'updated_at': timezone.now().isoformat()}, f)
+        os.replace(temp_path, path)
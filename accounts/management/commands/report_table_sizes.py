@@ -0,0 +1,69 @@
+"""
+Management command to report on-disk size of tables and their indexes.
+Use it before and after schema changes that aim to shrink rows. Reads
+pg_relation_size / pg_indexes_size on PostgreSQL and the dbstat virtual
+table on SQLite (when the SQLite build has it).
+
+Usage:
+    python manage.py report_table_sizes
+    python manage.py report_table_sizes --tables accounts_videogeneration accounts_credithold
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+DEFAULT_TABLES = ('accounts_videogeneration', 'accounts_imagegeneration', 'accounts_credithold')
+
+
+def table_sizes(tables):
+    """{table: {'rows', 'table_bytes', 'index_bytes'}} for each existing table"""
+    existing = set(connection.introspection.table_names())
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            if table not in existing:
+                continue
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            rows = cursor.fetchone()[0]
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_relation_size(%s), pg_indexes_size(%s)', [table, table])
+                table_bytes, index_bytes = cursor.fetchone()
+            elif connection.vendor == 'sqlite':
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+                table_bytes = cursor.fetchone()[0] or 0
+                cursor.execute(
+                    "SELECT COALESCE(SUM(d.pgsize), 0) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+                    "WHERE m.type = 'index' AND m.tbl_name = %s",
+                    [table],
+                )
+                index_bytes = cursor.fetchone()[0]
+            else:
+                raise CommandError(f'Table sizes are not supported on {connection.vendor}')
+            sizes[table] = {'rows': rows, 'table_bytes': table_bytes, 'index_bytes': index_bytes}
+    return sizes
+
+
+class Command(BaseCommand):
+    help = 'Print row counts and on-disk table and index sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', nargs='+', default=list(DEFAULT_TABLES))
+
+    def handle(self, *args, **options):
+        try:
+            sizes = table_sizes(options['tables'])
+        except Exception as e:
+            if isinstance(e, CommandError):
+                raise
+            raise CommandError(f'Could not read table sizes: {e}')
+
+        self.stdout.write(f"{'table':<32}{'rows':>12}{'table MB':>11}{'index MB':>11}{'bytes/row':>11}")
+        for table, size in sizes.items():
+            per_row = (size['table_bytes'] + size['index_bytes']) / size['rows'] if size['rows'] else 0
+            self.stdout.write(
+                f"{table:<32}{size['rows']:>12}{size['table_bytes'] / 1048576:>11.2f}"
+                f"{size['index_bytes'] / 1048576:>11.2f}{per_row:>11.0f}"
+            )
+        missing = sorted(set(options['tables']) - set(sizes))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"No such table(s): {', '.join(missing)}"))
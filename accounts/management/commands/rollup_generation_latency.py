@@ -0,0 +1,35 @@
+"""
+Management command to rebuild the hourly fal.ai latency rollups.
+Recomputes GenerationLatencyRollup rows from generations that finished in
+the last --hours hours (indexed on finished_at) and replaces those rows, so
+it is safe to run from cron every few minutes. The current, unfinished hour
+is included and simply rewritten on the next run.
+
+Usage:
+    python manage.py rollup_generation_latency
+    python manage.py rollup_generation_latency --hours 720   # backfill a month
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from accounts.generation_timing import GenerationLatencyService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly fal.ai queue/inference/overhead latency histograms per tool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=2, help='How many hours back to rebuild')
+
+    def handle(self, *args, **options):
+        if options['hours'] < 1:
+            raise CommandError('--hours must be at least 1')
+
+        started = time.perf_counter()
+        rows = GenerationLatencyService.rollup(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} rollup row(s) for the last {options['hours']} hour(s) in {time.perf_counter() - started:.2f}s"
+        ))
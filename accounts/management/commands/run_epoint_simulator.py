@@ -0,0 +1,78 @@
+"""
+Management command to run the local E-point simulator.
+Point the app at it to drive the real payment code paths under load:
+
+    EPOINT_TEST_MODE=False
+    EPOINT_API_URL=http://127.0.0.1:8902
+    EPOINT_PUBLIC_KEY=sim-public
+    EPOINT_SECRET_KEY=<same value as --secret-key>
+
+Usage:
+    python manage.py run_epoint_simulator
+    python manage.py run_epoint_simulator --port 8902 --latency-ms 80 --error-rate 0.02 \\
+        --success-rate 0.85 --returned-rate 0.05 --duplicate-rate 0.1 --callback-delay 2
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from accounts.epoint_simulator import EPointSimulator
+
+
+class Command(BaseCommand):
+    help = 'Run a fake E-point API with signed result callbacks and configurable latency/failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8902)
+        parser.add_argument('--secret-key', default=getattr(settings, 'EPOINT_SECRET_KEY', '') or 'sim-secret')
+        parser.add_argument('--callback-url', default=None,
+                            help='Webhook URL (default: BACKEND_URL + payment/webhook/); pass "" to disable')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Median response latency')
+        parser.add_argument('--latency-sigma', type=float, default=0.5, help='Log-normal spread of latency')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls answered with 5xx')
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of calls held for --timeout-seconds')
+        parser.add_argument('--timeout-seconds', type=float, default=60.0)
+        parser.add_argument('--success-rate', type=float, default=0.9, help='Share of transactions that succeed')
+        parser.add_argument('--returned-rate', type=float, default=0.0, help='Share of transactions returned')
+        parser.add_argument('--callback-delay', type=float, default=1.0, help='Seconds until a transaction resolves')
+        parser.add_argument('--duplicate-rate', type=float, default=0.0, help='Share of callbacks delivered twice')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--stats-interval', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        callback_url = options['callback_url']
+        if callback_url is None:
+            backend_url = getattr(settings, 'BACKEND_URL', 'http://localhost:8000').rstrip('/')
+            callback_url = f"{backend_url}{reverse('payment-webhook')}"
+
+        simulator = EPointSimulator(
+            secret_key=options['secret_key'],
+            host=options['host'],
+            port=options['port'],
+            callback_url=callback_url or None,
+            latency_ms=options['latency_ms'],
+            latency_sigma=options['latency_sigma'],
+            error_rate=options['error_rate'],
+            timeout_rate=options['timeout_rate'],
+            timeout_seconds=options['timeout_seconds'],
+            success_rate=options['success_rate'],
+            returned_rate=options['returned_rate'],
+            callback_delay=options['callback_delay'],
+            duplicate_rate=options['duplicate_rate'],
+            seed=options['seed'],
+        ).start()
+
+        self.stdout.write(self.style.SUCCESS(f'E-point simulator listening on {simulator.url}'))
+        self.stdout.write(f'Callbacks to: {callback_url or "(disabled)"}')
+        try:
+            while True:
+                time.sleep(options['stats_interval'])
+                self.stdout.write(f'  {simulator.counters}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulator.stop()
+            self.stdout.write(f'Final: {simulator.counters}')
@@ -0,0 +1,72 @@
+"""
+Management command to run the local fal.ai simulator.
+Point the app at it for load tests (never in production):
+
+    FAL_SIMULATOR_URL=http://127.0.0.1:8903
+    FAL_KEY=simulator
+
+Latency/error profiles come from settings.FAL_SIMULATOR_PROFILES and can be
+overridden with --profiles (JSON keyed by 'video'/'image', tool name or model id).
+
+Usage:
+    python manage.py run_fal_simulator
+    python manage.py run_fal_simulator --time-scale 0.1 --error-rate 0.05
+    python manage.py run_fal_simulator --profiles '{"veo": {"run_ms": 20000}}' --list-models
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.fal_simulator import FalSimulator
+
+
+class Command(BaseCommand):
+    help = 'Run a fake fal.ai queue server for every configured generation model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8903)
+        parser.add_argument('--profiles', type=json.loads, default=None, help='JSON latency/error overrides')
+        parser.add_argument('--time-scale', type=float, default=1.0, help='Multiply every simulated duration')
+        parser.add_argument('--error-rate', type=float, default=None, help='Failure share for all models')
+        parser.add_argument('--submit-error-rate', type=float, default=0.0, help='Share of submits rejected with 503')
+        parser.add_argument('--image-shape', choices=['alternate', 'images', 'image'], default='alternate')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--stats-interval', type=float, default=10.0)
+        parser.add_argument('--list-models', action='store_true')
+
+    def handle(self, *args, **options):
+        profiles = dict(getattr(settings, 'FAL_SIMULATOR_PROFILES', {}) or {})
+        profiles.update(options['profiles'] or {})
+
+        simulator = FalSimulator(
+            host=options['host'],
+            port=options['port'],
+            profiles=profiles,
+            time_scale=options['time_scale'],
+            error_rate=options['error_rate'],
+            submit_error_rate=options['submit_error_rate'],
+            image_shape=options['image_shape'],
+            seed=options['seed'],
+        ).start()
+
+        self.stdout.write(self.style.SUCCESS(f'fal.ai simulator listening on {simulator.url}'))
+        self.stdout.write(f'Serving {len(simulator.registry)} models; set FAL_SIMULATOR_URL={simulator.url}')
+        if options['list_models']:
+            for model_id, entry in sorted(simulator.registry.items()):
+                profile = simulator.profile_for(model_id)
+                self.stdout.write(
+                    f"  {model_id:<55} {entry['tool']:<22} {entry['shape']:<7} "
+                    f"queue {profile['queue_ms']}ms run {profile['run_ms']}ms errors {profile['error_rate']:.0%}"
+                )
+        try:
+            while True:
+                time.sleep(options['stats_interval'])
+                self.stdout.write(f'  {simulator.counters} in flight/retained: {len(simulator.jobs)}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulator.stop()
+            self.stdout.write(f'Final: {simulator.counters}')
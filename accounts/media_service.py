@@ -0,0 +1,328 @@
+"""
+Media Mirroring Service
+Copies completed fal.ai outputs into our own storage so gallery loads
+no longer depend on fal's expiring CDN URLs. Files are stored
+content-addressed (MediaBlob), so identical bytes are written once.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import VideoGeneration, ImageGeneration, MediaBlob
+
+logger = logging.getLogger(__name__)
+
+
+class MediaMirrorService:
+    """
+    Streams generation results from fal.ai into local (or pluggable) storage
+    """
+
+    # Configuration from Django settings
+    ENABLED = getattr(settings, 'MEDIA_MIRROR_ENABLED', True)
+    STORAGE_ALIAS = getattr(settings, 'MEDIA_MIRROR_STORAGE', 'default')
+    CHUNK_SIZE = getattr(settings, 'MEDIA_MIRROR_CHUNK_SIZE', 1024 * 1024)  # 1 MB
+    MAX_BYTES = getattr(settings, 'MEDIA_MIRROR_MAX_BYTES', 500 * 1024 * 1024)  # 500 MB
+    MAX_CONCURRENCY = getattr(settings, 'MEDIA_MIRROR_MAX_CONCURRENCY', 4)
+    CONNECT_TIMEOUT = getattr(settings, 'MEDIA_MIRROR_CONNECT_TIMEOUT', 10)
+    READ_TIMEOUT = getattr(settings, 'MEDIA_MIRROR_READ_TIMEOUT', 60)
+
+    # Model -> (URL field, storage folder)
+    MEDIA_FIELDS = {
+        VideoGeneration: ('video_url', 'videos'),
+        ImageGeneration: ('image_url', 'images'),
+    }
+
+    # Caps concurrent downloads across the background executor and the backfill command
+    _download_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def get_storage():
+        """Storage backend used for mirrored media (STORAGES alias, MEDIA_ROOT by default)"""
+        return storages[MediaMirrorService.STORAGE_ALIAS]
+
+    @staticmethod
+    def _guess_extension(url, content_type):
+        """Pick a file extension from the source URL, falling back to the Content-Type"""
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext and len(ext) <= 6:
+            return ext
+        if content_type:
+            guessed = mimetypes.guess_extension(content_type.split(';')[0].strip())
+            if guessed:
+                return guessed
+        return '.bin'
+
+    @staticmethod
+    def download_to_tempfile(url):
+        """
+        Stream a remote file to a temporary file in fixed-size chunks.
+        Memory use is bounded by CHUNK_SIZE regardless of the file size.
+
+        Returns:
+            (temp_file, size, content_type, sha256) - temp_file is positioned
+            at 0 and removed automatically when closed.
+        """
+        import requests
+
+        temp_file = tempfile.NamedTemporaryFile(suffix='.part')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with MediaMirrorService._download_slots:
+                with requests.get(
+                    url,
+                    stream=True,
+                    timeout=(MediaMirrorService.CONNECT_TIMEOUT, MediaMirrorService.READ_TIMEOUT),
+                ) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get('Content-Type', '')
+                    for chunk in response.iter_content(chunk_size=MediaMirrorService.CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        size += len(chunk)
+                        if size > MediaMirrorService.MAX_BYTES:
+                            raise ValueError(
+                                f"Media exceeds size limit of {MediaMirrorService.MAX_BYTES} bytes: {url}"
+                            )
+                        digest.update(chunk)
+                        temp_file.write(chunk)
+            temp_file.flush()
+            temp_file.seek(0)
+            return temp_file, size, content_type, digest.hexdigest()
+        except Exception:
+            temp_file.close()
+            raise
+
+    @staticmethod
+    def mirror_generation(generation):
+        """
+        Copy a completed generation's result into our storage and record its
+        media_path. The provider URL stays in the URL field; the API serves the
+        copy through signed URLs (SignedMediaService).
+
+        Returns:
+            True if the row was mirrored, False if there was nothing to do
+        """
+        model = type(generation)
+        url_field, folder = MediaMirrorService.MEDIA_FIELDS[model]
+        source_url = getattr(generation, url_field)
+
+        if generation.status != 'completed' or not source_url or generation.media_path:
+            return False
+
+        temp_file, size, content_type, sha256 = MediaMirrorService.download_to_tempfile(source_url)
+        try:
+            ext = MediaMirrorService._guess_extension(source_url, content_type)
+            blob = MediaBlobService.store(temp_file, sha256, size, ext, content_type)
+        finally:
+            temp_file.close()
+
+        # Only record the copy if the URL is still the one we downloaded (row may have changed meanwhile)
+        updated = model.objects.filter(
+            pk=generation.pk,
+            **{url_field: source_url},
+        ).update(
+            media_path=blob.path,
+            media_blob=blob,
+            updated_at=timezone.now(),
+        )
+
+        if not updated:
+            MediaBlobService.release(blob.pk)
+            logger.info(f"Media mirror skipped, row changed - {model.__name__} ID: {generation.pk}")
+            return False
+
+        generation.media_path = blob.path
+        generation.media_blob = blob
+        logger.info(f"Media mirrored - {model.__name__} ID: {generation.pk}, Size: {size}, Path: {blob.path}")
+        return True
+
+    @staticmethod
+    def _run_job(model, generation_id):
+        """
+        Background pipeline job: mirror the result, then render its thumbnail.
+        Never raises, always releases the thread's DB connection.
+        """
+        from .thumbnail_service import ThumbnailService
+
+        try:
+            try:
+                generation = model.objects.get(pk=generation_id)
+            except model.DoesNotExist:
+                return False
+
+            mirrored = thumbnailed = False
+            if MediaMirrorService.ENABLED:
+                try:
+                    mirrored = MediaMirrorService.mirror_generation(generation)
+                except Exception as e:
+                    logger.error(f"Media mirror failed - {model.__name__} ID: {generation_id}, Error: {str(e)}", exc_info=True)
+            if ThumbnailService.ENABLED:
+                try:
+                    thumbnailed = ThumbnailService.generate(generation)
+                except Exception as e:
+                    logger.error(f"Thumbnail failed - {model.__name__} ID: {generation_id}, Error: {str(e)}", exc_info=True)
+            return mirrored or thumbnailed
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_executor():
+        """Lazily create the shared background executor"""
+        with MediaMirrorService._executor_lock:
+            if MediaMirrorService._executor is None:
+                MediaMirrorService._executor = ThreadPoolExecutor(
+                    max_workers=MediaMirrorService.MAX_CONCURRENCY,
+                    thread_name_prefix='media-mirror',
+                )
+            return MediaMirrorService._executor
+
+    @staticmethod
+    def schedule(generation):
+        """
+        Queue a completed generation for the media pipeline (mirror + thumbnail)
+        without blocking the request. Rows missed here (worker restart,
+        download error) are picked up by `python manage.py mirror_media`.
+        """
+        from .thumbnail_service import ThumbnailService
+
+        if not (MediaMirrorService.ENABLED or ThumbnailService.ENABLED):
+            return None
+        return MediaMirrorService.get_executor().submit(
+            MediaMirrorService._run_job, type(generation), generation.pk
+        )
+
+
+class MediaBlobService:
+    """
+    Content-addressed storage with reference counting.
+    Blobs whose ref_count drops to 0 are removed later, in chunks, by
+    `python manage.py gc_media_blobs`.
+    """
+
+    GC_GRACE_HOURS = getattr(settings, 'MEDIA_BLOB_GC_GRACE_HOURS', 24)
+
+    @staticmethod
+    def hash_file(fileobj, chunk_size=None):
+        """SHA-256 and size of an open file, read in chunks (file is rewound)"""
+        digest = hashlib.sha256()
+        size = 0
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(chunk_size or MediaMirrorService.CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+        fileobj.seek(0)
+        return digest.hexdigest(), size
+
+    @staticmethod
+    def blob_path(sha256, ext):
+        return f"cas/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+    @staticmethod
+    def store(fileobj, sha256, size, ext='', content_type='', acquire=True):
+        """
+        Store bytes under their content hash and take a reference.
+        If a blob with the same hash already exists, nothing is written.
+
+        Args:
+            fileobj: Open file positioned at 0
+            acquire: Increment ref_count (pass False for uploads that are
+                     referenced later, see acquire())
+
+        Returns:
+            MediaBlob instance
+        """
+        storage = MediaMirrorService.get_storage()
+        with transaction.atomic():
+            # Lock (or create) the row before looking at the file: gc_media_blobs
+            # skips locked rows, and a blob it is deleting blocks us until it is gone
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                sha256=sha256,
+                defaults={
+                    'path': MediaBlobService.blob_path(sha256, ext),
+                    'size': size,
+                    'content_type': content_type[:100],
+                    # Unreferenced uploads become GC-eligible after the grace period
+                    'orphaned_at': None if acquire else timezone.now(),
+                },
+            )
+            if not storage.exists(blob.path):
+                fileobj.seek(0)
+                saved_name = storage.save(blob.path, File(fileobj, name=os.path.basename(blob.path)))
+                if saved_name != blob.path:
+                    # The file appeared meanwhile (written outside store()) - keep it
+                    storage.delete(saved_name)
+            if acquire:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, orphaned_at=None)
+                blob.ref_count += 1
+                blob.orphaned_at = None
+            elif not created and blob.orphaned_at is not None:
+                # A reused orphan restarts its grace period, so GC cannot take it before acquire()
+                blob.orphaned_at = timezone.now()
+                MediaBlob.objects.filter(pk=blob.pk).update(orphaned_at=blob.orphaned_at)
+
+        if not created:
+            logger.info(f"Media blob deduplicated - SHA256: {sha256[:12]}, Size: {size}")
+        return blob
+
+    @staticmethod
+    def acquire(blob_id):
+        """Take an additional reference on a blob"""
+        MediaBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + 1, orphaned_at=None)
+
+    @staticmethod
+    def release(blob_id):
+        """Drop a reference; the blob becomes GC-eligible once nothing points at it"""
+        if not blob_id:
+            return
+        MediaBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+        MediaBlob.objects.filter(pk=blob_id, ref_count__lte=0, orphaned_at__isnull=True).update(
+            orphaned_at=timezone.now()
+        )
+
+    @staticmethod
+    def release_many(counts):
+        """Drop several references at once; counts is {blob_id: references}"""
+        by_count = {}
+        for blob_id, count in counts.items():
+            by_count.setdefault(count, []).append(blob_id)
+        for count, blob_ids in by_count.items():
+            MediaBlob.objects.filter(pk__in=blob_ids).update(ref_count=F('ref_count') - count)
+        MediaBlob.objects.filter(pk__in=list(counts), ref_count__lte=0, orphaned_at__isnull=True).update(
+            orphaned_at=timezone.now()
+        )
+
+    @staticmethod
+    def stats():
+        """
+        Dedupe report.
+        logical_bytes: bytes we would store without dedupe (size x references)
+        physical_bytes: bytes actually stored
+        """
+        live = MediaBlob.objects.filter(ref_count__gt=0)
+        totals = live.aggregate(physical=Sum('size'), logical=Sum(F('size') * F('ref_count')))
+        physical = totals['physical'] or 0
+        logical = totals['logical'] or 0
+        return {
+            'blobs': live.count(),
+            'orphaned_blobs': MediaBlob.objects.filter(ref_count__lte=0).count(),
+            'physical_bytes': physical,
+            'logical_bytes': logical,
+            'dedupe_ratio': round(logical / physical, 3) if physical else 1.0,
+        }
+
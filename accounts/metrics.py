@@ -0,0 +1,376 @@
+"""
+Request and domain metrics in the Prometheus text format
+MetricsMiddleware records a latency histogram, status counts and an
+in-flight gauge per URL name (routes outside accounts/urls.py are grouped as
+'other', unresolved paths as 'unmatched', so label cardinality stays fixed).
+
+Hot path: every thread writes only to its own shard of plain dicts, so
+recording takes no lock; a scrape copies and sums the shards. When a thread
+exits its shard is folded into a retired-totals shard, so thread-per-request
+servers do not grow the shard list without bound. With several
+gunicorn workers set METRICS_MULTIPROC_DIR: each worker dumps its totals to
+<dir>/metrics-<pid>.json every METRICS_FLUSH_INTERVAL seconds and a scrape
+(served by whichever worker gets it) merges all files. Counters of exited
+workers are kept; their in-flight gauges are dropped. Empty the directory
+when the service (re)starts.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'burlart'
+
+
+def _new_shard():
+    # latency: (view, method) -> [count per bucket..., +Inf count, sum of seconds]
+    # phases: (view, phase) -> [seconds, calls] (see accounts.server_timing)
+    return {'latency': {}, 'status': {}, 'in_flight': {}, 'phases': {}}
+
+
+class _ShardOwner:
+    """Held only by the thread's local storage, so it is collected when the thread exits"""
+    __slots__ = ('shard', '__weakref__')
+
+
+class MetricsRegistry:
+    """Per-process request metrics, sharded per thread"""
+
+    # Configuration from Django settings
+    BUCKETS = tuple(getattr(settings, 'METRICS_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)))
+    MULTIPROC_DIR = getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+    FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)  # Seconds
+
+    def __init__(self):
+        self._local = threading.local()
+        self._retired = _new_shard()  # Totals of threads that have exited
+        self._shards = [self._retired]
+        self._shards_lock = threading.RLock()  # Only taken when a thread creates or retires its shard
+        self._flusher = None
+
+    def _shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = _ShardOwner()
+            owner.shard = _new_shard()
+            with self._shards_lock:
+                self._shards.append(owner.shard)
+            weakref.finalize(owner, self._retire, owner.shard)
+            if self.MULTIPROC_DIR and self._flusher is None:
+                self._start_flusher()
+        return owner.shard
+
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the retired totals (its in-flight gauge is back to 0)"""
+        with self._shards_lock:
+            if not any(live is shard for live in self._shards):
+                return  # From before reset()
+            self._shards = [live for live in self._shards if live is not shard]
+            retired = self._retired
+            for key, row in shard['latency'].items():
+                total = retired['latency'].setdefault(key, [0] * len(row))
+                for i, value in enumerate(row):
+                    total[i] += value
+            for key, count in shard['status'].items():
+                retired['status'][key] = retired['status'].get(key, 0) + count
+            for key, (seconds, calls) in shard['phases'].items():
+                total = retired['phases'].setdefault(key, [0.0, 0])
+                total[0] += seconds
+                total[1] += calls
+
+    def request_started(self, view):
+        in_flight = self._shard()['in_flight']
+        in_flight[view] = in_flight.get(view, 0) + 1
+
+    def request_finished(self, view, method, status, seconds, started=True):
+        shard = self._shard()
+        if started:
+            shard['in_flight'][view] -= 1
+        row = shard['latency'].get((view, method))
+        if row is None:
+            row = shard['latency'][(view, method)] = [0] * (len(self.BUCKETS) + 2)
+        row[bisect_left(self.BUCKETS, seconds)] += 1
+        row[-1] += seconds
+        key = (view, method, str(status))
+        shard['status'][key] = shard['status'].get(key, 0) + 1
+
+    def record_phases(self, view, timings):
+        """Add one request's DB / outbound HTTP / serialization time to the per-view totals"""
+        phases = self._shard()['phases']
+        for phase, seconds in timings.durations.items():
+            row = phases.get((view, phase))
+            if row is None:
+                row = phases[(view, phase)] = [0.0, 0]
+            row[0] += seconds
+            row[1] += timings.counts[phase]
+
+    def snapshot(self):
+        """Totals of this process: plain JSON-friendly lists"""
+        latency, status, in_flight, phases = {}, {}, {}, {}
+        # Under the lock so a thread retiring mid-scrape is not counted twice; writers never take it
+        with self._shards_lock:
+            for shard in self._shards:
+                # dict.copy() and list() are atomic under the GIL; writers never block on us
+                for key, row in shard['latency'].copy().items():
+                    row = list(row)
+                    total = latency.setdefault(key, [0] * len(row))
+                    for i, value in enumerate(row):
+                        total[i] += value
+                for key, count in shard['status'].copy().items():
+                    status[key] = status.get(key, 0) + count
+                for key, count in shard['in_flight'].copy().items():
+                    in_flight[key] = in_flight.get(key, 0) + count
+                for key, (seconds, calls) in shard['phases'].copy().items():
+                    total = phases.setdefault(key, [0.0, 0])
+                    total[0] += seconds
+                    total[1] += calls
+        return {
+            'pid': os.getpid(),
+            'buckets': list(self.BUCKETS),
+            'latency': [[*key, row] for key, row in latency.items()],
+            'status': [[*key, count] for key, count in status.items()],
+            'in_flight': [[key, count] for key, count in in_flight.items()],
+            'phases': [[*key, *row] for key, row in phases.items()],
+            'clients': _client_counters(),
+        }
+
+    def reset(self):
+        """Forget this process's totals (after fork the parent's requests are not ours)"""
+        self._local = threading.local()
+        self._retired = _new_shard()
+        self._shards = [self._retired]
+        self._shards_lock = threading.RLock()
+        self._flusher = None
+
+    # Multi-process support
+
+    def _path(self, pid):
+        return os.path.join(self.MULTIPROC_DIR, f'metrics-{pid}.json')
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Metrics flush failed: {str(e)}")
+
+    def flush(self):
+        """Write this process's snapshot to the multiprocess directory (atomically)"""
+        if not self.MULTIPROC_DIR:
+            return
+        os.makedirs(self.MULTIPROC_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.MULTIPROC_DIR, prefix='.metrics-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self._path(os.getpid()))
+
+    def collect(self):
+        """Snapshots of every process: the live one for this process, files for the others"""
+        own = self.snapshot()
+        if not self.MULTIPROC_DIR:
+            return [own]
+        self.flush()
+        snapshots = [own]
+        try:
+            names = os.listdir(self.MULTIPROC_DIR)
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            if not (name.startswith('metrics-') and name.endswith('.json')) or name == f'metrics-{own["pid"]}.json':
+                continue
+            try:
+                with open(os.path.join(self.MULTIPROC_DIR, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # Being replaced right now, or truncated by a crash
+            if not _pid_alive(snapshot.get('pid')):
+                snapshot['in_flight'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (TypeError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _client_counters():
+    """Counters of the pooled outbound HTTP clients of this process (E-point)"""
+    from .http_client import clients
+
+    result = {}
+    for client in clients():
+        metrics = client.metrics()
+        result[client.name] = {
+            key: value for key, value in metrics.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+    return result
+
+
+registry = MetricsRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+# Exposition
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _merge(snapshots):
+    buckets = None
+    latency, status, in_flight, phases, clients = {}, {}, {}, {}, {}
+    for snapshot in snapshots:
+        if buckets is None:
+            buckets = snapshot['buckets']
+        elif snapshot['buckets'] != buckets:
+            logger.warning(f"Skipping metrics of pid {snapshot.get('pid')}: different METRICS_BUCKETS")
+            continue
+        for view, method, row in snapshot['latency']:
+            total = latency.setdefault((view, method), [0] * len(row))
+            for i, value in enumerate(row):
+                total[i] += value
+        for view, method, code, count in snapshot['status']:
+            status[(view, method, code)] = status.get((view, method, code), 0) + count
+        for view, count in snapshot['in_flight']:
+            in_flight[view] = in_flight.get(view, 0) + count
+        for view, phase, seconds, calls in snapshot.get('phases', []):
+            total = phases.setdefault((view, phase), [0.0, 0])
+            total[0] += seconds
+            total[1] += calls
+        for name, counters in snapshot.get('clients', {}).items():
+            total = clients.setdefault(name, {})
+            for key, value in counters.items():
+                total[key] = total.get(key, 0) + value
+    return buckets or list(MetricsRegistry.BUCKETS), latency, status, in_flight, phases, clients
+
+
+def render_request_metrics(snapshots):
+    buckets, latency, status, in_flight, phases, clients = _merge(snapshots)
+    lines = [
+        f'# HELP {PREFIX}_http_request_duration_seconds Request latency by URL name',
+        f'# TYPE {PREFIX}_http_request_duration_seconds histogram',
+    ]
+    for (view, method), row in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip([*buckets, '+Inf'], row[:-1]):
+            cumulative += count
+            lines.append(f'{PREFIX}_http_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {cumulative}')
+        lines.append(f'{PREFIX}_http_request_duration_seconds_sum{_labels(view=view, method=method)} {row[-1]:.6f}')
+        lines.append(f'{PREFIX}_http_request_duration_seconds_count{_labels(view=view, method=method)} {cumulative}')
+
+    lines += [
+        f'# HELP {PREFIX}_http_responses_total Responses by URL name and status code',
+        f'# TYPE {PREFIX}_http_responses_total counter',
+    ]
+    for (view, method, code), count in sorted(status.items()):
+        lines.append(f'{PREFIX}_http_responses_total{_labels(view=view, method=method, status=code)} {count}')
+
+    lines += [
+        f'# HELP {PREFIX}_http_requests_in_flight Requests being handled right now',
+        f'# TYPE {PREFIX}_http_requests_in_flight gauge',
+    ]
+    for view, count in sorted(in_flight.items()):
+        lines.append(f'{PREFIX}_http_requests_in_flight{_labels(view=view)} {count}')
+
+    lines += [
+        f'# HELP {PREFIX}_http_request_phase_seconds_total Time spent in DB, outbound HTTP and serialization by URL name',
+        f'# TYPE {PREFIX}_http_request_phase_seconds_total counter',
+    ]
+    for (view, phase), (seconds, _) in sorted(phases.items()):
+        lines.append(f'{PREFIX}_http_request_phase_seconds_total{_labels(view=view, phase=phase)} {seconds:.6f}')
+    lines += [
+        f'# HELP {PREFIX}_http_request_phase_calls_total Queries, outbound calls and serializations by URL name',
+        f'# TYPE {PREFIX}_http_request_phase_calls_total counter',
+    ]
+    for (view, phase), (_, calls) in sorted(phases.items()):
+        lines.append(f'{PREFIX}_http_request_phase_calls_total{_labels(view=view, phase=phase)} {calls}')
+
+    if clients:
+        lines += [
+            f'# HELP {PREFIX}_http_client_events_total Outbound client requests, attempts, retries and errors',
+            f'# TYPE {PREFIX}_http_client_events_total counter',
+        ]
+        for name, counters in sorted(clients.items()):
+            for key, value in sorted(counters.items()):
+                if key != 'in_flight':
+                    lines.append(f'{PREFIX}_http_client_events_total{_labels(client=name, event=key)} {value}')
+        lines += [
+            f'# HELP {PREFIX}_http_client_in_flight Outbound client calls in progress',
+            f'# TYPE {PREFIX}_http_client_in_flight gauge',
+        ]
+        for name, counters in sorted(clients.items()):
+            lines.append(f'{PREFIX}_http_client_in_flight{_labels(client=name)} {counters.get("in_flight", 0)}')
+    return lines
+
+
+def render_domain_metrics():
+    """Gauges read from the database at scrape time (one aggregate query each)"""
+    from django.db.models import Count, Sum
+    from .models import CreditHold, VideoGeneration, ImageGeneration, Payment
+
+    held = CreditHold.objects.filter(status='hold').aggregate(total=Sum('credits_held'))['total'] or 0
+    lines = [
+        f'# HELP {PREFIX}_credits_held Credits reserved by open holds',
+        f'# TYPE {PREFIX}_credits_held gauge',
+        f'{PREFIX}_credits_held {held}',
+        f'# HELP {PREFIX}_generations_processing Generations waiting on fal.ai',
+        f'# TYPE {PREFIX}_generations_processing gauge',
+    ]
+    for kind, model in (('video', VideoGeneration), ('image', ImageGeneration)):
+        counts = dict(model.objects.filter(status='processing').values_list('tool').annotate(n=Count('id')).order_by())
+        for tool, _ in model.TOOL_CHOICES:
+            lines.append(f'{PREFIX}_generations_processing{_labels(kind=kind, tool=tool)} {counts.get(tool, 0)}')
+
+    pending = dict(
+        Payment.objects.filter(status__in=['pending', 'processing']).values_list('payment_type').annotate(n=Count('id')).order_by()
+    )
+    lines += [
+        f'# HELP {PREFIX}_payments_pending Payments not yet settled by E-point',
+        f'# TYPE {PREFIX}_payments_pending gauge',
+    ]
+    for payment_type, _ in Payment.PAYMENT_TYPE_CHOICES:
+        lines.append(f'{PREFIX}_payments_pending{_labels(type=payment_type)} {pending.get(payment_type, 0)}')
+    return lines
+
+
+def render():
+    """Full scrape body"""
+    lines = render_request_metrics(registry.collect())
+    try:
+        lines += render_domain_metrics()
+        up = 1
+    except Exception as e:
+        logger.error(f"Domain metrics query failed: {str(e)}")
+        up = 0
+    lines += [
+        f'# HELP {PREFIX}_domain_metrics_up Whether the domain gauges could be read from the database',
+        f'# TYPE {PREFIX}_domain_metrics_up gauge',
+        f'{PREFIX}_domain_metrics_up {up}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,163 @@
+"""
+Request middleware for the accounts app
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import server_timing
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and in-flight requests per URL name (see accounts.metrics).
+    Place it first in MIDDLEWARE so the measured time covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        from . import urls
+
+        self.get_response = get_response
+        self.url_names = frozenset(pattern.name for pattern in urls.urlpatterns if pattern.name)
+
+    def __call__(self, request):
+        request._metrics_view = None
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            view = request._metrics_view or self._label(request)
+            registry.request_finished(
+                view, request.method, response.status_code if response is not None else 500,
+                time.perf_counter() - start, started=request._metrics_view is not None,
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # URL resolution has happened by now; count the request as in flight under its name
+        view = self._label(request)
+        registry.request_started(view)
+        request._metrics_view = view
+
+    def _label(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        if match.url_name in self.url_names:
+            return match.url_name
+        return 'other'
+
+
+class ServerTimingMiddleware:
+    """
+    Break each request into DB, outbound HTTP and serialization time (see accounts.server_timing).
+    Totals always feed the per-view phase counters on /metrics; the
+    Server-Timing header is only sent to staff users and a
+    SERVER_TIMING_SAMPLE_RATE share of other requests.
+    Place it after MetricsMiddleware, which names the view.
+    """
+
+    # Configuration from Django settings
+    ENABLED = getattr(settings, 'SERVER_TIMING_ENABLED', True)
+    SAMPLE_RATE = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 0.0)
+
+    def __init__(self, get_response):
+        if not ServerTimingMiddleware.ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = server_timing.begin()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(server_timing.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            timings = server_timing.end(token)
+
+        registry.record_phases(getattr(request, '_metrics_view', None) or 'unmatched', timings)
+        if self._expose(request):
+            response['Server-Timing'] = timings.header()
+        return response
+
+    def _expose(self, request):
+        # request.user is the DRF-authenticated (JWT) user once the view has run
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        return ServerTimingMiddleware.SAMPLE_RATE > 0 and random.random() < ServerTimingMiddleware.SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request on demand (see accounts.profiling).
+    A staff user (admin session or JWT) sends `X-Profile: 1`, or
+    `X-Profile: cprofile` / `X-Profile: sample` to pick the profiler; a
+    PROFILING_SAMPLE_RATE share of all requests is profiled with the default
+    mode. The response carries X-Profile-Id, the RequestProfile in the admin.
+    Place it after AuthenticationMiddleware.
+    """
+
+    # Configuration from Django settings
+    ENABLED = getattr(settings, 'PROFILING_ENABLED', True)
+    SAMPLE_RATE = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+    HEADER = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        if not ProfilingMiddleware.ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .profiling import ProfileService
+
+        mode, trigger, user = None, None, None
+        requested = request.META.get(self.HEADER)
+        if requested:
+            user = self._staff_user(request)
+            if user is not None:
+                mode = requested if requested in ProfileService.MODES else ProfileService.DEFAULT_MODE
+                trigger = 'header'
+        if mode is None and ProfilingMiddleware.SAMPLE_RATE > 0 and random.random() < ProfilingMiddleware.SAMPLE_RATE:
+            mode, trigger = ProfileService.DEFAULT_MODE, 'sample'
+        if mode is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response, data = ProfileService.run(mode, lambda: self.get_response(request))
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        if data is None:
+            response['X-Profile-Id'] = 'busy'  # Another profile is running in this worker
+            return response
+        try:
+            profile = ProfileService.save(data, mode, request, response, duration_ms, trigger, user=user)
+            response['X-Profile-Id'] = str(profile.pk)
+        except Exception as e:
+            # Never fail the profiled request because the profile could not be stored
+            logger.error(f"Could not store request profile: {str(e)}", exc_info=True)
+        return response
+
+    def _staff_user(self, request):
+        """The staff user behind the request (admin session or JWT), authenticated before the view runs"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user if user.is_staff else None
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework.exceptions import AuthenticationFailed
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if result is None or not result[0].is_staff:
+            return None
+        return result[0]
@@ -0,0 +1,102 @@
+"""
+Migration operations for large tables
+On PostgreSQL, adding a CHECK or FOREIGN KEY constraint, or SET NOT NULL,
+scans the whole table under an ACCESS EXCLUSIVE lock. These operations add
+the constraint NOT VALID (a catalog change only) and VALIDATE it separately;
+validation scans under SHARE UPDATE EXCLUSIVE, so reads and writes carry on.
+SET NOT NULL then reuses the validated CHECK and skips its scan
+(PostgreSQL 12+). On other databases they behave like the stock operations.
+"""
+from django.db import migrations
+
+
+def _leaf_tables(schema_editor, table):
+    """The partitions of a partitioned table, or the table itself"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [table],
+        )
+        partitions = [row[0] for row in cursor.fetchall()]
+    return partitions or [table]
+
+
+class AddNullableFieldNotValid(migrations.AddField):
+    """
+    AddField for a nullable column. On PostgreSQL the column is added bare and
+    its CHECK / FOREIGN KEY constraints are added NOT VALID, then validated.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+        model = to_state.apps.get_model(app_label, self.model_name)
+        field = model._meta.get_field(self.name)
+        if not field.null or field.db_index or field.unique:
+            raise ValueError(f'{self.__class__.__name__} only adds plain nullable columns')
+        connection = schema_editor.connection
+        quote = schema_editor.quote_name
+        table, column = model._meta.db_table, field.column
+
+        schema_editor.execute(
+            f'ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {field.db_type(connection)} NULL'
+        )
+        constraints = []
+        check = field.db_check(connection)
+        if check:
+            name = f'{table}_{column}_check'
+            schema_editor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} CHECK ({check}) NOT VALID')
+            constraints.append(name)
+        if field.remote_field and field.db_constraint:
+            target = field.target_field
+            name = f'{table}_{column}_fk'
+            schema_editor.execute(
+                f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(column)}) '
+                f'REFERENCES {quote(target.model._meta.db_table)} ({quote(target.column)}) '
+                f'DEFERRABLE INITIALLY DEFERRED NOT VALID'
+            )
+            constraints.append(name)
+        for name in constraints:
+            schema_editor.execute(f'ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(name)}')
+
+
+class SetNotNullNotValid(migrations.AlterField):
+    """
+    AlterField that only makes a column NOT NULL. On PostgreSQL each table (or
+    each partition) gets a NOT VALID `IS NOT NULL` check, validated before
+    SET NOT NULL, and dropped afterwards.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+        old_field = from_state.apps.get_model(app_label, self.model_name)._meta.get_field(self.name)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        field = model._meta.get_field(self.name)
+        connection = schema_editor.connection
+        if not old_field.null or field.null or old_field.column != field.column \
+                or old_field.db_type(connection) != field.db_type(connection):
+            raise ValueError(f'{self.__class__.__name__} only changes null=True to null=False')
+        quote = schema_editor.quote_name
+        table, column = model._meta.db_table, field.column
+
+        leaves = _leaf_tables(schema_editor, table)
+        for leaf in leaves:
+            name = f'{leaf}_{column}_notnull'
+            schema_editor.execute(
+                f'ALTER TABLE {quote(leaf)} ADD CONSTRAINT {quote(name)} CHECK ({quote(column)} IS NOT NULL) NOT VALID'
+            )
+            schema_editor.execute(f'ALTER TABLE {quote(leaf)} VALIDATE CONSTRAINT {quote(name)}')
+            schema_editor.execute(f'ALTER TABLE {quote(leaf)} ALTER COLUMN {quote(column)} SET NOT NULL')
+            schema_editor.execute(f'ALTER TABLE {quote(leaf)} DROP CONSTRAINT {quote(name)}')
+        if leaves != [table]:
+            # Every partition is already NOT NULL, so the parent does not scan them again
+            schema_editor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN {quote(column)} SET NOT NULL')
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        # DROP NOT NULL needs no scan. AlterField would route through database_forwards
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
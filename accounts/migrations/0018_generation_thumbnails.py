@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_media_mirror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagegeneration',
+            name='thumbnail_path',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='videogeneration',
+            name='thumbnail_path',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videogeneration',
+            name='reference_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.mediablob'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_payment_webhook_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationLatencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('video', 'Video'), ('image', 'Image')], max_length=10)),
+                ('tool', models.CharField(max_length=20)),
+                ('hour', models.DateTimeField()),
+                ('completed', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('queue_ms', models.JSONField(default=list)),
+                ('inference_ms', models.JSONField(default=list)),
+                ('overhead_ms', models.JSONField(default=list)),
+                ('total_ms', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-hour', 'kind', 'tool'],
+            },
+        ),
+        migrations.AddField(
+            model_name='imagegeneration',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagegeneration',
+            name='overhead_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagegeneration',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='imagegeneration',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videogeneration',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videogeneration',
+            name='overhead_ms',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videogeneration',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videogeneration',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='imagegeneration',
+            index=models.Index(fields=['finished_at'], name='imagegen_finished_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videogeneration',
+            index=models.Index(fields=['finished_at'], name='videogen_finished_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generationlatencyrollup',
+            index=models.Index(fields=['hour', 'kind'], name='accounts_ge_hour_c46f84_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='generationlatencyrollup',
+            constraint=models.UniqueConstraint(fields=('kind', 'tool', 'hour'), name='uniq_latency_rollup_hour'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_request_profiles'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='credithold',
+            name='accounts_cr_user_id_ed7812_idx',
+        ),
+        migrations.AddIndex(
+            model_name='credithold',
+            index=models.Index(condition=models.Q(('status', 'hold')), fields=['user'], name='credithold_user_held_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imagegeneration',
+            index=models.Index(fields=['user', '-created_at'], name='imagegen_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imagegeneration',
+            index=models.Index(condition=models.Q(('fal_request_id__isnull', False)), fields=['fal_request_id'], name='imagegen_fal_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('epoint_transaction_id__isnull', False)), fields=['epoint_transaction_id'], name='payment_epoint_txn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'period_end', 'auto_renew'], name='subscription_renewal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videogeneration',
+            index=models.Index(fields=['user', '-created_at'], name='videogen_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videogeneration',
+            index=models.Index(condition=models.Q(('fal_request_id__isnull', False)), fields=['fal_request_id'], name='videogen_fal_request_idx'),
+        ),
+    ]
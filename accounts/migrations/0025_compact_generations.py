@@ -0,0 +1,167 @@
+# Compact generation rows, expand phase: tool and status get small-int code
+# columns (tool_code, status_code), and the repeated fal.ai model id moves to
+# GenerationModelVersion (model_version).
+#
+# Non-atomic: the new nullable columns are added (on PostgreSQL with their
+# constraints NOT VALID, then validated) and filled in id-range chunks that
+# each commit on their own, so the generation tables are never locked for long.
+# The old string columns stay, nullable, for code that still writes them.
+#
+# Deploy: migrate to this migration, deploy the code that uses the
+# code columns, then run 0026_compact_generations_contract, which fills the
+# rows old code inserted meanwhile and drops the string columns.
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+from accounts.migration_operations import AddNullableFieldNotValid
+
+CHUNK_SIZE = 5000
+
+STATUS_CHOICES = [('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')]
+STATUS_CODES = {'pending': 1, 'processing': 2, 'completed': 3, 'failed': 4}
+VIDEO_TOOL_CHOICES = [
+    ('pika', 'Pika Labs'), ('seedance', 'Seedance'), ('wan', 'Wan'), ('luma', 'Luma AI'), ('kling', 'Kling AI'),
+    ('veo', 'Veo'), ('sora', 'Sora'), ('sora-i2v', 'Sora (Image-to-Video)'), ('veo-i2v', 'Veo (Image-to-Video)'),
+    ('kling-i2v', 'Kling AI (Image-to-Video)'), ('luma-i2v', 'Luma Photon (Image-to-Video)'),
+    ('seedance-i2v', 'Seedance (Image-to-Video)'), ('pika-i2v', 'Pika Labs (Image-to-Video)'),
+    ('gpt-image-i2v', 'GPT Image (Image-to-Video)'), ('nano-banana-i2v', 'Nano Banana (Image-to-Video)'),
+    ('seedream-i2v', 'Seedream (Image-to-Video)'), ('flux-i2v', 'Flux (Image-to-Video)'),
+    ('z-image-i2v', 'Z-Image (Image-to-Video)'), ('qwen-i2v', 'Qwen (Image-to-Video)'),
+]
+VIDEO_TOOL_CODES = {
+    'pika': 1, 'seedance': 2, 'wan': 3, 'luma': 4, 'kling': 5, 'veo': 6, 'sora': 7,
+    'sora-i2v': 8, 'veo-i2v': 9, 'kling-i2v': 10, 'luma-i2v': 11, 'seedance-i2v': 12, 'pika-i2v': 13,
+    'gpt-image-i2v': 14, 'nano-banana-i2v': 15, 'seedream-i2v': 16, 'flux-i2v': 17, 'z-image-i2v': 18,
+    'qwen-i2v': 19,
+}
+IMAGE_TOOL_CHOICES = [
+    ('gpt-image', 'GPT Image'), ('nano-banana', 'Nano Banana'), ('seedream', 'Seedream'), ('flux', 'Flux'),
+    ('z-image', 'Z-Image'), ('qwen', 'Qwen'),
+]
+IMAGE_TOOL_CODES = {'gpt-image': 1, 'nano-banana': 2, 'seedream': 3, 'flux': 4, 'z-image': 5, 'qwen': 6}
+
+GENERATIONS = (
+    ('videogeneration', 'video', VIDEO_TOOL_CODES, VIDEO_TOOL_CHOICES),
+    ('imagegeneration', 'image', IMAGE_TOOL_CODES, IMAGE_TOOL_CHOICES),
+)
+
+
+def _chunks(model):
+    bounds = model.objects.aggregate(low=models.Min('id'), high=models.Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, CHUNK_SIZE):
+        yield model.objects.filter(id__gte=start, id__lt=start + CHUNK_SIZE)
+
+
+def _case(field, mapping, output_field):
+    return models.Case(
+        *[models.When(**{field: key}, then=models.Value(value)) for key, value in mapping.items()],
+        default=None, output_field=output_field,
+    )
+
+
+def backfill(apps, schema_editor):
+    """Fill the code columns of rows that only have the string columns; safe to run again"""
+    GenerationModelVersion = apps.get_model('accounts', 'GenerationModelVersion')
+    for model_name, kind, tool_codes, _ in GENERATIONS:
+        model = apps.get_model('accounts', model_name)
+        pending = model.objects.filter(tool_code__isnull=True)
+
+        unknown = set(pending.exclude(tool__in=list(tool_codes)).values_list('tool', flat=True).distinct())
+        unknown |= set(pending.exclude(status__in=list(STATUS_CODES)).values_list('status', flat=True).distinct())
+        if unknown:
+            raise ValueError(f"{model_name} has tool/status values without a code: {sorted(unknown, key=str)}")
+
+        GenerationModelVersion.objects.bulk_create(
+            [
+                GenerationModelVersion(kind=kind, tool=tool, model_id=model_id)
+                for tool, model_id in pending.values_list('tool', 'model_id').distinct()
+            ],
+            ignore_conflicts=True,
+        )
+        version = GenerationModelVersion.objects.filter(
+            kind=kind, tool=models.OuterRef('tool'), model_id=models.OuterRef('model_id'),
+        ).values('id')[:1]
+        codes = {
+            'tool_code': _case('tool', tool_codes, models.PositiveSmallIntegerField()),
+            'status_code': _case('status', STATUS_CODES, models.PositiveSmallIntegerField()),
+            'model_version': models.Subquery(version),
+        }
+        for chunk in _chunks(model):
+            with transaction.atomic():
+                chunk.filter(tool_code__isnull=True).update(**codes)
+        # Rows inserted while the chunks ran (past the max id read at the start)
+        model.objects.filter(tool_code__isnull=True).update(**codes)
+
+
+def restore(apps, schema_editor):
+    """Fill the string columns back from the codes (unapplying the contract migration)"""
+    GenerationModelVersion = apps.get_model('accounts', 'GenerationModelVersion')
+    statuses = {code: value for value, code in STATUS_CODES.items()}
+    for model_name, _, tool_codes, _ in GENERATIONS:
+        model = apps.get_model('accounts', model_name)
+        tools = {code: value for value, code in tool_codes.items()}
+        model_id = GenerationModelVersion.objects.filter(id=models.OuterRef('model_version')).values('model_id')[:1]
+        for chunk in _chunks(model):
+            with transaction.atomic():
+                chunk.update(
+                    tool=_case('tool_code', tools, models.CharField()),
+                    status=_case('status_code', statuses, models.CharField()),
+                    model_id=models.Subquery(model_id),
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0024_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationModelVersion',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('video', 'Video'), ('image', 'Image')], max_length=10)),
+                ('tool', models.CharField(max_length=20)),
+                ('model_id', models.CharField(max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['kind', 'tool', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='generationmodelversion',
+            constraint=models.UniqueConstraint(fields=('kind', 'tool', 'model_id'), name='genmodelversion_unique'),
+        ),
+
+        # Nullable columns next to the old ones. The old columns become nullable too: code using the
+        # new columns no longer writes them, and unapplying 0026 re-adds them empty before restore()
+        *[
+            operation
+            for model_name, _, _, tool_choices in GENERATIONS
+            for operation in (
+                migrations.AlterField(model_name=model_name, name='model_id', field=models.CharField(max_length=200, null=True)),
+                migrations.AlterField(model_name=model_name, name='tool', field=models.CharField(choices=tool_choices, max_length=20, null=True)),
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='status',
+                    field=models.CharField(choices=STATUS_CHOICES, default='pending', max_length=20, null=True),
+                ),
+                AddNullableFieldNotValid(
+                    model_name=model_name,
+                    name='model_version',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.generationmodelversion'),
+                ),
+                AddNullableFieldNotValid(model_name=model_name, name='tool_code', field=models.PositiveSmallIntegerField(null=True)),
+                AddNullableFieldNotValid(model_name=model_name, name='status_code', field=models.PositiveSmallIntegerField(null=True)),
+            )
+        ],
+
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Compact generation rows, contract phase (expand is 0025_compact_generations).
+#
+# Run only after the code that reads and writes tool_code / status_code /
+# model_version is deployed everywhere: rows inserted by older code until then
+# only have the string columns, and are filled here first. Then the code
+# columns become NOT NULL (on PostgreSQL through validated NOT VALID checks,
+# see accounts.migration_operations) and the string columns are dropped. The
+# code columns keep their names; the model fields point at them with db_column.
+
+from importlib import import_module
+
+import accounts.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+from accounts.migration_operations import SetNotNullNotValid
+
+expand = import_module('accounts.migrations.0025_compact_generations')
+STATUS_CHOICES, STATUS_CODES, GENERATIONS = expand.STATUS_CHOICES, expand.STATUS_CODES, expand.GENERATIONS
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0025_compact_generations'),
+    ]
+
+    operations = [
+        # Catch up on rows older code inserted since 0025; unapplying refills the string columns
+        migrations.RunPython(expand.backfill, expand.restore),
+
+        *[
+            operation
+            for model_name, _, _, _ in GENERATIONS
+            for operation in (
+                SetNotNullNotValid(model_name=model_name, name='tool_code', field=models.PositiveSmallIntegerField()),
+                SetNotNullNotValid(model_name=model_name, name='status_code', field=models.PositiveSmallIntegerField()),
+                SetNotNullNotValid(
+                    model_name=model_name,
+                    name='model_version',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.generationmodelversion'),
+                ),
+            )
+        ],
+
+        # Drop the string columns. The code fields take over the names tool and status
+        # in the model state only; their columns stay tool_code and status_code
+        *[
+            migrations.SeparateDatabaseAndState(
+                database_operations=[
+                    migrations.RemoveField(model_name=model_name, name='model_id'),
+                    migrations.RemoveField(model_name=model_name, name='tool'),
+                    migrations.RemoveField(model_name=model_name, name='status'),
+                ],
+                state_operations=[
+                    migrations.RemoveField(model_name=model_name, name='model_id'),
+                    migrations.RemoveField(model_name=model_name, name='tool'),
+                    migrations.RemoveField(model_name=model_name, name='status'),
+                    migrations.RenameField(model_name=model_name, old_name='tool_code', new_name='tool'),
+                    migrations.RenameField(model_name=model_name, old_name='status_code', new_name='status'),
+                    migrations.AlterField(
+                        model_name=model_name,
+                        name='tool',
+                        field=accounts.fields.CodedChoiceField(choices=tool_choices, codes=tool_codes, db_column='tool_code'),
+                    ),
+                    migrations.AlterField(
+                        model_name=model_name,
+                        name='status',
+                        field=accounts.fields.CodedChoiceField(choices=STATUS_CHOICES, codes=STATUS_CODES, db_column='status_code', default='pending'),
+                    ),
+                ],
+            )
+            for model_name, _, tool_codes, tool_choices in GENERATIONS
+        ],
+    ]
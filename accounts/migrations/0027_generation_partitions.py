@@ -0,0 +1,187 @@
+# Generated by Django 4.2.30 on 2026-10-19 00:55
+#
+# Archive bookkeeping for accounts.generation_archive, and on PostgreSQL the
+# video and image generation tables become range-partitioned by created_at:
+# one partition per month from the oldest row through a few months ahead,
+# plus a DEFAULT partition. A partitioned table's primary key must include the
+# partition key, so it becomes (id, created_at); the credit hold foreign keys
+# therefore lose their database constraint. Other databases are unchanged.
+#
+# The tables are copied inside the migration's transaction and stay locked
+# until it commits: run it in a maintenance window sized to the tables.
+# Unapplying copies them back into plain tables.
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+GENERATION_TABLES = ('accounts_videogeneration', 'accounts_imagegeneration')
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _rebuild(schema_editor, table, partitioned):
+    """Copy table into a new one, range-partitioned by created_at or plain, keeping indexes, keys and ids"""
+    quote = schema_editor.quote_name
+    old = f'{table}_old'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [table, f'{table}_pkey'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [table],
+        )
+        identity = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {quote(name)} RENAME TO {quote(name + "_old")}')
+        cursor.execute(f'ALTER TABLE {quote(old)} RENAME CONSTRAINT {quote(table + "_pkey")} TO {quote(old + "_pkey")}')
+        for name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(old)} DROP CONSTRAINT {quote(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING IDENTITY INCLUDING STORAGE)' + (' PARTITION BY RANGE (created_at)' if partitioned else '')
+        )
+        if partitioned:
+            months_ahead = getattr(settings, 'GENERATION_PARTITION_MONTHS_AHEAD', 3)
+            now = timezone.now()
+            last = _add_months(date(now.year, now.month, 1), months_ahead)
+            cursor.execute(f'SELECT MIN(created_at) FROM {quote(old)}')
+            oldest = cursor.fetchone()[0] or now
+            month = date(oldest.year, oldest.month, 1)
+            while month <= last:
+                cursor.execute(
+                    f"CREATE TABLE {quote(f'{table}_p{month:%Y%m}')} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+                )
+                month = _add_months(month, 1)
+            cursor.execute(f'CREATE TABLE {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}')
+        if identity:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+                f"FROM {quote(table)}",
+                [table],
+            )
+        elif sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id')
+        cursor.execute(f'DROP TABLE {quote(old)}')
+        if identity:
+            # The new identity sequence was named around the old one (..._id_seq1); take the old name back
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            current = cursor.fetchone()[0]
+            if current != sequence:
+                cursor.execute(f'ALTER SEQUENCE {current} RENAME TO {quote(sequence.rpartition(".")[2])}')
+
+        key = 'id, created_at' if partitioned else 'id'
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + "_pkey")} PRIMARY KEY ({key})')
+        for name, definition in indexes:
+            # pg_indexes gives "CREATE INDEX name ON [ONLY] public.table USING ...", with the original name
+            cursor.execute(definition.replace(' ON ONLY ', ' ON ', 1))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+
+
+def partition_generations(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in GENERATION_TABLES:
+        _rebuild(schema_editor, table, partitioned=True)
+
+
+def unpartition_generations(apps, schema_editor):
+    """Back to plain tables, so the credit hold foreign keys can be restored"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in GENERATION_TABLES:
+        _rebuild(schema_editor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_compact_generations_contract'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('video', 'Video'), ('image', 'Image')], max_length=10)),
+                ('month', models.DateField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('rows', models.IntegerField()),
+                ('size_bytes', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-month', 'kind'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='credithold',
+            name='image_generation',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='credit_hold', to='accounts.imagegeneration'),
+        ),
+        migrations.AlterField(
+            model_name='credithold',
+            name='video_generation',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='credit_hold', to='accounts.videogeneration'),
+        ),
+        migrations.CreateModel(
+            name='GenerationArchiveUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rows', models.IntegerField()),
+                ('offset', models.BigIntegerField()),
+                ('length', models.BigIntegerField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='users', to='accounts.generationarchive')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='generationarchive',
+            constraint=models.UniqueConstraint(fields=('kind', 'month'), name='uniq_generation_archive_month'),
+        ),
+        migrations.AddConstraint(
+            model_name='generationarchiveuser',
+            constraint=models.UniqueConstraint(fields=('user', 'archive'), name='uniq_generation_archive_user'),
+        ),
+        migrations.CreateModel(
+            name='GenerationArchiveBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refs', models.IntegerField()),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.mediablob')),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blobs', to='accounts.generationarchiveuser')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='generationarchiveblob',
+            constraint=models.UniqueConstraint(fields=('segment', 'blob'), name='uniq_generation_archive_blob'),
+        ),
+        migrations.RunPython(partition_generations, unpartition_generations),
+    ]
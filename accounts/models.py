@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from .fields import CodedChoiceField
 from datetime import timedelta
 
 
@@ -68,6 +69,90 @@ class User(AbstractUser):
         return 0
 
 
+class MediaBlob(models.Model):
+    """
+    Content-addressed media file.
+    Identical bytes are stored once under their SHA-256 and shared by every
+    generation that produced them; ref_count tracks how many rows point here.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=500)  # Storage name (cas/ab/cd/<sha256>.<ext>)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    ref_count = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    orphaned_at = models.DateTimeField(null=True, blank=True)  # When ref_count dropped to 0 (GC grace period)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ref_count', 'orphaned_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} - {self.size} bytes - {self.ref_count} refs"
+
+
+class GenerationModelVersion(models.Model):
+    """
+    fal.ai model id a generation ran on.
+    A tool's model id changes when we move it to a newer fal.ai endpoint, so
+    generations keep a 2-byte reference here instead of repeating the id.
+    Rows are never changed, which lets every process cache the whole table.
+    """
+    KIND_CHOICES = [
+        ('video', 'Video'),
+        ('image', 'Image'),
+    ]
+    
+    id = models.SmallAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    tool = models.CharField(max_length=20)
+    model_id = models.CharField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    _by_key = {}  # (kind, tool, model_id) -> id
+    _by_id = {}  # id -> model_id
+    
+    class Meta:
+        ordering = ['kind', 'tool', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'tool', 'model_id'], name='genmodelversion_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} - {self.tool} - {self.model_id}"
+    
+    @classmethod
+    def _remember(cls, version):
+        cls._by_key[(version.kind, version.tool, version.model_id)] = version.id
+        cls._by_id[version.id] = version.model_id
+    
+    @classmethod
+    def _load(cls):
+        for version in cls.objects.all():
+            cls._remember(version)
+    
+    @classmethod
+    def resolve(cls, kind, tool, model_id):
+        """Id of the version row for this model id, created on first use"""
+        version_id = cls._by_key.get((kind, tool, model_id))
+        if version_id is None:
+            version, _ = cls.objects.get_or_create(kind=kind, tool=tool, model_id=model_id)
+            # Cache once committed, so a rolled-back insert never leaves a dangling id behind
+            transaction.on_commit(lambda: cls._remember(version))
+            version_id = version.id
+        return version_id
+    
+    @classmethod
+    def model_id_for(cls, version_id):
+        """Model id for a version id, from the per-process cache"""
+        if version_id is not None and version_id not in cls._by_id:
+            cls._load()
+        return cls._by_id.get(version_id)
+
+
 class VideoGeneration(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -75,6 +160,7 @@ class VideoGeneration(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    STATUS_CODES = {'pending': 1, 'processing': 2, 'completed': 3, 'failed': 4}  # Stored values; never renumber
     
     TOOL_CHOICES = [
         ('pika', 'Pika Labs'),
@@ -98,24 +184,50 @@ class VideoGeneration(models.Model):
         ('z-image-i2v', 'Z-Image (Image-to-Video)'),
         ('qwen-i2v', 'Qwen (Image-to-Video)'),
     ]
+    TOOL_CODES = {  # Stored values; append new tools, never renumber
+        'pika': 1, 'seedance': 2, 'wan': 3, 'luma': 4, 'kling': 5, 'veo': 6, 'sora': 7,
+        'sora-i2v': 8, 'veo-i2v': 9, 'kling-i2v': 10, 'luma-i2v': 11, 'seedance-i2v': 12, 'pika-i2v': 13,
+        'gpt-image-i2v': 14, 'nano-banana-i2v': 15, 'seedream-i2v': 16, 'flux-i2v': 17, 'z-image-i2v': 18,
+        'qwen-i2v': 19,
+    }
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='videos')
     prompt = models.TextField()
-    tool = models.CharField(max_length=20, choices=TOOL_CHOICES)
-    model_id = models.CharField(max_length=200)
+    tool = CodedChoiceField(codes=TOOL_CODES, choices=TOOL_CHOICES, db_column='tool_code')  # Column names from migrations 0025/0026
+    model_version = models.ForeignKey(GenerationModelVersion, on_delete=models.PROTECT, related_name='+', db_index=False)  # Never filtered on
     credits_used = models.IntegerField()
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = CodedChoiceField(codes=STATUS_CODES, choices=STATUS_CHOICES, default='pending', db_column='status_code')
     video_url = models.URLField(blank=True, null=True)
+    media_path = models.CharField(max_length=500, blank=True, null=True)  # Mirrored copy in our storage
+    thumbnail_path = models.CharField(max_length=500, blank=True, null=True)  # Small WebP for gallery grids
+    media_blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    thumbnail_blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    reference_blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')  # Uploaded image-to-video input
     fal_request_id = models.CharField(max_length=200, blank=True, null=True)
     error_message = models.TextField(blank=True, null=True)
+    # fal.ai timing (see accounts.generation_timing): queue = started - submitted, inference = finished - started
+    submitted_at = models.DateTimeField(null=True, blank=True)  # fal.ai accepted the request
+    started_at = models.DateTimeField(null=True, blank=True)  # First status poll that was no longer IN_QUEUE
+    finished_at = models.DateTimeField(null=True, blank=True)  # Result retrieved (or request failed)
+    overhead_ms = models.IntegerField(null=True, blank=True)  # Time in our own code, excluding fal.ai calls
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['finished_at'], name='videogen_finished_at_idx'),  # Latency rollups
+            models.Index(fields=['user', '-created_at'], name='videogen_user_created_idx'),  # History list
+            models.Index(fields=['fal_request_id'], name='videogen_fal_request_idx', condition=models.Q(fal_request_id__isnull=False)),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.tool} - {self.status}"
+    
+    @property
+    def model_id(self):
+        """fal.ai model id the generation ran on"""
+        return GenerationModelVersion.model_id_for(self.model_version_id)
 
 
 class ImageGeneration(models.Model):
@@ -125,6 +237,7 @@ class ImageGeneration(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    STATUS_CODES = {'pending': 1, 'processing': 2, 'completed': 3, 'failed': 4}  # Stored values; never renumber
     
     TOOL_CHOICES = [
         ('gpt-image', 'GPT Image'),
@@ -134,24 +247,44 @@ class ImageGeneration(models.Model):
         ('z-image', 'Z-Image'),
         ('qwen', 'Qwen'),
     ]
+    TOOL_CODES = {'gpt-image': 1, 'nano-banana': 2, 'seedream': 3, 'flux': 4, 'z-image': 5, 'qwen': 6}  # Never renumber
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='images')
     prompt = models.TextField()
-    tool = models.CharField(max_length=20, choices=TOOL_CHOICES)
-    model_id = models.CharField(max_length=200)
+    tool = CodedChoiceField(codes=TOOL_CODES, choices=TOOL_CHOICES, db_column='tool_code')  # Column names from migrations 0025/0026
+    model_version = models.ForeignKey(GenerationModelVersion, on_delete=models.PROTECT, related_name='+', db_index=False)  # Never filtered on
     credits_used = models.IntegerField()
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    status = CodedChoiceField(codes=STATUS_CODES, choices=STATUS_CHOICES, default='pending', db_column='status_code')
     image_url = models.URLField(blank=True, null=True)
+    media_path = models.CharField(max_length=500, blank=True, null=True)  # Mirrored copy in our storage
+    thumbnail_path = models.CharField(max_length=500, blank=True, null=True)  # Small WebP for gallery grids
+    media_blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    thumbnail_blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
     fal_request_id = models.CharField(max_length=200, blank=True, null=True)
     error_message = models.TextField(blank=True, null=True)
+    # fal.ai timing (see accounts.generation_timing): queue = started - submitted, inference = finished - started
+    submitted_at = models.DateTimeField(null=True, blank=True)  # fal.ai accepted the request
+    started_at = models.DateTimeField(null=True, blank=True)  # First status poll that was no longer IN_QUEUE
+    finished_at = models.DateTimeField(null=True, blank=True)  # Result retrieved (or request failed)
+    overhead_ms = models.IntegerField(null=True, blank=True)  # Time in our own code, excluding fal.ai calls
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['finished_at'], name='imagegen_finished_at_idx'),  # Latency rollups
+            models.Index(fields=['user', '-created_at'], name='imagegen_user_created_idx'),  # History list
+            models.Index(fields=['fal_request_id'], name='imagegen_fal_request_idx', condition=models.Q(fal_request_id__isnull=False)),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.tool} - {self.status}"
+    
+    @property
+    def model_id(self):
+        """fal.ai model id the generation ran on"""
+        return GenerationModelVersion.model_id_for(self.model_version_id)
 
 
 class Subscription(models.Model):
@@ -196,6 +329,11 @@ class Subscription(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Renewal and expiry scans: equality on status, range on period_end; auto_renew is
+            # filtered as a bare boolean column, so it goes last where it is read from the index
+            models.Index(fields=['status', 'period_end', 'auto_renew'], name='subscription_renewal_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.plan} - {self.status}"
@@ -397,6 +535,7 @@ class Payment(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['payment_type', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['epoint_transaction_id'], name='payment_epoint_txn_idx', condition=models.Q(epoint_transaction_id__isnull=False)),  # Webhook lookup
         ]
     
     def __str__(self):
@@ -432,6 +571,182 @@ class Payment(models.Model):
         }
 
 
+class GenerationLatencyRollup(models.Model):
+    """
+    Hourly latency histograms per generation kind and tool.
+    Rebuilt from finished generations by `rollup_generation_latency`; the
+    stats endpoint merges these rows instead of scanning the generation tables.
+    Each histogram holds counts per GenerationLatencyService.BUCKETS_MS bucket.
+    """
+    KIND_CHOICES = [
+        ('video', 'Video'),
+        ('image', 'Image'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    tool = models.CharField(max_length=20)
+    hour = models.DateTimeField()  # Start of the hour (UTC) the generations finished in
+    completed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    queue_ms = models.JSONField(default=list)
+    inference_ms = models.JSONField(default=list)
+    overhead_ms = models.JSONField(default=list)
+    total_ms = models.JSONField(default=list)  # created_at -> finished_at
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-hour', 'kind', 'tool']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'tool', 'hour'], name='uniq_latency_rollup_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'kind']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.tool} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class GenerationArchive(models.Model):
+    """
+    One month of generations moved out of the database by `archive_generations`.
+    The rows live in a gzipped JSONL file under GENERATION_ARCHIVE_DIR, one
+    gzip member per user (GenerationArchiveUser); list and detail views read
+    through to it.
+    """
+    KIND_CHOICES = [
+        ('video', 'Video'),
+        ('image', 'Image'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    month = models.DateField()  # First day of the month (UTC) the generations were created in
+    file_name = models.CharField(max_length=255)
+    rows = models.IntegerField()
+    size_bytes = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month', 'kind']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'month'], name='uniq_generation_archive_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.month:%Y-%m} - {self.rows} rows"
+
+
+class GenerationArchiveUser(models.Model):
+    """Where a user's generations sit in an archive file, so read-through only decompresses theirs"""
+    archive = models.ForeignKey(GenerationArchive, on_delete=models.CASCADE, related_name='users')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    rows = models.IntegerField()
+    offset = models.BigIntegerField()  # Byte offset and length of the user's gzip member in the file
+    length = models.BigIntegerField()
+    first_id = models.BigIntegerField()  # Lowest and highest generation id in it, for detail lookups
+    last_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'archive'], name='uniq_generation_archive_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in {self.archive}"
+
+
+class GenerationArchiveBlob(models.Model):
+    """
+    Media references held by a user's archived generations.
+    Archiving does not release them; they are released when the user's
+    account is deleted or the archive expires.
+    """
+    segment = models.ForeignKey(GenerationArchiveUser, on_delete=models.CASCADE, related_name='blobs')
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, related_name='+')
+    refs = models.IntegerField()  # Archived rows pointing at the blob
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['segment', 'blob'], name='uniq_generation_archive_blob'),
+        ]
+
+    def __str__(self):
+        return f"{self.blob_id} x{self.refs} in {self.segment}"
+
+
+class RequestProfile(models.Model):
+    """
+    A profiled request (see accounts.profiling).
+    The profile itself is a file in PROFILING_DIR; rows are removed when
+    their file is rotated out.
+    """
+    MODE_CHOICES = [
+        ('cprofile', 'cProfile'),
+        ('sample', 'Stack sampler'),
+    ]
+    TRIGGER_CHOICES = [
+        ('header', 'Requested by staff'),
+        ('sample', 'Random sample'),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=100, blank=True, default='')
+    status_code = models.IntegerField(null=True, blank=True)
+    duration_ms = models.IntegerField()
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES)
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    file_name = models.CharField(max_length=255, unique=True)
+    size_bytes = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms}ms, {self.mode})"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Verified E-point callback waiting to be applied by the webhook worker.
+    The (transaction, status) pair is unique, so repeated deliveries of the
+    same callback are dropped at insert time.
+    """
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),  # Gave up after WEBHOOK_MAX_ATTEMPTS
+    ]
+
+    transaction_id = models.CharField(max_length=200)
+    status = models.CharField(max_length=50)  # E-point status: success, failed, error, returned...
+    order_id = models.CharField(max_length=100, blank=True, default='')
+    payload = models.JSONField()  # Decoded, signature-verified callback data
+
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)  # Not retried before this time
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_id', 'status'], name='uniq_webhook_transaction_status'),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_id} - {self.status} - {self.state}"
+
+
 class CreditHold(models.Model):
     """
     Credit Hold system for managing pending transactions.
@@ -452,8 +767,10 @@ class CreditHold(models.Model):
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPE_CHOICES)
     
     # Related generation
-    video_generation = models.ForeignKey(VideoGeneration, on_delete=models.CASCADE, null=True, blank=True, related_name='credit_hold')
-    image_generation = models.ForeignKey(ImageGeneration, on_delete=models.CASCADE, null=True, blank=True, related_name='credit_hold')
+    # No database FK: on PostgreSQL the generation tables are partitioned by created_at (see
+    # accounts.generation_archive), and a partitioned table's key is (id, created_at). Cascades still run in Django.
+    video_generation = models.ForeignKey(VideoGeneration, on_delete=models.CASCADE, null=True, blank=True, related_name='credit_hold', db_constraint=False)
+    image_generation = models.ForeignKey(ImageGeneration, on_delete=models.CASCADE, null=True, blank=True, related_name='credit_hold', db_constraint=False)
     
     # Credit info
     credits_held = models.IntegerField()  # Amount of credits held
@@ -467,8 +784,9 @@ class CreditHold(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'status']),
             models.Index(fields=['status', 'created_at']),
+            # Held-credit sums only ever ask for status='hold'; replaces the (user, status) index
+            models.Index(fields=['user'], name='credithold_user_held_idx', condition=models.Q(status='hold')),
         ]
     
     def __str__(self):
@@ -10,6 +10,7 @@ from decimal import Decimal
 from django.utils import timezone
 from django.conf import settings
 from .models import Payment, Subscription, CreditPurchase
+from .http_client import get_client
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,45 @@ class EPointService:
     API_URL = getattr(settings, 'EPOINT_API_URL', 'https://epoint.az/api/1')
     PUBLIC_KEY = getattr(settings, 'EPOINT_PUBLIC_KEY', None)
     SECRET_KEY = getattr(settings, 'EPOINT_SECRET_KEY', None)
+    CONNECT_TIMEOUT = getattr(settings, 'EPOINT_CONNECT_TIMEOUT', 3.05)  # Seconds
+    READ_TIMEOUT = getattr(settings, 'EPOINT_READ_TIMEOUT', 15)  # Seconds
+    MAX_RETRIES = getattr(settings, 'EPOINT_MAX_RETRIES', 2)
+    POOL_SIZE = getattr(settings, 'EPOINT_POOL_SIZE', 10)
+    BREAKER_THRESHOLD = getattr(settings, 'EPOINT_BREAKER_THRESHOLD', 5)  # Consecutive failures
+    BREAKER_RESET = getattr(settings, 'EPOINT_BREAKER_RESET', 30)  # Seconds before a trial call
+    
+    # E-point transaction statuses -> what they mean for our Payment
+    STATUS_MAP = {
+        'success': 'completed',
+        'completed': 'completed',  # Mock mode
+        'failed': 'failed',
+        'error': 'failed',
+        'returned': 'refunded',  # Money went back: never applied automatically, left for review
+        'new': 'pending',
+        'pending': 'pending',
+        'processing': 'pending',
+    }
+    
+    MOCK_TRANSACTION_PREFIX = 'EPOINT_MOCK_'  # Transaction IDs issued in TEST_MODE
+    
+    @staticmethod
+    def normalize_status(provider_status):
+        """Map an E-point status to 'completed', 'failed', 'refunded', 'pending' or 'unknown'"""
+        return EPointService.STATUS_MAP.get(str(provider_status or '').lower(), 'unknown')
+    
+    @staticmethod
+    def get_client():
+        """Shared keep-alive HTTP client for the E-point API"""
+        return get_client(
+            'epoint',
+            base_url=EPointService.API_URL,
+            pool_size=EPointService.POOL_SIZE,
+            connect_timeout=EPointService.CONNECT_TIMEOUT,
+            read_timeout=EPointService.READ_TIMEOUT,
+            max_retries=EPointService.MAX_RETRIES,
+            failure_threshold=EPointService.BREAKER_THRESHOLD,
+            reset_timeout=EPointService.BREAKER_RESET,
+        )
     
     @staticmethod
     def _generate_signature(data: str, private_key: str) -> str:
@@ -70,7 +110,7 @@ class EPointService:
             logger.info(f"EPOINT MOCK: Creating payment - Amount: {amount} {currency}, User: {user.email if user else 'N/A'}")
             
             # Simulate E-point transaction ID
-            mock_transaction_id = f"EPOINT_MOCK_{int(timezone.now().timestamp())}"
+            mock_transaction_id = f"{EPointService.MOCK_TRANSACTION_PREFIX}{int(timezone.now().timestamp())}"
             
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173').rstrip('/')
             # In TEST_MODE, redirect to frontend success page (auto-complete payment)
@@ -158,13 +198,13 @@ class EPointService:
             
             # Make API request to E-point
             logger.info(f"EPOINT: Sending request to {EPointService.API_URL}/request")
-            response = requests.post(
-                f"{EPointService.API_URL}/request",
+            # Not idempotent: only retried if the connection was never established
+            response = EPointService.get_client().post(
+                '/request',
                 data=request_payload,
                 headers={
                     'Content-Type': 'application/x-www-form-urlencoded',
                 },
-                timeout=30
             )
             
             if response.status_code == 200:
@@ -236,7 +276,7 @@ class EPointService:
         Check payment status with E-point
         """
         # Check if this is a mock transaction ID
-        is_mock = transaction_id and transaction_id.startswith('EPOINT_MOCK_')
+        is_mock = transaction_id and transaction_id.startswith(EPointService.MOCK_TRANSACTION_PREFIX)
         
         if EPointService.TEST_MODE or is_mock:
             logger.info(f"EPOINT MOCK: Checking payment status - Transaction ID: {transaction_id}")
@@ -274,13 +314,13 @@ class EPointService:
                 'signature': signature
             }
             
-            response = requests.post(
-                f"{EPointService.API_URL}/get-status",
+            response = EPointService.get_client().post(
+                '/get-status',
+                idempotent=True,
                 data=request_payload,
                 headers={
                     'Content-Type': 'application/x-www-form-urlencoded',
                 },
-                timeout=30
             )
             
             if response.status_code == 200:
@@ -483,27 +523,64 @@ class PaymentService:
                 payment.epoint_transaction_id or epoint_transaction_id
             )
         
-        if epoint_status.get('status') == 'completed':
-            # Complete the payment
-            payment.status = 'completed'
-            payment.completed_at = timezone.now()
-            if epoint_transaction_id:
-                payment.epoint_transaction_id = epoint_transaction_id
-            payment.save()
-            
-            # Complete related subscription or credit purchase
-            if payment.payment_type == 'subscription' and payment.subscription:
-                if payment.subscription.status == 'pending':
-                    payment.subscription.activate()
-            elif payment.payment_type == 'topup' and payment.credit_purchase:
-                if payment.credit_purchase.status == 'pending':
-                    payment.credit_purchase.complete()
-            
-            logger.info(f"Payment completed - ID: {payment.id}")
-            return payment
+        if EPointService.normalize_status(epoint_status.get('status')) == 'completed':
+            return PaymentService._mark_completed(payment, epoint_transaction_id)
         else:
             payment.status = 'failed'
             payment.notes = f"E-point status: {epoint_status.get('status')}"
             payment.save()
             raise ValueError(f"Payment not completed by E-point: {epoint_status.get('status')}")
-
+    
+    @staticmethod
+    def _mark_completed(payment, epoint_transaction_id=None):
+        """Complete the payment and the subscription or credit purchase it pays for"""
+        payment.status = 'completed'
+        payment.completed_at = timezone.now()
+        if epoint_transaction_id:
+            payment.epoint_transaction_id = epoint_transaction_id
+        payment.save()
+        
+        # Complete related subscription or credit purchase
+        if payment.payment_type == 'subscription' and payment.subscription:
+            if payment.subscription.status == 'pending':
+                payment.subscription.activate()
+        elif payment.payment_type == 'topup' and payment.credit_purchase:
+            if payment.credit_purchase.status == 'pending':
+                payment.credit_purchase.complete()
+        
+        logger.info(f"Payment completed - ID: {payment.id}")
+        return payment
+    
+    @staticmethod
+    def apply_provider_status(payment, provider_status, epoint_transaction_id=None, message=''):
+        """
+        Apply a status reported by E-point (verified callback or get-status).
+        No extra get-status call is made. Safe to call repeatedly: completed
+        payments are never downgraded.
+        
+        Returns:
+            The normalized status ('completed', 'failed', 'refunded', 'pending' or 'unknown')
+        """
+        if epoint_transaction_id and not payment.epoint_transaction_id:
+            payment.epoint_transaction_id = epoint_transaction_id
+            payment.save(update_fields=['epoint_transaction_id'])
+        
+        outcome = EPointService.normalize_status(provider_status)
+        if outcome == 'completed':
+            if payment.status != 'completed':
+                PaymentService._mark_completed(payment, epoint_transaction_id)
+        elif outcome == 'failed':
+            if payment.status != 'completed':
+                payment.status = 'failed'
+                payment.notes = f"Payment {provider_status} via E-point - {message}"
+                payment.save()
+                logger.warning(f"Payment failed via E-point - Payment ID: {payment.id}, Status: {provider_status}")
+        elif outcome == 'refunded':
+            # Credits may already be granted and spent: a person decides what to revoke
+            payment.notes = f"E-point reports the payment {provider_status}; needs manual review - {message}"
+            payment.save(update_fields=['notes'])
+            logger.error(f"Payment returned via E-point, needs manual review - Payment ID: {payment.id}, Status: {payment.status}")
+        else:
+            # Still in progress (new) or unrecognised (server_error)
+            logger.info(f"Payment status update via E-point - Payment ID: {payment.id}, Status: {provider_status}")
+        return outcome
@@ -0,0 +1,191 @@
+"""
+On-demand request profiling
+ProfilingMiddleware runs a request under cProfile ('cprofile', exact call
+counts, slows the request down noticeably) or a stack sampler ('sample',
+a thread that snapshots the request thread every PROFILING_SAMPLE_INTERVAL
+seconds; cheap enough for live traffic). Profiles are written to
+PROFILING_DIR, which is capped by file count and total size (oldest first),
+and indexed by RequestProfile rows for the admin.
+
+Open .prof files with `python -m pstats` or snakeviz; .folded files are
+collapsed stacks for flamegraph.pl or speedscope.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common()) + '\n'
+
+
+class ProfileService:
+    """Runs profiles and keeps the profile directory within its caps"""
+
+    # Configuration from Django settings
+    DIRECTORY = getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+    MAX_FILES = getattr(settings, 'PROFILING_MAX_FILES', 200)
+    MAX_BYTES = getattr(settings, 'PROFILING_MAX_BYTES', 200 * 1024 * 1024)
+    DEFAULT_MODE = getattr(settings, 'PROFILING_MODE', 'sample')  # 'sample' or 'cprofile'
+    SAMPLE_INTERVAL = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005)  # Seconds between stack samples
+    MODES = ('cprofile', 'sample')
+    EXTENSIONS = {'cprofile': '.prof', 'sample': '.folded'}
+
+    # One profile per process at a time: cProfile hooks are process-wide on newer Pythons,
+    # and two concurrent profiles would each include the other's overhead
+    _busy = threading.Lock()
+
+    @staticmethod
+    def run(mode, func):
+        """
+        Call func() under the profiler.
+        Returns (result, data) where data is the profile payload as bytes, or
+        (result, None) when another profile is already running in this process.
+        """
+        if not ProfileService._busy.acquire(blocking=False):
+            return func(), None
+        try:
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    result = func()
+                finally:
+                    profiler.disable()
+                profiler.create_stats()
+                return result, marshal.dumps(profiler.stats)
+            sampler = StackSampler(threading.get_ident(), ProfileService.SAMPLE_INTERVAL)
+            sampler.start()
+            try:
+                result = func()
+            finally:
+                sampler.stop()
+            return result, sampler.folded().encode('utf-8')
+        finally:
+            ProfileService._busy.release()
+
+    @staticmethod
+    def save(data, mode, request, response, duration_ms, trigger, user=None):
+        """Write the profile file, record it, and rotate old profiles out"""
+        from .models import RequestProfile
+
+        os.makedirs(ProfileService.DIRECTORY, exist_ok=True)
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else '') or ''
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', view_name or request.path).strip('-')[:60] or 'root'
+        file_name = f"{timezone.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-{slug}{ProfileService.EXTENSIONS[mode]}"
+        with open(os.path.join(ProfileService.DIRECTORY, file_name), 'wb') as f:
+            f.write(data)
+
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.path[:500],
+            view_name=view_name[:100],
+            status_code=getattr(response, 'status_code', None),
+            duration_ms=duration_ms,
+            mode=mode,
+            trigger=trigger,
+            user=user if user is not None and user.is_authenticated else None,
+            file_name=file_name,
+            size_bytes=len(data),
+        )
+        ProfileService.rotate()
+        return profile
+
+    @staticmethod
+    def rotate():
+        """Delete the oldest profiles until the directory is within MAX_FILES and MAX_BYTES"""
+        from .models import RequestProfile
+
+        try:
+            entries = [entry for entry in os.scandir(ProfileService.DIRECTORY) if entry.is_file()]
+        except FileNotFoundError:
+            return 0
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        removed = []
+        while entries and (len(entries) > ProfileService.MAX_FILES or total > ProfileService.MAX_BYTES):
+            entry = entries.pop(0)
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            removed.append(entry.name)
+        if removed:
+            RequestProfile.objects.filter(file_name__in=removed).delete()
+        return len(removed)
+
+    @staticmethod
+    def path(profile):
+        return os.path.join(ProfileService.DIRECTORY, profile.file_name)
+
+    @staticmethod
+    def summary(profile, limit=40):
+        """Human-readable top of a stored profile (for the admin)"""
+        path = ProfileService.path(profile)
+        if not os.path.exists(path):
+            return 'Profile file is not on this host (rotated out, or written by another server).'
+        if profile.mode == 'cprofile':
+            out = io.StringIO()
+            stats = pstats.Stats(path, stream=out)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+
+        # Sampled: time per function, inclusive (on the stack) and exclusive (leaf)
+        inclusive, exclusive, total = Counter(), Counter(), 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if not stack:
+                    continue
+                count = int(count)
+                total += count
+                frames = [frame.rsplit(':', 1)[0] for frame in stack.split(';')]
+                exclusive[frames[-1]] += count
+                for frame in set(frames):
+                    inclusive[frame] += count
+        if not total:
+            return 'No samples (the request finished within one sample interval).'
+        lines = [f'{total} samples, {ProfileService.SAMPLE_INTERVAL * 1000:.1f}ms apart', '', 'self %   total %  function']
+        for frame, count in exclusive.most_common(limit):
+            lines.append(f'{count / total * 100:6.1f}   {inclusive[frame] / total * 100:7.1f}  {frame}')
+        return '\n'.join(lines)
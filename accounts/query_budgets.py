@@ -0,0 +1,406 @@
+"""
+Per-endpoint query-count and latency budgets
+Every URL name in accounts/urls.py has a scenario that drives one realistic
+request through the Django test client (a user with a history of
+generations, holds and top-ups; fal.ai stubbed; E-point in TEST_MODE) and a
+budget: the most SQL queries the request may run and a generous time
+ceiling. `python manage.py check_query_budgets` runs them on a throwaway
+database and fails when a change goes over budget, printing each query with
+the project frames that issued it.
+
+When a change legitimately needs more (or fewer) queries, update BUDGETS in
+the same commit so the new number is reviewed.
+"""
+import io
+import os
+import re
+import statistics
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+# url name -> maximum queries and milliseconds (median of the repeats) per request
+BUDGETS = {
+    'register': {'queries': 2, 'ms': 250},
+    'login': {'queries': 1, 'ms': 250},
+    'google-login': None,  # Needs a live Google ID token; see SKIPPED
+    'token_refresh': {'queries': 1, 'ms': 150},
+    'profile': {'queries': 2, 'ms': 150},
+    'profile-update': {'queries': 2, 'ms': 150},
+    'profile-delete': {'queries': 20, 'ms': 500},  # Includes the archived-generation lookup (signals.forget_archived_generations)
+    'video-generate': {'queries': 9, 'ms': 400},
+    'video-list': {'queries': 4, 'ms': 250},
+    'video-detail': {'queries': 2, 'ms': 150},
+    'video-reference-image': {'queries': 3, 'ms': 400},
+    'image-generate': {'queries': 9, 'ms': 400},
+    'image-list': {'queries': 4, 'ms': 250},
+    'image-detail': {'queries': 2, 'ms': 150},
+    'tools-list': {'queries': 1, 'ms': 150},
+    'locked-pricing': {'queries': 0, 'ms': 150},
+    'subscription-plans': {'queries': 0, 'ms': 150},
+    'subscription-create': {'queries': 15, 'ms': 500},
+    'subscription-info': {'queries': 2, 'ms': 150},
+    'subscription-cancel': {'queries': 3, 'ms': 250},
+    'topup-packages': {'queries': 0, 'ms': 150},
+    'topup-create': {'queries': 16, 'ms': 500},
+    'topup-complete': {'queries': 6, 'ms': 250},
+    'topup-history': {'queries': 2, 'ms': 150},
+    'payment-success': {'queries': 0, 'ms': 150},
+    'payment-error': {'queries': 0, 'ms': 150},
+    'payment-webhook': {'queries': 1, 'ms': 250},
+    'epoint-client-metrics': {'queries': 1, 'ms': 150},
+    'generation-latency-stats': {'queries': 2, 'ms': 150},
+    'media-serve': {'queries': 0, 'ms': 150},
+}
+
+SKIPPED = {
+    'google-login': 'verifies the ID token against Google; nothing local to budget',
+}
+
+# Transaction bookkeeping the test harness adds around every request; not part of the budget
+_IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryRecorder:
+    """execute_wrapper that records every statement with its duration and the project frames that issued it"""
+
+    def __init__(self, depth=4):
+        self.depth = depth
+        self.queries = []
+        self.base_dir = str(settings.BASE_DIR) + os.sep
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.lstrip().upper().startswith(_IGNORED_PREFIXES):
+                self.queries.append({
+                    'sql': sql,
+                    'params': params,
+                    'ms': (time.perf_counter() - start) * 1000,
+                    'stack': self._attribution(),
+                })
+
+    def _attribution(self):
+        """Innermost project frames, plus the library frame that ran the query when it was not our code (e.g. DRF pagination)"""
+        project, caller = [], None
+        for frame in traceback.extract_stack()[:-2]:
+            filename = frame.filename
+            if filename == __file__ or _HARNESS_FRAME.search(filename):
+                continue
+            if filename.startswith(self.base_dir) and 'site-packages' not in filename:
+                project.append(f"{os.path.relpath(filename, self.base_dir)}:{frame.lineno} in {frame.name}")
+                caller = None
+            elif not _DB_LAYER_FRAME.search(filename):
+                caller = f"{_short_library_path(filename)}:{frame.lineno} in {frame.name}"
+        frames = project[-self.depth:]
+        return frames + [caller] if caller else frames
+
+
+# Frames that never explain a query: the ORM/driver itself and the command running the checks
+_DB_LAYER_FRAME = re.compile(r'django[\\/]db[\\/]|[\\/]contextlib\.py$')
+_HARNESS_FRAME = re.compile(r'manage\.py$|check_query_budgets\.py$|[\\/]django[\\/]test[\\/]|[\\/]django[\\/]core[\\/]handlers[\\/]')
+
+
+def _short_library_path(filename):
+    marker = 'site-packages' + os.sep
+    return filename.split(marker, 1)[1] if marker in filename else os.path.basename(filename)
+
+
+class BudgetFixture:
+    """Committed test data shared by the scenarios; each scenario's own writes are rolled back"""
+
+    PASSWORD = 'Budget-pass-1'
+
+    def __init__(self):
+        from .models import User, VideoGeneration, ImageGeneration, CreditPurchase, GenerationModelVersion
+        from .services import VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG
+        from .synthetic_data import BatchWriter, SyntheticDataGenerator, historical_timestamps
+
+        # One user owning a realistic history, so N+1 patterns in lists show up
+        generator = SyntheticDataGenerator(
+            users=1, videos=25, images=25, purchases=6, subscribed_share=0.0, seed=7,
+            password=self.PASSWORD, email_domain='budget.invalid',
+        )
+        writer = BatchWriter(use_copy=False)
+        with historical_timestamps(User, VideoGeneration, ImageGeneration, CreditPurchase):
+            for rows in (generator.user_rows(), generator.generation_rows('video'),
+                         generator.generation_rows('image'), generator.purchase_rows()):
+                writer.write(rows)
+        # Model versions exist once a tool has been used; scenarios measure that steady state
+        for kind, configs in (('video', {**VIDEO_TOOL_CONFIG, **IMAGE_TO_VIDEO_TOOL_CONFIG}), ('image', IMAGE_TOOL_CONFIG)):
+            for tool, config in configs.items():
+                GenerationModelVersion.resolve(kind, tool, config['model'])
+        self.user = User.objects.order_by('-pk').first()
+        self.user.credits = 5000
+        self.user.save(update_fields=['credits'])
+        self.staff = User.objects.create_user(email='budget-staff@budget.invalid', password=self.PASSWORD, is_staff=True)
+        self.video = self.user.videos.filter(status='completed').first()
+        self.image = self.user.images.filter(status='completed').first()
+
+    def token(self, user):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        return RefreshToken.for_user(user)
+
+
+def _png_upload():
+    from PIL import Image
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, format='PNG')
+    return SimpleUploadedFile('reference.png', buffer.getvalue(), content_type='image/png')
+
+
+class _FakeHandle:
+    """Stands in for fal_client's request handle; completes immediately"""
+
+    def __init__(self, model, arguments, **kwargs):
+        self.request_id = uuid.uuid4().hex
+        self.model = model
+
+    def get(self):
+        if 'video' in self.model:
+            return {'video': {'url': f'https://budget.invalid/{self.request_id}.mp4'}}
+        return {'images': [{'url': f'https://budget.invalid/{self.request_id}.png'}]}
+
+
+# Scenarios: url name -> function(fixture) returning the request to make.
+# Anything they create before returning is setup and is not counted.
+
+def _register(fx):
+    return {'method': 'post', 'auth': None, 'data': {'email': f'new-{uuid.uuid4().hex[:8]}@budget.invalid', 'password': 'Another-pass-2'}, 'expect': 201}
+
+
+def _login(fx):
+    return {'method': 'post', 'auth': None, 'data': {'email': fx.user.email, 'password': fx.PASSWORD}}
+
+
+def _token_refresh(fx):
+    return {'method': 'post', 'auth': None, 'data': {'refresh': str(fx.token(fx.user))}}
+
+
+def _get(expect=200, auth='user', **kwargs):
+    def scenario(fx):
+        return {'method': 'get', 'auth': auth, 'expect': expect, **kwargs}
+    return scenario
+
+
+def _profile_update(fx):
+    return {'method': 'patch', 'data': {'theme': 'light'}}
+
+
+def _profile_delete(fx):
+    return {'method': 'delete'}
+
+
+def _video_generate(fx):
+    return {'method': 'post', 'data': {'prompt': 'A paper boat drifting down a rainy street', 'tool': 'seedance', 'options': {'duration': '5'}}, 'expect': 201}
+
+
+def _image_generate(fx):
+    return {'method': 'post', 'data': {'prompt': 'A paper boat drifting down a rainy street', 'tool': 'gpt-image'}, 'expect': 201}
+
+
+def _reference_image(fx):
+    return {'method': 'post', 'multipart': {'image': _png_upload()}, 'expect': 201}
+
+
+def _subscription_create(fx):
+    return {'method': 'post', 'data': {'plan': 'starter'}}
+
+
+def _subscription_cancel(fx):
+    from .models import Subscription
+    now = timezone.now()
+    Subscription.objects.create(
+        user=fx.user, plan='starter', status='active', period_start=now,
+        period_end=now + timedelta(days=30), next_renewal_date=now + timedelta(days=30),
+    )
+    return {'method': 'post'}
+
+
+def _topup_create(fx):
+    return {'method': 'post', 'data': {'package': 'small'}}
+
+
+def _topup_complete(fx):
+    from .models import CreditPurchase
+    purchase = CreditPurchase.objects.create(
+        user=fx.user, package='small', status='pending', credits_purchased=450,
+        total_credits=450, price=Decimal('10.00'),
+    )
+    return {'method': 'post', 'data': {'purchase_id': purchase.id}}
+
+
+def _payment_webhook(fx):
+    import base64
+    import json
+    from .epoint_stub import sign
+    from .models import Payment
+
+    payment = Payment.objects.create(
+        user=fx.user, payment_type='topup', amount=Decimal('10.00'), status='processing',
+        epoint_transaction_id=f'te{uuid.uuid4().hex[:12]}',
+    )
+    payload = {'order_id': payment.id, 'status': 'success', 'transaction': payment.epoint_transaction_id, 'code': '000'}
+    data = base64.b64encode(json.dumps(payload).encode('utf-8')).decode('utf-8')
+    return {'method': 'post', 'auth': None, 'form': {'data': data, 'signature': sign(data, 'budget-secret')}}
+
+
+def _media_serve(fx):
+    from .media_service import MediaMirrorService
+    from .media_serving import SignedMediaService
+
+    name = MediaMirrorService.get_storage().save(f'budget/{uuid.uuid4().hex}.txt', io.BytesIO(b'budget check'))
+    expires, signature = SignedMediaService.sign(name)
+    return {'method': 'get', 'auth': None, 'kwargs': {'name': name}, 'query': {'e': expires, 's': signature}}
+
+
+SCENARIOS = {
+    'register': _register,
+    'login': _login,
+    'token_refresh': _token_refresh,
+    'profile': _get(),
+    'profile-update': _profile_update,
+    'profile-delete': _profile_delete,
+    'video-generate': _video_generate,
+    'video-list': _get(),
+    'video-detail': lambda fx: {'method': 'get', 'kwargs': {'pk': fx.video.pk}},
+    'video-reference-image': _reference_image,
+    'image-generate': _image_generate,
+    'image-list': _get(),
+    'image-detail': lambda fx: {'method': 'get', 'kwargs': {'pk': fx.image.pk}},
+    'tools-list': _get(),
+    'locked-pricing': _get(auth=None),
+    'subscription-plans': _get(auth=None),
+    'subscription-create': _subscription_create,
+    'subscription-info': _get(),
+    'subscription-cancel': _subscription_cancel,
+    'topup-packages': _get(auth=None),
+    'topup-create': _topup_create,
+    'topup-complete': _topup_complete,
+    'topup-history': _get(),
+    'payment-success': _get(expect=302, auth=None, query={'transaction_id': 'te-budget'}),
+    'payment-error': _get(expect=302, auth=None, query={'transaction_id': 'te-budget', 'error': 'declined'}),
+    'payment-webhook': _payment_webhook,
+    'epoint-client-metrics': _get(auth='staff'),
+    'generation-latency-stats': _get(auth='staff', query={'hours': 168, 'interval': 'day'}),
+    'media-serve': _media_serve,
+}
+
+
+def url_names():
+    """Every named route in accounts/urls.py"""
+    from . import urls
+    return [pattern.name for pattern in urls.urlpatterns if pattern.name]
+
+
+def _request(client, fx, spec, name):
+    headers = {}
+    auth = spec.get('auth', 'user')
+    if auth:
+        token = fx.token(fx.staff if auth == 'staff' else fx.user)
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {token.access_token}'
+    url = reverse(name, kwargs=spec.get('kwargs'))
+    method = getattr(client, spec['method'])
+    if 'multipart' in spec:
+        return method(url, spec['multipart'], **headers)
+    if 'form' in spec:
+        return method(url, spec['form'], **headers)
+    if spec['method'] == 'get':
+        return method(url, spec.get('query'), **headers)
+    return method(url, spec.get('data', {}), content_type='application/json', **headers)
+
+
+def run_case(name, fixture, repeat=3):
+    """Run one scenario `repeat` times (rolled back each time); returns counts, timings and the last query log"""
+    client = Client(HTTP_HOST='localhost')
+    scenario = SCENARIOS[name]
+    timings, counts, statuses = [], [], []
+    recorder = None
+    for _ in range(repeat):
+        with transaction.atomic():
+            spec = scenario(fixture)
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                response = _request(client, fixture, spec, name)
+            timings.append((time.perf_counter() - start) * 1000)
+            counts.append(len(recorder.queries))
+            statuses.append(response.status_code)
+            if hasattr(response, 'close'):
+                response.close()
+            transaction.set_rollback(True)
+    return {
+        'name': name,
+        'queries': max(counts),
+        'ms': statistics.median(timings),
+        'status': statuses[-1],
+        'expected_status': spec.get('expect', 200),
+        'log': recorder.queries,
+    }
+
+
+@contextmanager
+def budget_environment():
+    """What every scenario runs under: fal.ai stubbed, E-point in TEST_MODE, no background work"""
+    import tempfile
+
+    from .payment_service import EPointService
+    from .webhook_service import PaymentWebhookService
+
+    media_root = tempfile.mkdtemp(prefix='query-budgets-')
+    with mock.patch.dict(os.environ, {'FAL_KEY': 'budget'}), \
+            mock.patch('accounts.fal_gateway.submit', side_effect=_FakeHandle), \
+            mock.patch('accounts.media_service.MediaMirrorService.schedule'), \
+            mock.patch.multiple(EPointService, TEST_MODE=True, SECRET_KEY='budget-secret', PUBLIC_KEY='budget-public'), \
+            mock.patch.object(PaymentWebhookService, 'INLINE_DISPATCH', False), \
+            _settings(media_root):
+        yield
+
+
+def run_budgets(names=None, repeat=3):
+    """Run the scenarios against the current (test) database; yields one result per URL name"""
+    with budget_environment():
+        fixture = BudgetFixture()
+        for name in names or url_names():
+            budget = BUDGETS.get(name)
+            if name in SKIPPED:
+                yield {'name': name, 'skipped': SKIPPED[name]}
+                continue
+            if name not in SCENARIOS or budget is None:
+                yield {'name': name, 'missing': 'no scenario' if name not in SCENARIOS else 'no budget'}
+                continue
+            result = run_case(name, fixture, repeat=repeat)
+            result['budget'] = budget
+            result['over_queries'] = result['queries'] > budget['queries']
+            result['over_time'] = result['ms'] > budget['ms']
+            result['wrong_status'] = result['status'] != result['expected_status']
+            yield result
+
+
+def _settings(media_root):
+    from django.test.utils import override_settings
+
+    return override_settings(
+        FAL_KEY='budget',
+        MEDIA_ROOT=media_root,
+        STORAGES={
+            **getattr(settings, 'STORAGES', {}),
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': media_root}},
+        },
+        # Password hashing is deliberately slow and would swamp the time budgets
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    )
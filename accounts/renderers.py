@@ -0,0 +1,14 @@
+"""
+DRF renderers for the accounts API
+"""
+from rest_framework.renderers import JSONRenderer
+
+from .server_timing import track
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that counts its time as 'serialize' in the Server-Timing breakdown"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with track('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
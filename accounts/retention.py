@@ -0,0 +1,77 @@
+"""
+Retention purge for rows that are only kept for a while
+Failed generations and settled (confirmed or released) credit holds are
+deleted once they are older than their retention period. `purge_retention`
+walks each target in id order (keyset, never OFFSET) and deletes small
+batches, each in its own short transaction, pausing between batches so
+that it can run next to live traffic.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+class RetentionService:
+    """Retention periods and batched deletes"""
+
+    # Configuration from Django settings; 0 days disables a target
+    FAILED_GENERATION_DAYS = getattr(settings, 'RETENTION_FAILED_GENERATION_DAYS', 30)
+    SETTLED_HOLD_DAYS = getattr(settings, 'RETENTION_SETTLED_HOLD_DAYS', 90)
+    BATCH_SIZE = getattr(settings, 'RETENTION_BATCH_SIZE', 500)
+    SLEEP = getattr(settings, 'RETENTION_SLEEP', 0.1)  # Seconds between batches
+
+    @staticmethod
+    def targets(now=None):
+        """{name: queryset of expired rows}, in purge order"""
+        from .models import VideoGeneration, ImageGeneration, CreditHold
+
+        now = now or timezone.now()
+        targets = {}
+        failed_days = RetentionService.FAILED_GENERATION_DAYS
+        if failed_days:
+            cutoff = now - timedelta(days=failed_days)
+            for name, model in (('failed-videos', VideoGeneration), ('failed-images', ImageGeneration)):
+                # A failed generation whose hold is somehow still open keeps it until the hold settles
+                targets[name] = model.objects.filter(status='failed', created_at__lt=cutoff).exclude(
+                    credit_hold__status='hold',
+                )
+        hold_days = RetentionService.SETTLED_HOLD_DAYS
+        if hold_days:
+            targets['settled-holds'] = CreditHold.objects.filter(
+                status__in=['confirmed', 'released'], created_at__lt=now - timedelta(days=hold_days),
+            )
+        return targets
+
+    @staticmethod
+    def purge(queryset, batch_size=None, sleep=None, max_batches=None, dry_run=False):
+        """
+        Delete the queryset's rows in id-ordered batches. Yields
+        (batch rows, total rows, elapsed seconds) after each batch.
+        Generations go through the ORM delete, so their credit holds cascade
+        and their media references are released (signals.release_generation_media).
+        """
+        batch_size = batch_size or RetentionService.BATCH_SIZE
+        sleep = RetentionService.SLEEP if sleep is None else sleep
+        model = queryset.model
+        last_id = 0
+        total = 0
+        batches = 0
+        started = time.monotonic()
+        while max_batches is None or batches < max_batches:
+            ids = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True).distinct()[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            if not dry_run:
+                with transaction.atomic():
+                    model.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            batches += 1
+            yield len(ids), total, time.monotonic() - started
+            if sleep and len(ids) == batch_size:
+                time.sleep(sleep)
@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import VideoGeneration, ImageGeneration
+from .media_serving import SignedMediaService
+from .server_timing import TimedSerializerMixin
 
 User = get_user_model()
 
-class UserRegisterSerializer(serializers.ModelSerializer):
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
     class Meta:
@@ -26,20 +28,34 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'credits', 'language', 'theme']
 
 
-class VideoGenerationSerializer(serializers.ModelSerializer):
+class VideoGenerationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    thumbnail_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = VideoGeneration
         fields = [
             'id', 'prompt', 'tool', 'model_id', 'credits_used', 
-            'status', 'video_url', 'error_message', 'created_at', 'updated_at'
+            'status', 'video_url', 'thumbnail_url', 'error_message', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'status', 'video_url', 'error_message', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'video_url', 'thumbnail_url', 'error_message', 'created_at', 'updated_at']
+    
+    def get_thumbnail_url(self, obj):
+        if not obj.thumbnail_path:
+            return None
+        return SignedMediaService.build_url(obj.thumbnail_path)
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Mirrored media is served through short-lived signed URLs
+        if instance.media_path:
+            data['video_url'] = SignedMediaService.build_url(instance.media_path)
+        return data
 
 
 class VideoGenerationCreateSerializer(serializers.Serializer):
@@ -48,14 +64,28 @@ class VideoGenerationCreateSerializer(serializers.Serializer):
     options = serializers.DictField(required=False, allow_null=True)
 
 
-class ImageGenerationSerializer(serializers.ModelSerializer):
+class ImageGenerationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    thumbnail_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = ImageGeneration
         fields = [
             'id', 'prompt', 'tool', 'model_id', 'credits_used', 
-            'status', 'image_url', 'error_message', 'created_at', 'updated_at'
+            'status', 'image_url', 'thumbnail_url', 'error_message', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'status', 'image_url', 'error_message', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'image_url', 'thumbnail_url', 'error_message', 'created_at', 'updated_at']
+    
+    def get_thumbnail_url(self, obj):
+        if not obj.thumbnail_path:
+            return None
+        return SignedMediaService.build_url(obj.thumbnail_path)
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Mirrored media is served through short-lived signed URLs
+        if instance.media_path:
+            data['image_url'] = SignedMediaService.build_url(instance.media_path)
+        return data
 
 
 class ImageGenerationCreateSerializer(serializers.Serializer):
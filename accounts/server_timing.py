@@ -0,0 +1,101 @@
+"""
+Per-request time breakdown (DB, outbound HTTP, serialization)
+ServerTimingMiddleware opens a timing context for each request; code that
+waits on something wraps it in track(name) (or calls add()), and DB time is
+collected by an execute_wrapper. Outside a request every call is a single
+ContextVar lookup and returns immediately.
+
+Phases: db (ORM queries), epoint / google / fal (outbound HTTP), serialize
+(DRF serializers and JSON rendering). The totals feed the per-view
+counters in accounts.metrics and, for staff or a sampled share of requests,
+a Server-Timing response header that browser dev tools display.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('server_timing', default=None)
+
+
+class RequestTimings:
+    """Accumulated seconds (and call counts) per phase for one request"""
+
+    __slots__ = ('durations', 'counts', '_depth', 'started')
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._depth = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def header(self):
+        """Server-Timing header value, phases in ms plus the total"""
+        parts = []
+        for name, seconds in self.durations.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]}x"')
+        parts.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def begin():
+    """Start collecting for the current request; returns a token for end()"""
+    return _current.set(RequestTimings())
+
+
+def end(token):
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+def current():
+    return _current.get()
+
+
+def add(name, seconds):
+    """Attribute `seconds` to phase `name` of the current request (no-op outside one)"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def track(name):
+    """
+    Time the block under `name`. Nested blocks of the same name count once,
+    so recursive serializers are not double-counted.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    depth = timings._depth.get(name, 0)
+    timings._depth[name] = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._depth[name] = depth
+        if depth == 0:
+            timings.add(name, time.perf_counter() - start)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper that adds query time to the 'db' phase"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        add('db', time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin: count to_representation time as 'serialize'"""
+
+    def to_representation(self, instance):
+        with track('serialize'):
+            return super().to_representation(instance)
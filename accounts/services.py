@@ -1,8 +1,12 @@
 import logging
-import fal_client
 from django.conf import settings
-from .models import VideoGeneration, ImageGeneration, Subscription, CreditPurchase, Payment, CreditHold
+from .models import VideoGeneration, ImageGeneration, Subscription, CreditPurchase, Payment, CreditHold, GenerationModelVersion
 from django.db import models
+from django.utils import timezone
+from .media_service import MediaMirrorService, MediaBlobService
+from .upload_service import ReferenceImageService
+from . import fal_gateway
+from .generation_timing import GenerationTimer
 
 logger = logging.getLogger(__name__)
 
@@ -213,20 +217,6 @@ IMAGE_TO_VIDEO_TOOL_CONFIG = {
 # Combined tool config for backward compatibility
 TOOL_CONFIG = {**VIDEO_TOOL_CONFIG, **IMAGE_TOOL_CONFIG, **IMAGE_TO_VIDEO_TOOL_CONFIG}
 
-# Validate locked prices after all configs are defined
-def _validate_locked_prices():
-    """Internal function to validate locked prices"""
-    from .constants import validate_locked_prices
-    try:
-        validate_locked_prices(VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG)
-        logger.info("Locked pricing validation passed")
-    except ValueError as e:
-        logger.error(f"LOCKED PRICING VALIDATION FAILED: {e}")
-        raise
-
-# Run validation
-_validate_locked_prices()
-
 
 class VideoGenerationService:
     @staticmethod
@@ -244,16 +234,27 @@ class VideoGenerationService:
         """Create a video generation request"""
         if options is None:
             options = {}
+        timer = GenerationTimer()
         
-        logger.info(f"Starting video generation - User: {user.email}, Tool: {tool}, Options: {options}")
+        logger.info(
+            "Starting video generation - User ID: %s, Tool: %s", user.id, tool,
+            extra={'event': 'generation.request', 'kind': 'video', 'user_id': user.id, 'tool': tool}
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Video options: %s", {k: v for k, v in options.items() if k != 'referenceImage'})
         
         tool_config = VideoGenerationService.get_tool_config(tool)
         
         if not tool_config:
-            logger.error(f"Invalid tool requested: {tool}")
+            logger.error("Invalid tool requested: %s", tool)
             raise ValueError(f"Invalid tool: {tool}")
         
-        logger.info(f"Tool config - Model: {tool_config['model']}, Credits: {tool_config['credits']}")
+        logger.debug("Tool config - Model: %s, Credits: %s", tool_config['model'], tool_config['credits'])
+        
+        # Resolve an uploaded reference image handle (see ReferenceImageUploadView)
+        reference_blob = None
+        if ReferenceImageService.is_handle(options.get('referenceImage')):
+            reference_blob = ReferenceImageService.resolve_handle(options['referenceImage'], user)
         
         # Check if user has enough credits (including held credits)
         required_credits = tool_config['credits']
@@ -270,11 +271,9 @@ class VideoGenerationService:
         
         if actually_available < required_credits:
             logger.warning(
-                f"Insufficient credits - User: {user.email}, "
-                f"Required: {required_credits}, "
-                f"Available: {available_credits}, "
-                f"Held: {held_credits}, "
-                f"Actually Available: {actually_available}"
+                "Insufficient credits - User ID: %s, Required: %s, Available: %s, Held: %s, Actually Available: %s",
+                user.id, required_credits, available_credits, held_credits, actually_available,
+                extra={'event': 'credits.insufficient', 'user_id': user.id}
             )
             raise ValueError(f"Insufficient credits. Required: {required_credits}, Available: {actually_available}")
         
@@ -283,11 +282,14 @@ class VideoGenerationService:
             user=user,
             prompt=prompt,
             tool=tool,
-            model_id=tool_config['model'],
+            model_version_id=GenerationModelVersion.resolve('video', tool, tool_config['model']),
             credits_used=required_credits,
-            status='pending'
+            status='pending',
+            reference_blob=reference_blob,
         )
-        logger.info(f"Video generation record created - ID: {video_gen.id}")
+        if reference_blob:
+            MediaBlobService.acquire(reference_blob.pk)
+        logger.debug("Video generation record created - ID: %s", video_gen.id)
         
         # HOLD credits (deduct from available balance, but mark as held)
         user.credits -= required_credits
@@ -301,10 +303,14 @@ class VideoGenerationService:
             credits_held=required_credits,
             status='hold'
         )
-        logger.info(f"Credits held - User: {user.email}, Amount: {required_credits}, Hold ID: {credit_hold.id}, Remaining: {user.credits}")
+        logger.info(
+            "Credits held - User ID: %s, Amount: %s, Hold ID: %s, Remaining: %s",
+            user.id, required_credits, credit_hold.id, user.credits,
+            extra={'event': 'credits.held', 'user_id': user.id, 'hold_id': credit_hold.id}
+        )
         
         try:
-            logger.info(f"Submitting to fal.ai - Model: {tool_config['model']}, Prompt length: {len(prompt)}")
+            logger.debug("Submitting to fal.ai - Model: %s, Prompt length: %s", tool_config['model'], len(prompt))
             
             # Check if FAL_KEY is set
             if not hasattr(settings, 'FAL_KEY') or not settings.FAL_KEY:
@@ -316,9 +322,13 @@ class VideoGenerationService:
             }
             
             # Add reference image if provided (for image-to-video models)
-            if options.get('referenceImage'):
+            if reference_blob:
+                arguments['image_url'] = ReferenceImageService.build_url(reference_blob)
+                logger.debug("Adding uploaded reference image for image-to-video: %s", reference_blob.sha256[:12])
+            elif options.get('referenceImage'):
+                # Legacy inline URL / data URI - never log the payload itself
                 arguments['image_url'] = options['referenceImage']
-                logger.info(f"Adding reference image for image-to-video: {options['referenceImage'][:100]}...")
+                logger.debug("Adding inline reference image for image-to-video, length: %s", len(options['referenceImage']))
             
             # Add negative prompt if provided
             if options.get('negativePrompt'):
@@ -342,7 +352,7 @@ class VideoGenerationService:
                     arguments['enable_audio'] = True
                 else:
                     arguments['enable_audio'] = True
-                logger.info(f"Audio enabled for tool: {tool}")
+                logger.debug("Audio enabled for tool: %s", tool)
             
             # Add resolution
             if options.get('resolution'):
@@ -366,77 +376,96 @@ class VideoGenerationService:
                 if options.get('characterReference'):
                     arguments['character_reference'] = True
             
-            logger.info(f"Fal.ai arguments: {arguments}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Fal.ai arguments: %s", {k: v for k, v in arguments.items() if k != 'image_url'})
             
             # Submit to fal.ai
-            handler = fal_client.submit(
-                tool_config['model'],
-                arguments=arguments
+            with timer.external():
+                handler = fal_gateway.submit(
+                    tool_config['model'],
+                    arguments
+                )
+            video_gen.submitted_at = timezone.now()
+            
+            logger.info(
+                "Request submitted to fal.ai - Request ID: %s", handler.request_id,
+                extra={'event': 'generation.submitted', 'fal_request_id': handler.request_id, 'tool': tool}
             )
             
-            logger.info(f"Request submitted to fal.ai - Request ID: {handler.request_id}")
-            
             # Store the request ID
             video_gen.fal_request_id = handler.request_id
             video_gen.status = 'processing'
             video_gen.save()
             
             # Get the result (this will wait for completion)
-            logger.info(f"Waiting for result - Request ID: {handler.request_id}")
-            result = handler.get()
-            logger.info(f"Result received - Request ID: {handler.request_id}, Result keys: {list(result.keys()) if result else 'None'}")
+            logger.debug("Waiting for result - Request ID: %s", handler.request_id)
+            with timer.external():
+                result, video_gen.started_at = fal_gateway.wait(handler)
+            video_gen.finished_at = timezone.now()
+            logger.debug("Result received - Request ID: %s, Result keys: %s", handler.request_id, result.keys() if result else None)
             
             # Update with result
             if result and 'video' in result:
                 video_gen.video_url = result['video']['url']
                 video_gen.status = 'completed'
-                logger.info(f"Video generation completed - ID: {video_gen.id}, URL: {video_gen.video_url}")
+                logger.info(
+                    "Video generation completed - ID: %s", video_gen.id,
+                    extra={'event': 'generation.completed', 'kind': 'video', 'generation_id': video_gen.id, 'tool': tool}
+                )
                 
                 # CONFIRM credit hold (credits are permanently deducted)
                 try:
                     credit_hold = CreditHold.objects.get(video_generation=video_gen, status='hold')
                     credit_hold.confirm()
-                    logger.info(f"Credit hold confirmed - Hold ID: {credit_hold.id}")
+                    logger.info("Credit hold confirmed - Hold ID: %s", credit_hold.id, extra={'event': 'credits.confirmed', 'hold_id': credit_hold.id})
                 except CreditHold.DoesNotExist:
-                    logger.warning(f"No credit hold found for video generation {video_gen.id}")
+                    logger.warning("No credit hold found for video generation %s", video_gen.id)
             else:
                 video_gen.status = 'failed'
                 video_gen.error_message = f"No video URL in response. Result keys: {list(result.keys()) if result else 'None'}"
-                logger.error(f"No video in result - ID: {video_gen.id}, Result: {result}")
+                logger.error("No video in result - ID: %s, Result: %s", video_gen.id, result, extra={'event': 'generation.failed'})
                 
                 # RELEASE credit hold (return credits to user)
                 try:
                     credit_hold = CreditHold.objects.get(video_generation=video_gen, status='hold')
                     credit_hold.release()
-                    logger.info(f"Credit hold released - Hold ID: {credit_hold.id}, Credits returned")
+                    logger.info("Credit hold released - Hold ID: %s, Credits returned", credit_hold.id, extra={'event': 'credits.released', 'hold_id': credit_hold.id})
                 except CreditHold.DoesNotExist:
-                    logger.warning(f"No credit hold found for video generation {video_gen.id}")
+                    logger.warning("No credit hold found for video generation %s", video_gen.id)
             
+            video_gen.overhead_ms = timer.overhead_ms()
             video_gen.save()
             
         except Exception as e:
             error_type = type(e).__name__
             error_message = str(e)
             logger.error(
-                f"Video generation exception - User: {user.email}, Tool: {tool}, "
-                f"Video ID: {video_gen.id}, Error Type: {error_type}, Error: {error_message}",
-                exc_info=True
+                "Video generation exception - User ID: %s, Tool: %s, Video ID: %s, Error Type: %s, Error: %s",
+                user.id, tool, video_gen.id, error_type, error_message,
+                exc_info=True,
+                extra={'event': 'generation.failed', 'kind': 'video', 'generation_id': video_gen.id, 'tool': tool}
             )
             
             # RELEASE credit hold (return credits to user)
             try:
                 credit_hold = CreditHold.objects.get(video_generation=video_gen, status='hold')
                 credit_hold.release()
-                logger.info(f"Credit hold released due to error - Hold ID: {credit_hold.id}, Credits returned")
+                logger.info("Credit hold released due to error - Hold ID: %s, Credits returned", credit_hold.id, extra={'event': 'credits.released', 'hold_id': credit_hold.id})
             except CreditHold.DoesNotExist:
-                logger.warning(f"No credit hold found for video generation {video_gen.id}")
+                logger.warning("No credit hold found for video generation %s", video_gen.id)
             
             video_gen.status = 'failed'
             video_gen.error_message = f"{error_type}: {error_message}"
+            video_gen.finished_at = video_gen.finished_at or timezone.now()
+            video_gen.overhead_ms = timer.overhead_ms()
             video_gen.save()
             
             raise
         
+        # Copy the result off fal's CDN in the background
+        if video_gen.status == 'completed':
+            MediaMirrorService.schedule(video_gen)
+        
         return video_gen
     
     @staticmethod
@@ -456,16 +485,21 @@ class ImageGenerationService:
         """Create an image generation request"""
         if options is None:
             options = {}
+        timer = GenerationTimer()
         
-        logger.info(f"Starting image generation - User: {user.email}, Tool: {tool}, Options: {options}")
+        logger.info(
+            "Starting image generation - User ID: %s, Tool: %s", user.id, tool,
+            extra={'event': 'generation.request', 'kind': 'image', 'user_id': user.id, 'tool': tool}
+        )
+        logger.debug("Image options: %s", options)
         
         tool_config = ImageGenerationService.get_tool_config(tool)
         
         if not tool_config:
-            logger.error(f"Invalid tool requested: {tool}")
+            logger.error("Invalid tool requested: %s", tool)
             raise ValueError(f"Invalid tool: {tool}")
         
-        logger.info(f"Tool config - Model: {tool_config['model']}, Credits: {tool_config['credits']}")
+        logger.debug("Tool config - Model: %s, Credits: %s", tool_config['model'], tool_config['credits'])
         
         # Check if user has enough credits (including held credits)
         required_credits = tool_config['credits']
@@ -482,11 +516,9 @@ class ImageGenerationService:
         
         if actually_available < required_credits:
             logger.warning(
-                f"Insufficient credits - User: {user.email}, "
-                f"Required: {required_credits}, "
-                f"Available: {available_credits}, "
-                f"Held: {held_credits}, "
-                f"Actually Available: {actually_available}"
+                "Insufficient credits - User ID: %s, Required: %s, Available: %s, Held: %s, Actually Available: %s",
+                user.id, required_credits, available_credits, held_credits, actually_available,
+                extra={'event': 'credits.insufficient', 'user_id': user.id}
             )
             raise ValueError(f"Insufficient credits. Required: {required_credits}, Available: {actually_available}")
         
@@ -495,11 +527,11 @@ class ImageGenerationService:
             user=user,
             prompt=prompt,
             tool=tool,
-            model_id=tool_config['model'],
+            model_version_id=GenerationModelVersion.resolve('image', tool, tool_config['model']),
             credits_used=required_credits,
             status='pending'
         )
-        logger.info(f"Image generation record created - ID: {image_gen.id}")
+        logger.debug("Image generation record created - ID: %s", image_gen.id)
         
         # HOLD credits (deduct from available balance, but mark as held)
         user.credits -= required_credits
@@ -513,10 +545,14 @@ class ImageGenerationService:
             credits_held=required_credits,
             status='hold'
         )
-        logger.info(f"Credits held - User: {user.email}, Amount: {required_credits}, Hold ID: {credit_hold.id}, Remaining: {user.credits}")
+        logger.info(
+            "Credits held - User ID: %s, Amount: %s, Hold ID: %s, Remaining: %s",
+            user.id, required_credits, credit_hold.id, user.credits,
+            extra={'event': 'credits.held', 'user_id': user.id, 'hold_id': credit_hold.id}
+        )
         
         try:
-            logger.info(f"Submitting to fal.ai - Model: {tool_config['model']}, Prompt length: {len(prompt)}")
+            logger.debug("Submitting to fal.ai - Model: %s, Prompt length: %s", tool_config['model'], len(prompt))
             
             # Check if FAL_KEY is set
             if not hasattr(settings, 'FAL_KEY') or not settings.FAL_KEY:
@@ -535,25 +571,32 @@ class ImageGenerationService:
             if options.get('seed'):
                 arguments['seed'] = int(options['seed'])
             
-            logger.info(f"Fal.ai arguments: {arguments}")
+            logger.debug("Fal.ai arguments: %s", arguments)
             
             # Submit to fal.ai
-            handler = fal_client.submit(
-                tool_config['model'],
-                arguments=arguments
+            with timer.external():
+                handler = fal_gateway.submit(
+                    tool_config['model'],
+                    arguments
+                )
+            image_gen.submitted_at = timezone.now()
+            
+            logger.info(
+                "Request submitted to fal.ai - Request ID: %s", handler.request_id,
+                extra={'event': 'generation.submitted', 'fal_request_id': handler.request_id, 'tool': tool}
             )
             
-            logger.info(f"Request submitted to fal.ai - Request ID: {handler.request_id}")
-            
             # Store the request ID
             image_gen.fal_request_id = handler.request_id
             image_gen.status = 'processing'
             image_gen.save()
             
             # Get the result (this will wait for completion)
-            logger.info(f"Waiting for result - Request ID: {handler.request_id}")
-            result = handler.get()
-            logger.info(f"Result received - Request ID: {handler.request_id}, Result keys: {list(result.keys()) if result else 'None'}")
+            logger.debug("Waiting for result - Request ID: %s", handler.request_id)
+            with timer.external():
+                result, image_gen.started_at = fal_gateway.wait(handler)
+            image_gen.finished_at = timezone.now()
+            logger.debug("Result received - Request ID: %s, Result keys: %s", handler.request_id, result.keys() if result else None)
             
             # Update with result
             if result and 'images' in result:
@@ -563,15 +606,18 @@ class ImageGenerationService:
                 else:
                     image_gen.image_url = result['images']
                 image_gen.status = 'completed'
-                logger.info(f"Image generation completed - ID: {image_gen.id}, URL: {image_gen.image_url}")
+                logger.info(
+                    "Image generation completed - ID: %s", image_gen.id,
+                    extra={'event': 'generation.completed', 'kind': 'image', 'generation_id': image_gen.id, 'tool': tool}
+                )
                 
                 # CONFIRM credit hold (credits are permanently deducted)
                 try:
                     credit_hold = CreditHold.objects.get(image_generation=image_gen, status='hold')
                     credit_hold.confirm()
-                    logger.info(f"Credit hold confirmed - Hold ID: {credit_hold.id}")
+                    logger.info("Credit hold confirmed - Hold ID: %s", credit_hold.id, extra={'event': 'credits.confirmed', 'hold_id': credit_hold.id})
                 except CreditHold.DoesNotExist:
-                    logger.warning(f"No credit hold found for image generation {image_gen.id}")
+                    logger.warning("No credit hold found for image generation %s", image_gen.id)
             elif result and 'image' in result:
                 # Some models return 'image' object
                 if isinstance(result['image'], dict):
@@ -579,53 +625,64 @@ class ImageGenerationService:
                 else:
                     image_gen.image_url = result['image']
                 image_gen.status = 'completed'
-                logger.info(f"Image generation completed - ID: {image_gen.id}, URL: {image_gen.image_url}")
+                logger.info(
+                    "Image generation completed - ID: %s", image_gen.id,
+                    extra={'event': 'generation.completed', 'kind': 'image', 'generation_id': image_gen.id, 'tool': tool}
+                )
                 
                 # CONFIRM credit hold (credits are permanently deducted)
                 try:
                     credit_hold = CreditHold.objects.get(image_generation=image_gen, status='hold')
                     credit_hold.confirm()
-                    logger.info(f"Credit hold confirmed - Hold ID: {credit_hold.id}")
+                    logger.info("Credit hold confirmed - Hold ID: %s", credit_hold.id, extra={'event': 'credits.confirmed', 'hold_id': credit_hold.id})
                 except CreditHold.DoesNotExist:
-                    logger.warning(f"No credit hold found for image generation {image_gen.id}")
+                    logger.warning("No credit hold found for image generation %s", image_gen.id)
             else:
                 image_gen.status = 'failed'
                 image_gen.error_message = f"No image URL in response. Result keys: {list(result.keys()) if result else 'None'}"
-                logger.error(f"No image in result - ID: {image_gen.id}, Result: {result}")
+                logger.error("No image in result - ID: %s, Result: %s", image_gen.id, result, extra={'event': 'generation.failed'})
                 
                 # RELEASE credit hold (return credits to user)
                 try:
                     credit_hold = CreditHold.objects.get(image_generation=image_gen, status='hold')
                     credit_hold.release()
-                    logger.info(f"Credit hold released - Hold ID: {credit_hold.id}, Credits returned")
+                    logger.info("Credit hold released - Hold ID: %s, Credits returned", credit_hold.id, extra={'event': 'credits.released', 'hold_id': credit_hold.id})
                 except CreditHold.DoesNotExist:
-                    logger.warning(f"No credit hold found for image generation {image_gen.id}")
+                    logger.warning("No credit hold found for image generation %s", image_gen.id)
             
+            image_gen.overhead_ms = timer.overhead_ms()
             image_gen.save()
             
         except Exception as e:
             error_type = type(e).__name__
             error_message = str(e)
             logger.error(
-                f"Image generation exception - User: {user.email}, Tool: {tool}, "
-                f"Image ID: {image_gen.id}, Error Type: {error_type}, Error: {error_message}",
-                exc_info=True
+                "Image generation exception - User ID: %s, Tool: %s, Image ID: %s, Error Type: %s, Error: %s",
+                user.id, tool, image_gen.id, error_type, error_message,
+                exc_info=True,
+                extra={'event': 'generation.failed', 'kind': 'image', 'generation_id': image_gen.id, 'tool': tool}
             )
             
             # RELEASE credit hold (return credits to user)
             try:
                 credit_hold = CreditHold.objects.get(image_generation=image_gen, status='hold')
                 credit_hold.release()
-                logger.info(f"Credit hold released due to error - Hold ID: {credit_hold.id}, Credits returned")
+                logger.info("Credit hold released due to error - Hold ID: %s, Credits returned", credit_hold.id, extra={'event': 'credits.released', 'hold_id': credit_hold.id})
             except CreditHold.DoesNotExist:
-                logger.warning(f"No credit hold found for image generation {image_gen.id}")
+                logger.warning("No credit hold found for image generation %s", image_gen.id)
             
             image_gen.status = 'failed'
             image_gen.error_message = f"{error_type}: {error_message}"
+            image_gen.finished_at = image_gen.finished_at or timezone.now()
+            image_gen.overhead_ms = timer.overhead_ms()
             image_gen.save()
             
             raise
         
+        # Copy the result off fal's CDN in the background
+        if image_gen.status == 'completed':
+            MediaMirrorService.schedule(image_gen)
+        
         return image_gen
     
     @staticmethod
@@ -0,0 +1,27 @@
+"""
+Model signal handlers
+"""
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import User, VideoGeneration, ImageGeneration
+
+
+@receiver(post_delete, sender=VideoGeneration)
+@receiver(post_delete, sender=ImageGeneration)
+def release_generation_media(sender, instance, **kwargs):
+    """Drop the deleted generation's references on its content-addressed media"""
+    from .media_service import MediaBlobService
+
+    MediaBlobService.release(instance.media_blob_id)
+    MediaBlobService.release(instance.thumbnail_blob_id)
+    if sender is VideoGeneration:
+        MediaBlobService.release(instance.reference_blob_id)
+
+
+@receiver(pre_delete, sender=User)
+def forget_archived_generations(sender, instance, **kwargs):
+    """Account deletion also removes the user's archived generations and releases their media"""
+    from .generation_archive import GenerationArchiveService
+
+    GenerationArchiveService.forget_user(instance)
@@ -0,0 +1,172 @@
+"""
+Slow-query log
+An execute wrapper installed on every database connection (requests,
+commands and background threads alike) times each statement. Statements
+slower than SLOW_QUERY_THRESHOLD_MS are kept in a bounded per-process ring
+buffer with their normalized fingerprint, the accounts/ frame that issued
+them and, optionally (SLOW_QUERY_EXPLAIN), the plan from EXPLAIN, at most
+once per fingerprint per SLOW_QUERY_EXPLAIN_INTERVAL. Each slow query is
+also logged as a 'db.slow_query' event so other workers' entries are not
+lost. Staff view the buffer at /admin/slow-queries/.
+
+Fast statements cost one perf_counter() pair and a comparison.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals, placeholders and IN-lists collapsed, so one query shape maps to one string"""
+    sql = _LITERALS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class SlowQueryLog:
+    """Per-process ring buffer of slow statements plus per-fingerprint totals"""
+
+    # Configuration from Django settings
+    ENABLED = getattr(settings, 'SLOW_QUERY_ENABLED', True)
+    THRESHOLD_MS = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+    SIZE = getattr(settings, 'SLOW_QUERY_LOG_SIZE', 500)
+    EXPLAIN = getattr(settings, 'SLOW_QUERY_EXPLAIN', False)
+    EXPLAIN_INTERVAL = getattr(settings, 'SLOW_QUERY_EXPLAIN_INTERVAL', 300)  # Seconds per fingerprint
+    MAX_FINGERPRINTS = 1000
+
+    entries = deque(maxlen=SIZE)  # deque.append is atomic; no lock on the hot path
+    fingerprints = {}  # fingerprint -> {'count', 'total_ms', 'max_ms', 'last_seen', 'plan'}
+    _lock = threading.Lock()  # Guards fingerprints (slow path only)
+    _local = threading.local()  # Re-entrancy guard while running EXPLAIN
+
+    @staticmethod
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= SlowQueryLog.THRESHOLD_MS and not getattr(SlowQueryLog._local, 'explaining', False):
+                try:
+                    SlowQueryLog.record(sql, params, many, elapsed_ms, context['connection'])
+                except Exception as e:
+                    logger.warning(f"Could not record slow query: {str(e)}")
+
+    @staticmethod
+    def record(sql, params, many, elapsed_ms, connection):
+        shape = fingerprint(sql)
+        caller = SlowQueryLog._caller()
+        plan = None
+        now = time.time()
+        with SlowQueryLog._lock:
+            stats = SlowQueryLog.fingerprints.get(shape)
+            if stats is None:
+                if len(SlowQueryLog.fingerprints) >= SlowQueryLog.MAX_FINGERPRINTS:
+                    oldest = min(SlowQueryLog.fingerprints, key=lambda key: SlowQueryLog.fingerprints[key]['last_seen'])
+                    del SlowQueryLog.fingerprints[oldest]
+                stats = SlowQueryLog.fingerprints[shape] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_seen': now, 'plan': None, 'explained_at': 0,
+                }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['last_seen'] = now
+            explain = (
+                SlowQueryLog.EXPLAIN and not many and sql.lstrip()[:6].upper() == 'SELECT'
+                and now - stats['explained_at'] >= SlowQueryLog.EXPLAIN_INTERVAL
+            )
+            if explain:
+                stats['explained_at'] = now
+        if explain:
+            plan = SlowQueryLog._explain(connection, sql, params)
+            stats['plan'] = plan
+
+        SlowQueryLog.entries.append({
+            'at': timezone.now(),
+            'ms': round(elapsed_ms, 1),
+            'alias': connection.alias,
+            'sql': sql[:4000],
+            'params': repr(params)[:500],
+            'fingerprint': shape,
+            'caller': caller,
+            'plan': plan,
+            'pid': os.getpid(),
+        })
+        logger.warning(
+            "Slow query %.1fms at %s: %s", elapsed_ms, caller or '?', shape[:300],
+            extra={'event': 'db.slow_query', 'duration_ms': round(elapsed_ms, 1), 'caller': caller, 'fingerprint': shape[:1000]},
+        )
+
+    @staticmethod
+    def _caller():
+        """Innermost frame in the accounts app (outside this module) that led to the query"""
+        frame = sys._getframe(2)
+        app_dir = os.path.dirname(__file__) + os.sep
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(app_dir) and filename != __file__:
+                return f"{os.path.relpath(filename, os.path.dirname(app_dir.rstrip(os.sep)))}:{frame.f_lineno} in {frame.f_code.co_name}"
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def _explain(connection, sql, params):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        SlowQueryLog._local.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                return '\n'.join(' | '.join(str(column) for column in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'EXPLAIN failed: {type(e).__name__}: {e}'
+        finally:
+            SlowQueryLog._local.explaining = False
+
+    @staticmethod
+    def snapshot():
+        """Newest entries first, and fingerprints by total time"""
+        entries = list(SlowQueryLog.entries)
+        entries.reverse()
+        with SlowQueryLog._lock:
+            fingerprints = sorted(
+                ({'fingerprint': shape, **stats} for shape, stats in SlowQueryLog.fingerprints.items()),
+                key=lambda row: row['total_ms'], reverse=True,
+            )
+        return entries, fingerprints
+
+    @staticmethod
+    def clear():
+        SlowQueryLog.entries.clear()
+        with SlowQueryLog._lock:
+            SlowQueryLog.fingerprints.clear()
+
+
+def _install_on_connection(sender, connection, **kwargs):
+    if SlowQueryLog.wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(SlowQueryLog.wrapper)
+
+
+def install():
+    """Wrap every database connection, current and future (called from AccountsConfig.ready)"""
+    if not SlowQueryLog.ENABLED:
+        return
+    from django.db import connections
+
+    connection_created.connect(_install_on_connection, dispatch_uid='accounts.slow_queries')
+    for connection in connections.all(initialized_only=True):
+        _install_on_connection(None, connection)
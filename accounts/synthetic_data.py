@@ -0,0 +1,399 @@
+"""
+Synthetic data for scale testing
+Generates realistic users, generations, credit holds, top-ups, payments and
+subscriptions in streamed batches, so that production-sized tables
+(users with 50k generations, tens of millions of holds) can be reproduced
+locally and queries, indexes and admin pages measured against them.
+
+Activity is skewed: each user gets a Zipf weight (rank ** -skew), so a few
+heavy users own most generations and purchases while the long tail has a
+handful. Rows are written in time order with explicit primary keys, with
+bulk_create per batch or COPY on Postgres, children in the same
+transaction as their parents, and sequences are reset afterwards.
+
+Driven by `python manage.py generate_synthetic_data`.
+"""
+import bisect
+import csv
+import io
+import json
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import User, VideoGeneration, ImageGeneration, GenerationModelVersion, CreditHold, Payment, Subscription, CreditPurchase
+from .services import VIDEO_TOOL_CONFIG, IMAGE_TOOL_CONFIG, IMAGE_TO_VIDEO_TOOL_CONFIG
+from .subscription_constants import SUBSCRIPTION_PLANS
+from .topup_constants import TOPUP_PACKAGES
+
+CENT = Decimal('0.01')
+
+# Generation status -> (share, hold status)
+GENERATION_STATUSES = {
+    'completed': (0.86, 'confirmed'),
+    'failed': (0.10, 'released'),
+    'processing': (0.03, 'hold'),
+    'pending': (0.01, 'hold'),
+}
+
+PROMPT_WORDS = (
+    'cinematic slow motion drone shot of a misty forest at dawn golden hour light neon city street at night '
+    'rain reflections portrait of an old fisherman weathered face soft studio lighting macro photo of dew on '
+    'a spider web astronaut floating above earth detailed realistic 35mm film grain watercolor illustration '
+    'of a fox in the snow product shot of a perfume bottle on marble minimal background aerial view of waves '
+    'crashing on black sand beach tracking shot following a cyclist through mountain roads vibrant colors '
+    'ultra detailed 4k anime style sunset over rooftops cozy cafe interior warm tones wide angle lens'
+).split()
+
+
+@contextmanager
+def historical_timestamps(*model_classes):
+    """Let bulk_create keep the created_at/updated_at values we set instead of stamping now()"""
+    saved = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BatchWriter:
+    """Writes model instances in batches with bulk_create, or COPY on Postgres"""
+
+    def __init__(self, use_copy=None, batch_size=5000):
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        if self.use_copy and connection.vendor != 'postgresql':
+            raise ValueError('COPY is only available on Postgres')
+        self.batch_size = batch_size
+
+    def write(self, rows):
+        """
+        Consume an iterable of unsaved instances (primary keys set), or of tuples
+        of a parent and its children; returns the row count per model.
+        Parents are flushed before children within every batch.
+        """
+        buffers = {}  # Model -> pending instances, in first-seen (parent-first) order
+        counts = {}
+        pending = 0
+        for row in rows:
+            for obj in row if isinstance(row, tuple) else (row,):
+                buffers.setdefault(type(obj), []).append(obj)
+            pending += 1
+            if pending >= self.batch_size:
+                self._flush(buffers, counts)
+                pending = 0
+        if pending:
+            self._flush(buffers, counts)
+        return counts
+
+    def _flush(self, buffers, counts):
+        with transaction.atomic():
+            for model, batch in buffers.items():
+                if not batch:
+                    continue
+                if self.use_copy:
+                    self._copy(model, batch)
+                else:
+                    model.objects.bulk_create(batch, batch_size=self.batch_size)
+                counts[model.__name__] = counts.get(model.__name__, 0) + len(batch)
+                batch.clear()
+
+    def _copy(self, model, batch):
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in batch:
+            writer.writerow([self._copy_value(field, field.get_prep_value(getattr(obj, field.attname))) for field in fields])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        sql = (
+            f"COPY {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    @staticmethod
+    def _copy_value(field, value):
+        if value is None:
+            return '\\N'
+        if isinstance(field, models.JSONField):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def reset_sequences(self, *model_classes):
+        """Move id sequences past the explicit primary keys we inserted (no-op on SQLite)"""
+        statements = connection.ops.sequence_reset_sql(no_style(), list(model_classes))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+class SyntheticDataGenerator:
+    """Builds the synthetic rows; every table is streamed so memory stays flat"""
+
+    def __init__(self, users=1000, videos=10000, images=10000, purchases=2000, subscribed_share=0.2,
+                 skew=1.1, days=365, seed=None, password='synthetic', email_domain='synthetic.invalid'):
+        self.users = users
+        self.videos = videos
+        self.images = images
+        self.purchases = purchases
+        self.subscribed_share = subscribed_share
+        self.skew = skew
+        self.days = days
+        self.random = random.Random(seed)
+        self.password_hash = make_password(password)  # Hashed once; hashing per user would dominate
+        self.email_domain = email_domain
+
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.span = (self.now - self.start).total_seconds()
+
+        # Explicit primary keys continue after whatever is already there
+        self.first_ids = {
+            model: (model.objects.aggregate(top=models.Max('pk'))['top'] or 0) + 1
+            for model in (User, VideoGeneration, ImageGeneration, CreditHold, Payment, Subscription, CreditPurchase)
+        }
+        self.next_hold_id = self.first_ids[CreditHold]
+        self.next_payment_id = self.first_ids[Payment]
+
+        # Activity weight per user (Zipf over a random ranking), as cumulative sums for bisect
+        ranks = list(range(1, users + 1))
+        self.random.shuffle(ranks)
+        self.cumulative = []
+        total = 0.0
+        for rank in ranks:
+            total += rank ** -skew
+            self.cumulative.append(total)
+
+        self.video_tools = [
+            (tool, config) for tool, config in {**VIDEO_TOOL_CONFIG, **IMAGE_TO_VIDEO_TOOL_CONFIG}.items()
+            if tool in dict(VideoGeneration.TOOL_CHOICES)
+        ]
+        self.image_tools = [
+            (tool, config) for tool, config in IMAGE_TOOL_CONFIG.items()
+            if tool in dict(ImageGeneration.TOOL_CHOICES)
+        ]
+
+    # Helpers
+
+    def _time_at(self, fraction, jitter=60):
+        """Timestamp at `fraction` of the way through the window, give or take `jitter` seconds"""
+        seconds = min(self.span, max(0.0, fraction * self.span + self.random.uniform(-jitter, jitter)))
+        return self.start + timedelta(seconds=seconds)
+
+    def _user_at(self, when):
+        """Weighted pick among users who had signed up by `when` (users join evenly, in id order)"""
+        fraction = (when - self.start).total_seconds() / self.span if self.span else 1.0
+        eligible = max(1, min(self.users, int(self.users * fraction) + 1))
+        index = bisect.bisect_left(self.cumulative, self.random.random() * self.cumulative[eligible - 1])
+        return self.first_ids[User] + min(index, eligible - 1)
+
+    def _prompt(self):
+        return ' '.join(self.random.choices(PROMPT_WORDS, k=self.random.randint(8, 60)))
+
+    def _status(self):
+        roll = self.random.random()
+        for status, (share, hold_status) in GENERATION_STATUSES.items():
+            if roll < share:
+                return status, hold_status
+            roll -= share
+        return 'completed', 'confirmed'
+
+    def _fees(self, amount):
+        amount = Decimal(str(amount)).quantize(CENT)
+        commission = (amount * Decimal('0.03')).quantize(CENT)
+        epoint_amount = amount - commission
+        tax = (epoint_amount * Decimal('0.04')).quantize(CENT)
+        return {
+            'amount': amount, 'commission': commission, 'epoint_amount': epoint_amount,
+            'tax': tax, 'net_amount': epoint_amount - tax,
+        }
+
+    # Row streams
+
+    def user_rows(self):
+        first = self.first_ids[User]
+        for index in range(self.users):
+            joined = self._time_at(index / max(1, self.users), jitter=0)
+            yield User(
+                id=first + index,
+                email=f'user{first + index}@{self.email_domain}',
+                password=self.password_hash,
+                credits=self.random.choice([0, 0, 15, 40, 120, 450, 900, 2200]),
+                language=self.random.choice(['en', 'en', 'az', 'ru', 'tr']),
+                theme=self.random.choice(['dark', 'dark', 'light']),
+                is_active=True,
+                date_joined=joined,
+                last_login=joined + timedelta(days=self.random.uniform(0, 30)),
+            )
+
+    def generation_rows(self, kind):
+        """(generation, credit hold) pairs of one kind, in time order"""
+        model, count, tools = (
+            (VideoGeneration, self.videos, self.video_tools) if kind == 'video'
+            else (ImageGeneration, self.images, self.image_tools)
+        )
+        first = self.first_ids[model]
+        for index in range(count):
+            fraction = index / max(1, count)
+            created = self._time_at(fraction)
+            user_id = self._user_at(created)
+            tool, config = self.random.choice(tools)
+            status, hold_status = self._status()
+            generation_id = first + index
+            request_id = str(uuid.UUID(int=self.random.getrandbits(128)))
+            finished = created + timedelta(seconds=self.random.uniform(5, 240 if kind == 'video' else 40))
+            extension = 'mp4' if kind == 'video' else 'png'
+
+            fields = {
+                'id': generation_id,
+                'user_id': user_id,
+                'prompt': self._prompt(),
+                'tool': tool,
+                'model_version_id': GenerationModelVersion.resolve(kind, tool, config['model']),
+                'credits_used': config['credits'],
+                'status': status,
+                'fal_request_id': request_id if status != 'pending' else None,
+                'error_message': 'FalClientHTTPError: Simulated generation failure' if status == 'failed' else None,
+                'created_at': created,
+                'updated_at': finished if status in ('completed', 'failed') else created,
+            }
+            if status == 'completed':
+                url = f'https://synthetic.invalid/files/{request_id}.{extension}'
+                fields['video_url' if kind == 'video' else 'image_url'] = url
+                if self.random.random() < 0.7:
+                    fields['media_path'] = f'generations/{kind}s/{generation_id}.{extension}'
+                    fields['thumbnail_path'] = f'thumbnails/{kind}s/{generation_id}.webp'
+            hold = CreditHold(
+                id=self.next_hold_id,
+                user_id=user_id,
+                transaction_type=kind,
+                video_generation_id=generation_id if kind == 'video' else None,
+                image_generation_id=generation_id if kind == 'image' else None,
+                credits_held=config['credits'],
+                status=hold_status,
+                created_at=created,
+                confirmed_at=finished if hold_status == 'confirmed' else None,
+                released_at=finished if hold_status == 'released' else None,
+            )
+            self.next_hold_id += 1
+            yield model(**fields), hold
+
+    def purchase_rows(self):
+        """(top-up purchase, payment) pairs in time order"""
+        first = self.first_ids[CreditPurchase]
+        packages = list(TOPUP_PACKAGES.items())
+        for index in range(self.purchases):
+            fraction = index / max(1, self.purchases)
+            created = self._time_at(fraction)
+            package, config = self.random.choices(packages, weights=[1 / (i + 1) for i in range(len(packages))])[0]
+            roll = self.random.random()
+            status = 'completed' if roll < 0.9 else 'failed' if roll < 0.97 else 'pending'
+            purchase_id = first + index
+            payment_id = self.next_payment_id
+            self.next_payment_id += 1
+            user_id = self._user_at(created)
+            completed = created + timedelta(seconds=self.random.uniform(20, 300))
+
+            purchase = CreditPurchase(
+                id=purchase_id,
+                user_id=user_id,
+                package=package,
+                status=status,
+                credits_purchased=config['credits'],
+                bonus_credits=0,
+                total_credits=config['credits'],
+                price=Decimal(str(config['price'])).quantize(CENT),
+                currency=config.get('currency', '₼'),
+                payment_id=str(payment_id),
+                payment_provider='epoint',
+                created_at=created,
+                completed_at=completed if status == 'completed' else None,
+            )
+            yield purchase, self._payment(
+                payment_id, user_id, 'topup', config['price'], status, created, completed,
+                credit_purchase_id=purchase_id,
+            )
+
+    def subscription_rows(self):
+        """(subscription, payment) pairs for a random share of users"""
+        first = self.first_ids[Subscription]
+        plans = [(plan, config) for plan, config in SUBSCRIPTION_PLANS.items() if plan != 'demo']
+        count = int(self.users * self.subscribed_share)
+        chosen = sorted(self.random.sample(range(self.users), count))
+        for index, user_offset in enumerate(chosen):
+            user_id = self.first_ids[User] + user_offset
+            plan, config = self.random.choice(plans)
+            subscription_id = first + index
+            joined_fraction = user_offset / max(1, self.users)
+            started = self._time_at(min(1.0, joined_fraction + self.random.uniform(0, 0.2)), jitter=0)
+            period_days = config.get('period_days', 30)
+            periods = max(0, int((self.now - started).days // period_days))
+            period_start = started + timedelta(days=period_days * periods)
+            period_end = period_start + timedelta(days=period_days)
+            roll = self.random.random()
+            status = 'active' if roll < 0.75 else 'cancelled' if roll < 0.9 else 'expired' if roll < 0.97 else 'past_due'
+            payment_id = self.next_payment_id
+            self.next_payment_id += 1
+
+            subscription = Subscription(
+                id=subscription_id,
+                user_id=user_id,
+                plan=plan,
+                status=status,
+                auto_renew=status == 'active',
+                start_date=started,
+                period_start=period_start,
+                period_end=period_end,
+                next_renewal_date=period_end,
+                cancelled_at=period_start + timedelta(days=1) if status == 'cancelled' else None,
+                last_renewed_at=period_start if periods else None,
+                payment_id=str(payment_id),
+                payment_provider='epoint',
+                created_at=started,
+                updated_at=period_start,
+            )
+            yield subscription, self._payment(
+                payment_id, user_id, 'subscription', config['price'], 'completed', period_start,
+                period_start + timedelta(seconds=90), subscription_id=subscription_id,
+            )
+
+    def _payment(self, payment_id, user_id, payment_type, amount, status, created, completed, **links):
+        return Payment(
+            id=payment_id,
+            user_id=user_id,
+            payment_type=payment_type,
+            status=status,
+            payment_provider='epoint',
+            epoint_transaction_id=f'te{payment_id:012d}' if status != 'pending' else None,
+            created_at=created,
+            processed_at=created + timedelta(seconds=5) if status != 'pending' else None,
+            completed_at=completed if status == 'completed' else None,
+            currency='₼',
+            **self._fees(amount),
+            **links,
+        )
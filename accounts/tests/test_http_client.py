@@ -0,0 +1,180 @@
+"""
+Circuit breaker state changes and retry rules of accounts.http_client.
+The session is mocked, so nothing touches the network;
+`python manage.py check_epoint_client` exercises the same client against a
+local stub server.
+"""
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from urllib3.exceptions import NewConnectionError
+
+from accounts.http_client import CircuitBreaker, CircuitOpenError, PooledHTTPClient
+
+
+def _response(status_code):
+    return mock.Mock(status_code=status_code)
+
+
+def _refused():
+    """The ConnectionError requests raises when nothing listens on the port"""
+    return requests.exceptions.ConnectionError(mock.Mock(reason=NewConnectionError(None, 'refused')))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def open_breaker(self, breaker):
+        for _ in range(breaker.failure_threshold):
+            breaker.before_call()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def expire(self, breaker):
+        breaker.opened_at -= breaker.reset_timeout
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.open_breaker(breaker)
+        self.expire(breaker)
+        self.assertTrue(breaker.before_call())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_trial_success_closes(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.open_breaker(breaker)
+        self.expire(breaker)
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(breaker.before_call())
+
+    def test_trial_failure_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        self.open_breaker(breaker)
+        self.expire(breaker)
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_abandoned_trial_lets_the_next_call_try(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        self.open_breaker(breaker)
+        self.expire(breaker)
+        breaker.before_call()
+        breaker.abandon_trial()
+        self.assertTrue(breaker.before_call())
+
+
+class PooledHTTPClientTests(SimpleTestCase):
+
+    def make_client(self, **kwargs):
+        options = {'max_retries': 2, 'backoff_factor': 0, 'failure_threshold': 5, 'reset_timeout': 30, **kwargs}
+        client = PooledHTTPClient('test', 'http://upstream.invalid', **options)
+        self.addCleanup(client.close)
+        return client
+
+    def post(self, client, responses, **kwargs):
+        with mock.patch.object(client.session, 'post', side_effect=responses) as post:
+            try:
+                return client.post('/x', **kwargs), post.call_count
+            except Exception as e:
+                return e, post.call_count
+
+    def test_idempotent_call_retries_gateway_errors(self):
+        client = self.make_client()
+        response, calls = self.post(client, [_response(503), _response(502), _response(200)], idempotent=True)
+        self.assertEqual((response.status_code, calls), (200, 3))
+        self.assertEqual(client.metrics()['retries'], 2)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(client.breaker.failures, 0)
+
+    def test_retries_stop_at_max_retries(self):
+        client = self.make_client()
+        response, calls = self.post(client, [_response(503)] * 5, idempotent=True)
+        self.assertEqual((response.status_code, calls), (503, 3))
+        self.assertEqual(client.metrics()['errors'], 1)
+        self.assertEqual(client.breaker.failures, 3)
+
+    def test_non_idempotent_call_is_not_retried_after_it_was_sent(self):
+        client = self.make_client()
+        response, calls = self.post(client, [_response(503), _response(200)])
+        self.assertEqual((response.status_code, calls), (503, 1))
+        error, calls = self.post(client, [requests.exceptions.ReadTimeout(), _response(200)])
+        self.assertIsInstance(error, requests.exceptions.ReadTimeout)
+        self.assertEqual(calls, 1)
+
+    def test_unsent_request_is_retried_even_when_not_idempotent(self):
+        client = self.make_client()
+        response, calls = self.post(client, [_refused(), _response(200)])
+        self.assertEqual((response.status_code, calls), (200, 2))
+
+    def test_every_5xx_counts_as_a_breaker_failure(self):
+        client = self.make_client(failure_threshold=2)
+        response, calls = self.post(client, [_response(500)] * 2, idempotent=True)
+        self.assertEqual((response.status_code, calls), (500, 1))
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+        self.post(client, [_response(500)])
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(client.metrics()['errors'], 2)
+
+    def test_failure_statuses_are_configurable(self):
+        client = self.make_client(failure_threshold=1, failure_statuses={503})
+        self.post(client, [_response(500)])
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+        self.post(client, [_response(503)])
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_4xx_does_not_trip_the_breaker(self):
+        client = self.make_client(failure_threshold=1)
+        response, _ = self.post(client, [_response(400)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_breaker_rejects_without_calling_upstream(self):
+        client = self.make_client(failure_threshold=1)
+        self.post(client, [_response(503)])
+        error, calls = self.post(client, [_response(200)])
+        self.assertIsInstance(error, CircuitOpenError)
+        self.assertEqual(calls, 0)
+        self.assertEqual(client.metrics()['rejected_open_circuit'], 1)
+
+    def test_breaker_opened_mid_retry_reports_the_upstream_error(self):
+        client = self.make_client(failure_threshold=1)
+        error, calls = self.post(client, [requests.exceptions.ReadTimeout(), _response(200)], idempotent=True)
+        self.assertIsInstance(error, requests.exceptions.ReadTimeout)
+        self.assertNotIsInstance(error, CircuitOpenError)
+        self.assertEqual(calls, 1)
+        response, calls = self.post(client, [_response(504)], idempotent=True)
+        self.assertIsInstance(response, CircuitOpenError)
+
+    def test_local_error_during_trial_does_not_wedge_the_breaker(self):
+        client = self.make_client(failure_threshold=1)
+        self.post(client, [_response(503)])
+        client.breaker.opened_at -= client.breaker.reset_timeout
+        error, _ = self.post(client, [RuntimeError('bug')])
+        self.assertIsInstance(error, RuntimeError)
+        response, calls = self.post(client, [_response(200)])
+        self.assertEqual((response.status_code, calls), (200, 1))
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
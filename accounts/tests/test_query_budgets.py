@@ -0,0 +1,69 @@
+"""
+Query budgets (accounts/query_budgets.py) as tests: every budgeted URL name
+runs its scenario and must issue exactly the budgeted number of queries, so
+both regressions and unrecorded improvements fail until BUDGETS is updated.
+`python manage.py check_query_budgets` stays the diagnostic that prints the
+queries and their callers.
+"""
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts import query_budgets
+from accounts.models import GenerationModelVersion
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        environment = query_budgets.budget_environment()
+        environment.__enter__()
+        cls.addClassCleanup(environment.__exit__, None, None, None)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        # The model version cache fills on commit; the scenarios measure that warm state
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.fixture = query_budgets.BudgetFixture()
+        cls.addClassCleanup(GenerationModelVersion._by_key.clear)
+        cls.addClassCleanup(GenerationModelVersion._by_id.clear)
+
+    @contextmanager
+    def assertNumQueries(self, num):
+        """
+        TestCase.assertNumQueries without the SAVEPOINT statements the test
+        transaction adds around nested atomic blocks (the budgets leave them out too)
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(query_budgets._IGNORED_PREFIXES)
+        ]
+        self.assertEqual(len(queries), num, '\n'.join([f'{len(queries)} queries executed, {num} expected'] + queries))
+
+    def test_every_url_has_a_budget_or_is_skipped(self):
+        for name in query_budgets.url_names():
+            with self.subTest(name):
+                if name in query_budgets.SKIPPED:
+                    continue
+                self.assertIsNotNone(query_budgets.BUDGETS.get(name))
+                self.assertIn(name, query_budgets.SCENARIOS)
+
+    def test_budgeted_views(self):
+        client = Client(HTTP_HOST='localhost')
+        for name, budget in query_budgets.BUDGETS.items():
+            if budget is None:
+                continue
+            with self.subTest(name), transaction.atomic():
+                spec = query_budgets.SCENARIOS[name](self.fixture)
+                with self.assertNumQueries(budget['queries']):
+                    response = query_budgets._request(client, self.fixture, spec, name)
+                self.assertEqual(response.status_code, spec.get('expect', 200))
+                if hasattr(response, 'close'):
+                    response.close()
+                transaction.set_rollback(True)
@@ -0,0 +1,21 @@
+"""
+Index coverage (accounts/query_plans.py) as tests: each hot query shape must
+be able to use the index it was given. `python manage.py check_query_plans
+--verbose` prints the plans.
+"""
+from django.test import TestCase
+
+from accounts import query_plans
+
+
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_their_indexes(self):
+        results = list(query_plans.check_plans())
+        self.assertEqual([result['name'] for result in results], query_plans.names())
+        for result in results:
+            with self.subTest(result['name']):
+                self.assertTrue(
+                    result['uses_index'],
+                    f"{result['index']} not used:\n{result['plan']}",
+                )
@@ -0,0 +1,134 @@
+"""
+Thumbnail Service
+Produces small WebP thumbnails (images) and poster frames (videos) for
+gallery listings. Resizing runs in a process pool so it never competes
+with request workers for the GIL.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils import timezone
+
+from .imaging import render_image_thumbnail, render_video_poster
+from .media_service import MediaMirrorService, MediaBlobService
+from .models import VideoGeneration, ImageGeneration
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailService:
+    """
+    Post-completion stage that renders gallery thumbnails
+    """
+
+    # Configuration from Django settings
+    ENABLED = getattr(settings, 'THUMBNAIL_ENABLED', True)
+    SIZE = getattr(settings, 'THUMBNAIL_SIZE', 384)  # Longest edge in pixels
+    QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 75)
+    WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    TIMEOUT = getattr(settings, 'THUMBNAIL_TIMEOUT', 120)  # Seconds per render
+    FFMPEG_BINARY = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def get_pool():
+        """
+        Lazily create the shared process pool.
+        'spawn' keeps workers independent of the parent's threads and DB connections.
+        """
+        with ThumbnailService._pool_lock:
+            if ThumbnailService._pool is None:
+                ThumbnailService._pool = ProcessPoolExecutor(
+                    max_workers=ThumbnailService.WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return ThumbnailService._pool
+
+    @staticmethod
+    def _open_source(generation):
+        """
+        Return (local_path, temp_file) for the generation's media.
+        Uses the mirrored file directly when the storage is on local disk,
+        otherwise streams it to a temporary file (caller closes temp_file).
+        """
+        url_field, _ = MediaMirrorService.MEDIA_FIELDS[type(generation)]
+
+        if generation.media_path:
+            storage = MediaMirrorService.get_storage()
+            try:
+                return storage.path(generation.media_path), None
+            except NotImplementedError:
+                # Remote storage backend - copy to a local temp file
+                temp_file = tempfile.NamedTemporaryFile(suffix='.src')
+                with storage.open(generation.media_path, 'rb') as source:
+                    shutil.copyfileobj(source, temp_file, MediaMirrorService.CHUNK_SIZE)
+                temp_file.flush()
+                return temp_file.name, temp_file
+
+        temp_file, _, _, _ = MediaMirrorService.download_to_tempfile(getattr(generation, url_field))
+        return temp_file.name, temp_file
+
+    @staticmethod
+    def generate(generation):
+        """
+        Render and store the thumbnail for a completed generation.
+
+        Returns:
+            True if a thumbnail was written, False if there was nothing to do
+        """
+        model = type(generation)
+        url_field, folder = MediaMirrorService.MEDIA_FIELDS[model]
+
+        if generation.status != 'completed' or generation.thumbnail_path:
+            return False
+        if not generation.media_path and not getattr(generation, url_field):
+            return False
+
+        render = render_video_poster if model is VideoGeneration else render_image_thumbnail
+        render_args = (ThumbnailService.SIZE, ThumbnailService.QUALITY)
+        if model is VideoGeneration:
+            render_args += (ThumbnailService.FFMPEG_BINARY,)
+
+        src_path, src_temp = ThumbnailService._open_source(generation)
+        fd, dest_path = tempfile.mkstemp(suffix='.webp')
+        os.close(fd)
+        try:
+            try:
+                future = ThumbnailService.get_pool().submit(render, src_path, dest_path, *render_args)
+                future.result(timeout=ThumbnailService.TIMEOUT)
+            except BrokenProcessPool:
+                # A worker died (OOM, segfault in a codec) - replace the pool for the next job
+                with ThumbnailService._pool_lock:
+                    ThumbnailService._pool = None
+                raise
+
+            with open(dest_path, 'rb') as thumb:
+                sha256, size = MediaBlobService.hash_file(thumb)
+                blob = MediaBlobService.store(thumb, sha256, size, '.webp', 'image/webp')
+        finally:
+            if src_temp is not None:
+                src_temp.close()
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+
+        updated = model.objects.filter(pk=generation.pk, thumbnail_blob__isnull=True).update(
+            thumbnail_path=blob.path,
+            thumbnail_blob=blob,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            MediaBlobService.release(blob.pk)
+            return False
+        generation.thumbnail_path = blob.path
+        generation.thumbnail_blob = blob
+        logger.info(f"Thumbnail generated - {model.__name__} ID: {generation.pk}, Path: {blob.path}")
+        return True
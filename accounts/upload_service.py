@@ -0,0 +1,133 @@
+"""
+Reference Image Upload Service
+Streams image-to-video reference images to storage so they never travel
+inline (base64) through the generate JSON body.
+"""
+import hmac
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.utils.crypto import salted_hmac
+
+from .media_service import MediaBlobService
+from .media_serving import SignedMediaService
+from .models import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = 'blob:'
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Aborts a multipart upload as soon as a file exceeds max_bytes,
+    before the rest of the body is read. Must run first in upload_handlers.
+    """
+
+    def __init__(self, max_bytes, request=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class ReferenceImageService:
+    """
+    Stores uploaded reference images content-addressed and resolves handles
+    """
+
+    # Configuration from Django settings
+    MAX_BYTES = getattr(settings, 'REFERENCE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)  # 10 MB
+    URL_TTL = getattr(settings, 'REFERENCE_IMAGE_URL_TTL', 24 * 3600)  # fal may fetch it much later
+    ALLOWED_FORMATS = {
+        'JPEG': ('.jpg', 'image/jpeg'),
+        'PNG': ('.png', 'image/png'),
+        'WEBP': ('.webp', 'image/webp'),
+    }
+    SALT = 'accounts.upload_service'
+
+    @staticmethod
+    def save_upload(upload):
+        """
+        Validate and store an uploaded image.
+
+        Args:
+            upload: UploadedFile (on disk when above FILE_UPLOAD_MAX_MEMORY_SIZE)
+
+        Returns:
+            MediaBlob instance
+
+        Raises:
+            ValueError: If the file is too large or not a supported image
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        if upload.size > ReferenceImageService.MAX_BYTES:
+            raise ValueError(f"Image too large. Maximum size is {ReferenceImageService.MAX_BYTES} bytes")
+
+        # Only reads the header - cheap even for large files
+        try:
+            with Image.open(upload) as img:
+                image_format = img.format
+                img.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise ValueError("Uploaded file is not a valid image")
+
+        if image_format not in ReferenceImageService.ALLOWED_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}. Use JPEG, PNG or WEBP")
+        ext, content_type = ReferenceImageService.ALLOWED_FORMATS[image_format]
+
+        sha256, size = MediaBlobService.hash_file(upload)
+        blob = MediaBlobService.store(upload, sha256, size, ext, content_type, acquire=False)
+
+        logger.info(f"Reference image stored - SHA256: {sha256[:12]}, Size: {size}, Name: {os.path.basename(upload.name or '')}")
+        return blob
+
+    @staticmethod
+    def _signature(sha256, user_id):
+        return salted_hmac(ReferenceImageService.SALT, f"{sha256}:{user_id}", algorithm='sha256').hexdigest()
+
+    @staticmethod
+    def build_handle(blob, user):
+        """
+        Handle for the uploader only: 'blob:<sha256>.<signature>', the signature binding
+        it to user. Other blobs (mirrored results, thumbnails) never get one.
+        """
+        return f"{HANDLE_PREFIX}{blob.sha256}.{ReferenceImageService._signature(blob.sha256, user.pk)}"
+
+    @staticmethod
+    def is_handle(value):
+        return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+    @staticmethod
+    def resolve_handle(handle, user):
+        """
+        Look up the blob behind an upload handle issued to user.
+
+        Raises:
+            ValueError: If the handle is unknown or was issued to someone else
+        """
+        sha256, _, signature = handle[len(HANDLE_PREFIX):].partition('.')
+        if not signature or not hmac.compare_digest(ReferenceImageService._signature(sha256, user.pk), signature):
+            raise ValueError("Reference image not found. Please upload it again")
+        blob = MediaBlob.objects.filter(sha256=sha256).first()
+        if blob is None:
+            raise ValueError("Reference image not found. Please upload it again")
+        return blob
+
+    @staticmethod
+    def build_url(blob):
+        """Signed URL fal.ai can fetch the image from"""
+        return SignedMediaService.build_url(blob.path, ttl=ReferenceImageService.URL_TTL)
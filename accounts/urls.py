@@ -10,6 +10,7 @@ from .views import (
     VideoGenerationCreateView,
     VideoGenerationListView,
     VideoGenerationDetailView,
+    ReferenceImageUploadView,
     ImageGenerationCreateView,
     ImageGenerationListView,
     ImageGenerationDetailView,
@@ -26,6 +27,9 @@ from .views import (
     PaymentSuccessView,
     PaymentErrorView,
     PaymentWebhookView,
+    EPointClientMetricsView,
+    GenerationLatencyStatsView,
+    SignedMediaView,
 )
 
 urlpatterns = [
@@ -44,6 +48,7 @@ urlpatterns = [
     path('videos/generate/', VideoGenerationCreateView.as_view(), name='video-generate'),
     path('videos/', VideoGenerationListView.as_view(), name='video-list'),
     path('videos/<int:pk>/', VideoGenerationDetailView.as_view(), name='video-detail'),
+    path('videos/reference-image/', ReferenceImageUploadView.as_view(), name='video-reference-image'),
     
     # Image generation endpoints
     path('images/generate/', ImageGenerationCreateView.as_view(), name='image-generate'),
@@ -72,4 +77,11 @@ urlpatterns = [
     path('payment/success/', PaymentSuccessView.as_view(), name='payment-success'),
     path('payment/error/', PaymentErrorView.as_view(), name='payment-error'),
     path('payment/webhook/', PaymentWebhookView.as_view(), name='payment-webhook'),
+    path('payment/epoint/metrics/', EPointClientMetricsView.as_view(), name='epoint-client-metrics'),
+    
+    # fal.ai latency per tool (staff)
+    path('stats/generation-latency/', GenerationLatencyStatsView.as_view(), name='generation-latency-stats'),
+    
+    # Mirrored media (signed, short-lived URLs)
+    path('media/<path:name>', SignedMediaView.as_view(), name='media-serve'),
 ]
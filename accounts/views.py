@@ -1,12 +1,17 @@
 import logging
-import requests
+import mimetypes
+from datetime import date
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.views import View
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import (
     UserRegisterSerializer, 
@@ -17,9 +22,11 @@ from .serializers import (
     ImageGenerationCreateSerializer,
 )
 from .services import VideoGenerationService, ImageGenerationService, SubscriptionService, TopUpService
-from .models import VideoGeneration, ImageGeneration, Subscription, CreditPurchase
+from .models import VideoGeneration, ImageGeneration, Subscription, CreditPurchase, GenerationArchive
 from .subscription_service import SubscriptionService
 from .subscription_constants import SUBSCRIPTION_PLANS
+from .server_timing import track
+from .generation_archive import GenerationArchiveService, HistoryWithArchive
 
 logger = logging.getLogger(__name__)
 
@@ -103,12 +110,15 @@ class GoogleLoginView(APIView):
             )
 
         try:
+            import requests  # Only this view needs it; keep it off the import path of every worker
+
             # Verify token with Google
-            resp = requests.get(
-                'https://oauth2.googleapis.com/tokeninfo',
-                params={'id_token': id_token},
-                timeout=5,
-            )
+            with track('google'):
+                resp = requests.get(
+                    'https://oauth2.googleapis.com/tokeninfo',
+                    params={'id_token': id_token},
+                    timeout=5,
+                )
             if resp.status_code != 200:
                 logger.warning('Google token verification failed: %s', resp.text)
                 return Response(
@@ -243,9 +253,9 @@ class VideoGenerationCreateView(APIView):
         
         prompt = serializer.validated_data['prompt']
         tool = serializer.validated_data['tool']
-        user_email = request.user.email
+        user_id = request.user.id
         
-        logger.info(f"Video generation request - User: {user_email}, Tool: {tool}, Prompt: {prompt[:50]}...")
+        logger.debug("Video generation request - User ID: %s, Tool: %s, Prompt length: %s", user_id, tool, len(prompt))
         
         try:
             options = serializer.validated_data.get('options', {})
@@ -256,7 +266,7 @@ class VideoGenerationCreateView(APIView):
                 options=options
             )
             
-            logger.info(f"Video generation successful - User: {user_email}, Video ID: {video_gen.id}")
+            logger.debug("Video generation successful - User ID: %s, Video ID: %s", user_id, video_gen.id)
             
             return Response(
                 VideoGenerationSerializer(video_gen).data,
@@ -265,7 +275,7 @@ class VideoGenerationCreateView(APIView):
         
         except ValueError as e:
             error_msg = str(e)
-            logger.warning(f"Video generation validation error - User: {user_email}, Error: {error_msg}")
+            logger.warning("Video generation validation error - User ID: %s, Error: %s", user_id, error_msg)
             
             # Check if it's an insufficient credits error
             if "Insufficient credits" in error_msg:
@@ -291,8 +301,8 @@ class VideoGenerationCreateView(APIView):
             error_message = str(e)
             error_type = type(e).__name__
             logger.error(
-                f"Video generation failed - User: {user_email}, Tool: {tool}, "
-                f"Error Type: {error_type}, Error: {error_message}",
+                "Video generation failed - User ID: %s, Tool: %s, Error Type: %s, Error: %s",
+                user_id, tool, error_type, error_message,
                 exc_info=True
             )
             return Response(
@@ -305,17 +315,115 @@ class VideoGenerationCreateView(APIView):
             )
 
 
-class VideoGenerationListView(generics.ListAPIView):
+class ReferenceImageUploadView(APIView):
+    """
+    Upload a reference image for image-to-video tools (multipart, field 'image').
+    Returns a handle to pass as options.referenceImage to videos/generate/.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        from .upload_service import ReferenceImageService, MaxSizeUploadHandler
+        
+        max_bytes = ReferenceImageService.MAX_BYTES
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if content_length > max_bytes + 64 * 1024:  # Allow for multipart framing
+            return Response(
+                {'error': f'Image too large. Maximum size is {max_bytes} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        # Django's documented "modifying upload handlers on the fly": DRF proxies upload_handlers to
+        # the HttpRequest and parses lazily, and JWT auth reads only headers, so the body is still unread here
+        size_guard = MaxSizeUploadHandler(max_bytes)
+        request.upload_handlers.insert(0, size_guard)
+        
+        upload = request.FILES.get('image')
+        if size_guard.exceeded:
+            return Response(
+                {'error': f'Image too large. Maximum size is {max_bytes} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        if not upload:
+            return Response(
+                {'error': 'image file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            blob = ReferenceImageService.save_upload(upload)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Reference image upload failed - User: {request.user.email}, Error: {str(e)}", exc_info=True)
+            return Response(
+                {'error': 'Reference image upload failed'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response({
+            'handle': ReferenceImageService.build_handle(blob, request.user),
+            'url': ReferenceImageService.build_url(blob),
+            'size': blob.size,
+            'content_type': blob.content_type,
+        }, status=status.HTTP_201_CREATED)
+
+
+class GenerationHistoryMixin:
+    """
+    Generation history across the live tables and the cold archive
+    (accounts.generation_archive). ?month=YYYY-MM limits the list to one
+    month, which on PostgreSQL only touches that month's partition.
+    """
+    archive_kind = None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        month = self.request.query_params.get('month')
+        if not month:
+            return HistoryWithArchive(queryset, self.archive_kind, self.request.user)
+        try:
+            year, number = (int(part) for part in month.split('-'))
+            start, end = GenerationArchiveService.month_range(date(year, number, 1))
+        except ValueError:
+            raise ValidationError({'month': 'Expected YYYY-MM.'})
+        if GenerationArchive.objects.filter(kind=self.archive_kind, month=start.date()).exists():
+            segments = GenerationArchiveService.user_segments(self.archive_kind, self.request.user, archive__month=start.date())
+            return [instance for segment in segments for instance in GenerationArchiveService.iter_rows(self.archive_kind, segment)]
+        return queryset.filter(created_at__gte=start, created_at__lt=end)
+
+
+class ArchivedGenerationMixin:
+    """Detail views: a generation that is no longer in the database is read from the archive"""
+    archive_kind = None
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            instance = GenerationArchiveService.get(self.archive_kind, self.request.user, int(self.kwargs['pk']))
+            if instance is None:
+                raise
+            return instance
+
+
+class VideoGenerationListView(GenerationHistoryMixin, generics.ListAPIView):
     serializer_class = VideoGenerationSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'video'
     
     def get_queryset(self):
         return VideoGeneration.objects.filter(user=self.request.user)
 
 
-class VideoGenerationDetailView(generics.RetrieveAPIView):
+class VideoGenerationDetailView(ArchivedGenerationMixin, generics.RetrieveAPIView):
     serializer_class = VideoGenerationSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'video'
     
     def get_queryset(self):
         return VideoGeneration.objects.filter(user=self.request.user)
@@ -330,9 +438,9 @@ class ImageGenerationCreateView(APIView):
         
         prompt = serializer.validated_data['prompt']
         tool = serializer.validated_data['tool']
-        user_email = request.user.email
+        user_id = request.user.id
         
-        logger.info(f"Image generation request - User: {user_email}, Tool: {tool}, Prompt: {prompt[:50]}...")
+        logger.debug("Image generation request - User ID: %s, Tool: %s, Prompt length: %s", user_id, tool, len(prompt))
         
         try:
             options = serializer.validated_data.get('options', {})
@@ -343,7 +451,7 @@ class ImageGenerationCreateView(APIView):
                 options=options
             )
             
-            logger.info(f"Image generation successful - User: {user_email}, Image ID: {image_gen.id}")
+            logger.debug("Image generation successful - User ID: %s, Image ID: %s", user_id, image_gen.id)
             
             return Response(
                 ImageGenerationSerializer(image_gen).data,
@@ -352,7 +460,7 @@ class ImageGenerationCreateView(APIView):
         
         except ValueError as e:
             error_msg = str(e)
-            logger.warning(f"Image generation validation error - User: {user_email}, Error: {error_msg}")
+            logger.warning("Image generation validation error - User ID: %s, Error: %s", user_id, error_msg)
             
             # Check if it's an insufficient credits error
             if "Insufficient credits" in error_msg:
@@ -378,8 +486,8 @@ class ImageGenerationCreateView(APIView):
             error_message = str(e)
             error_type = type(e).__name__
             logger.error(
-                f"Image generation failed - User: {user_email}, Tool: {tool}, "
-                f"Error Type: {error_type}, Error: {error_message}",
+                "Image generation failed - User ID: %s, Tool: %s, Error Type: %s, Error: %s",
+                user_id, tool, error_type, error_message,
                 exc_info=True
             )
             return Response(
@@ -392,17 +500,19 @@ class ImageGenerationCreateView(APIView):
             )
 
 
-class ImageGenerationListView(generics.ListAPIView):
+class ImageGenerationListView(GenerationHistoryMixin, generics.ListAPIView):
     serializer_class = ImageGenerationSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'image'
     
     def get_queryset(self):
         return ImageGeneration.objects.filter(user=self.request.user)
 
 
-class ImageGenerationDetailView(generics.RetrieveAPIView):
+class ImageGenerationDetailView(ArchivedGenerationMixin, generics.RetrieveAPIView):
     serializer_class = ImageGenerationSerializer
     permission_classes = [IsAuthenticated]
+    archive_kind = 'image'
     
     def get_queryset(self):
         return ImageGeneration.objects.filter(user=self.request.user)
@@ -867,7 +977,11 @@ class PaymentErrorView(APIView):
 
 
 class PaymentWebhookView(APIView):
-    """Handle E-point webhook notifications (result callback)"""
+    """
+    Handle E-point webhook notifications (result callback).
+    Verifies and stores the callback, then acks; the payment is updated by
+    PaymentWebhookService. Repeated deliveries are dropped by a unique key.
+    """
     permission_classes = [AllowAny]
     
     def post(self, request):
@@ -876,8 +990,8 @@ class PaymentWebhookView(APIView):
         E-point sends 'data' (base64 encoded) and 'signature' parameters via POST
         as per documentation page 7 (Callback funksiyasının icra edilməsi)
         """
-        from .payment_service import PaymentService, EPointService
-        from .models import Payment
+        from .payment_service import EPointService
+        from .webhook_service import PaymentWebhookService
         
         try:
             # Get webhook parameters (data and signature from E-point)
@@ -903,54 +1017,25 @@ class PaymentWebhookView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Get decoded webhook data
+            # Store the verified payload and ack; PaymentWebhookService applies it off-request
             webhook_data = result.get('data', {})
-            transaction_id = webhook_data.get('transaction')  # E-point uses 'transaction' not 'transaction_id'
-            payment_status = webhook_data.get('status')
-            order_id = webhook_data.get('order_id')
-            
-            logger.info(f"Webhook decoded - Order: {order_id}, Transaction: {transaction_id}, Status: {payment_status}")
-            
-            # Find payment by order_id (our Payment ID) or E-point transaction ID
-            payment = None
-            try:
-                # Try to find by order_id first (which is our Payment ID)
-                if order_id:
-                    payment = Payment.objects.get(id=order_id)
-                # Fallback to E-point transaction ID
-                elif transaction_id:
-                    payment = Payment.objects.get(epoint_transaction_id=transaction_id)
-                else:
-                    raise Payment.DoesNotExist
-                    
-            except Payment.DoesNotExist:
-                logger.error(f"Payment not found - Order ID: {order_id}, Transaction: {transaction_id}")
+            if not webhook_data.get('transaction') or not webhook_data.get('status'):
+                logger.error(f"Payment webhook without transaction/status - Fields: {list(webhook_data.keys())}")
                 return Response(
-                    {'error': 'Payment not found'},
-                    status=status.HTTP_404_NOT_FOUND
+                    {'error': 'Invalid webhook data - missing transaction or status'},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
+            event, created = PaymentWebhookService.enqueue(webhook_data)
             
-            # Update payment with E-point transaction ID if not set
-            if transaction_id and not payment.epoint_transaction_id:
-                payment.epoint_transaction_id = transaction_id
-                payment.save()
-            
-            # Complete payment if status is 'success'
-            if payment_status == 'success':
-                PaymentService.complete_payment(payment.id, transaction_id)
-                logger.info(f"Payment completed via webhook - Payment ID: {payment.id}")
-            elif payment_status in ['failed', 'error']:
-                payment.status = 'failed'
-                payment.notes = f"Payment {payment_status} via E-point - {webhook_data.get('message', '')}"
-                payment.save()
-                logger.warning(f"Payment failed via webhook - Payment ID: {payment.id}")
-            else:
-                # Other statuses: new, returned, server_error
-                logger.info(f"Payment status update via webhook - Payment ID: {payment.id}, Status: {payment_status}")
+            logger.info(
+                f"Webhook queued - Order: {webhook_data.get('order_id')}, "
+                f"Transaction: {webhook_data.get('transaction')}, Status: {webhook_data.get('status')}, "
+                f"Duplicate: {not created}"
+            )
             
             return Response({
                 'success': True,
-                'message': 'Webhook processed',
+                'message': 'Webhook received' if created else 'Duplicate webhook ignored',
             })
             
         except Exception as e:
@@ -958,4 +1043,125 @@ class PaymentWebhookView(APIView):
             return Response(
                 {'error': 'Webhook processing failed'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class EPointClientMetricsView(APIView):
+    """Connection pool, retry, circuit breaker and latency metrics of the E-point client (staff only)"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        from .payment_service import EPointService
+        
+        return Response(EPointService.get_client().metrics())
+
+
+class GenerationLatencyStatsView(APIView):
+    """
+    p50/p95 fal.ai queue, inference, overhead and total time per tool (staff only).
+    Reads the hourly rollups kept by `rollup_generation_latency`.
+    Query params: hours (default 24, max 2160), interval (hour|day), kind (video|image), tool.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        from .generation_timing import GenerationLatencyService
+        
+        try:
+            hours = min(int(request.GET.get('hours', 24)), 2160)
+        except ValueError:
+            return Response({'error': 'hours must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        interval = request.GET.get('interval', 'hour')
+        if interval not in ('hour', 'day'):
+            return Response({'error': "interval must be 'hour' or 'day'"}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.GET.get('kind')
+        if kind not in (None, 'video', 'image'):
+            return Response({'error': "kind must be 'video' or 'image'"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(GenerationLatencyService.stats(
+            hours=max(hours, 1), interval=interval, kind=kind, tool=request.GET.get('tool'),
+        ))
+
+
+class SignedMediaView(View):
+    """
+    Serve mirrored media behind short-lived signed URLs.
+    
+    Supports HTTP Range requests for video seeking. When a front proxy is
+    configured (MEDIA_SENDFILE_BACKEND) the transfer is handed off via
+    X-Accel-Redirect / X-Sendfile; otherwise Django streams the file with
+    FileResponse (zero-copy sendfile under WSGI for full-file requests).
+    """
+    
+    def get(self, request, name):
+        from .media_serving import SignedMediaService, RangeFileWrapper
+        from .media_service import MediaMirrorService
+        
+        if not SignedMediaService.verify(name, request.GET.get('e'), request.GET.get('s')):
+            return HttpResponseForbidden('Invalid or expired media URL')
+        
+        storage = MediaMirrorService.get_storage()
+        if not storage.exists(name):
+            raise Http404('Media not found')
+        
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        
+        # Let the front proxy stream the bytes (it handles Range itself)
+        if SignedMediaService.SENDFILE_BACKEND == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = SignedMediaService.ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + name
+        elif SignedMediaService.SENDFILE_BACKEND == 'apache':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = storage.path(name)
+        else:
+            size = storage.size(name)
+            byte_range = SignedMediaService.parse_range(request.META.get('HTTP_RANGE'), size)
+            
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            
+            if byte_range:
+                start, end = byte_range
+                response = FileResponse(
+                    RangeFileWrapper(storage.open(name, 'rb'), start, end),
+                    status=206,
+                    content_type=content_type,
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Content-Length'] = str(end - start + 1)
+            else:
+                response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+                response['Content-Length'] = str(size)
+        
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = f'private, max-age={SignedMediaService.URL_TTL}'
+        return response
+
+
+
+class MetricsView(View):
+    """
+    Prometheus scrape endpoint (see accounts.metrics).
+    
+    The scraper must send METRICS_TOKEN as a Bearer token. Only with
+    DEBUG on and no token may addresses in METRICS_ALLOWED_IPS scrape
+    without one: behind a same-host proxy every request comes from 127.0.0.1.
+    """
+    
+    def get(self, request):
+        import hmac
+        from .metrics import render
+        
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token:
+            received = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(received.encode('utf-8'), token.encode('utf-8')):
+                return HttpResponseForbidden('Invalid metrics token')
+        elif not settings.DEBUG:
+            return HttpResponseForbidden('Metrics need METRICS_TOKEN')
+        elif request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1']):
+            return HttpResponseForbidden('Metrics are not available from this address')
+        
+        return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,175 @@
+"""
+Payment Webhook Service
+E-point callbacks are verified and stored by the webhook view, which acks
+straight away; applying them to payments happens here, off the request.
+Events are dispatched to a small thread pool on commit, and
+`python manage.py process_payment_webhooks` drains anything left over
+(worker restarts, retries after errors).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Payment, PaymentWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentWebhookService:
+    """
+    Queue-and-ack processing of E-point payment callbacks
+    """
+
+    # Configuration from Django settings
+    INLINE_DISPATCH = getattr(settings, 'WEBHOOK_INLINE_DISPATCH', True)  # Hand off to the thread pool on commit
+    DISPATCH_WORKERS = getattr(settings, 'WEBHOOK_DISPATCH_WORKERS', 2)
+    MAX_ATTEMPTS = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 5)
+    RETRY_BACKOFF = getattr(settings, 'WEBHOOK_RETRY_BACKOFF', 30)  # Seconds, doubled per attempt
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def enqueue(webhook_data):
+        """
+        Store a verified callback.
+
+        Returns:
+            (event, created) - created is False for a duplicate delivery
+        """
+        transaction_id = str(webhook_data.get('transaction') or '')
+        status = str(webhook_data.get('status') or '')
+        try:
+            with transaction.atomic():
+                event = PaymentWebhookEvent.objects.create(
+                    transaction_id=transaction_id,
+                    status=status,
+                    order_id=str(webhook_data.get('order_id') or ''),
+                    payload=webhook_data,
+                )
+        except IntegrityError:
+            logger.info(f"Duplicate payment webhook dropped - Transaction: {transaction_id}, Status: {status}")
+            return None, False
+
+        if PaymentWebhookService.INLINE_DISPATCH:
+            transaction.on_commit(lambda: PaymentWebhookService.dispatch(event.pk))
+        return event, True
+
+    @staticmethod
+    def get_executor():
+        """Lazily create the shared webhook executor"""
+        with PaymentWebhookService._executor_lock:
+            if PaymentWebhookService._executor is None:
+                PaymentWebhookService._executor = ThreadPoolExecutor(
+                    max_workers=PaymentWebhookService.DISPATCH_WORKERS,
+                    thread_name_prefix='payment-webhook',
+                )
+            return PaymentWebhookService._executor
+
+    @staticmethod
+    def dispatch(event_id):
+        return PaymentWebhookService.get_executor().submit(PaymentWebhookService._run_job, event_id)
+
+    @staticmethod
+    def _run_job(event_id):
+        """Thread pool entry point; always releases the thread's DB connection"""
+        try:
+            return PaymentWebhookService.process(event_id)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _find_payment(event):
+        """Locate (and lock) the payment by order_id (our Payment ID), else by E-point transaction"""
+        payments = Payment.objects.select_for_update()
+        if event.order_id.isdigit():
+            payment = payments.filter(id=int(event.order_id)).first()
+            if payment:
+                return payment
+        if event.transaction_id:
+            payment = payments.filter(epoint_transaction_id=event.transaction_id).first()
+            if payment:
+                return payment
+        raise ValueError(f"Payment not found - Order ID: {event.order_id}, Transaction: {event.transaction_id}")
+
+    @staticmethod
+    def process(event_id):
+        """
+        Apply one pending event. Several workers may race for the same event;
+        the row lock lets exactly one of them in.
+
+        Returns:
+            True if the event was applied
+        """
+        from .payment_service import PaymentService
+
+        try:
+            with transaction.atomic():
+                event = (
+                    PaymentWebhookEvent.objects.select_for_update(skip_locked=True)
+                    .filter(pk=event_id, state='pending')
+                    .first()
+                )
+                if event is None:
+                    return False
+
+                payment = PaymentWebhookService._find_payment(event)
+                PaymentService.apply_provider_status(
+                    payment, event.status, event.transaction_id or None, event.payload.get('message', '')
+                )
+
+                event.state = 'done'
+                event.attempts += 1
+                event.last_error = None
+                event.processed_at = timezone.now()
+                event.save(update_fields=['state', 'attempts', 'last_error', 'processed_at'])
+
+            logger.info(f"Payment webhook applied - Event ID: {event_id}, Payment ID: {payment.id}, Status: {event.status}")
+            return True
+        except Exception as e:
+            logger.error(f"Payment webhook failed - Event ID: {event_id}, Error: {str(e)}", exc_info=True)
+            PaymentWebhookService._record_failure(event_id, e)
+            return False
+
+    @staticmethod
+    def _record_failure(event_id, error):
+        """Schedule a retry with exponential backoff, or give up after MAX_ATTEMPTS"""
+        with transaction.atomic():
+            event = PaymentWebhookEvent.objects.select_for_update().filter(pk=event_id, state='pending').first()
+            if event is None:
+                return
+            event.attempts += 1
+            event.last_error = f"{type(error).__name__}: {error}"
+            if event.attempts >= PaymentWebhookService.MAX_ATTEMPTS:
+                event.state = 'failed'
+                logger.error(f"Payment webhook gave up - Event ID: {event_id}, Attempts: {event.attempts}")
+            else:
+                delay = PaymentWebhookService.RETRY_BACKOFF * (2 ** (event.attempts - 1))
+                event.available_at = timezone.now() + timedelta(seconds=delay)
+            event.save(update_fields=['attempts', 'last_error', 'state', 'available_at'])
+
+    @staticmethod
+    def process_pending(batch_size=100):
+        """
+        Apply one batch of due events in arrival order.
+
+        Returns:
+            (applied, failed) counts
+        """
+        ids = list(
+            PaymentWebhookEvent.objects.filter(state='pending', available_at__lte=timezone.now())
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        applied = failed = 0
+        for event_id in ids:
+            if PaymentWebhookService.process(event_id):
+                applied += 1
+            else:
+                failed += 1
+        return applied, failed
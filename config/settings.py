@@ -4,6 +4,7 @@ Django settings for config project.
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+import json
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -29,6 +30,13 @@ for ip in common_ips:
 FAL_KEY = config('FAL_KEY', default='')
 os.environ['FAL_KEY'] = FAL_KEY
 
+# Local fal.ai stand-in for load tests (python manage.py run_fal_simulator), e.g. http://127.0.0.1:8903
+# Never set in production. FAL_KEY must still be non-empty; any value works against the simulator.
+FAL_SIMULATOR_URL = config('FAL_SIMULATOR_URL', default='')
+# Per-kind ('video', 'image'), per-tool or per-model latency/error overrides for the simulator,
+# e.g. {"veo": {"run_ms": 20000, "error_rate": 0.05}}
+FAL_SIMULATOR_PROFILES = config('FAL_SIMULATOR_PROFILES', default='{}', cast=json.loads)
+
 # Google OAuth
 GOOGLE_CLIENT_ID = config(
     'GOOGLE_CLIENT_ID',
@@ -40,6 +48,77 @@ EPOINT_TEST_MODE = config('EPOINT_TEST_MODE', default=True, cast=bool)
 EPOINT_API_URL = config('EPOINT_API_URL', default='https://epoint.az/api/1')
 EPOINT_PUBLIC_KEY = config('EPOINT_PUBLIC_KEY', default='')
 EPOINT_SECRET_KEY = config('EPOINT_SECRET_KEY', default='')
+# Outbound E-point HTTP client: keep-alive pool, timeouts, retries, circuit breaker
+EPOINT_CONNECT_TIMEOUT = config('EPOINT_CONNECT_TIMEOUT', default=3.05, cast=float)
+EPOINT_READ_TIMEOUT = config('EPOINT_READ_TIMEOUT', default=15, cast=float)
+EPOINT_MAX_RETRIES = config('EPOINT_MAX_RETRIES', default=2, cast=int)
+EPOINT_POOL_SIZE = config('EPOINT_POOL_SIZE', default=10, cast=int)
+EPOINT_BREAKER_THRESHOLD = config('EPOINT_BREAKER_THRESHOLD', default=5, cast=int)
+EPOINT_BREAKER_RESET = config('EPOINT_BREAKER_RESET', default=30, cast=float)
+# Payment webhooks are stored and acked, then applied by PaymentWebhookService
+WEBHOOK_INLINE_DISPATCH = config('WEBHOOK_INLINE_DISPATCH', default=True, cast=bool)
+WEBHOOK_DISPATCH_WORKERS = config('WEBHOOK_DISPATCH_WORKERS', default=2, cast=int)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=5, cast=int)
+WEBHOOK_RETRY_BACKOFF = config('WEBHOOK_RETRY_BACKOFF', default=30, cast=int)  # Seconds, doubled per attempt
+
+# Media mirroring (copy fal.ai results into our own storage)
+MEDIA_MIRROR_ENABLED = config('MEDIA_MIRROR_ENABLED', default=True, cast=bool)
+MEDIA_MIRROR_STORAGE = config('MEDIA_MIRROR_STORAGE', default='default')  # STORAGES alias
+MEDIA_MIRROR_CHUNK_SIZE = config('MEDIA_MIRROR_CHUNK_SIZE', default=1024 * 1024, cast=int)
+MEDIA_MIRROR_MAX_BYTES = config('MEDIA_MIRROR_MAX_BYTES', default=500 * 1024 * 1024, cast=int)
+MEDIA_MIRROR_MAX_CONCURRENCY = config('MEDIA_MIRROR_MAX_CONCURRENCY', default=4, cast=int)
+MEDIA_BLOB_GC_GRACE_HOURS = config('MEDIA_BLOB_GC_GRACE_HOURS', default=24, cast=int)
+
+# Gallery thumbnails / video poster frames (rendered in a process pool)
+THUMBNAIL_ENABLED = config('THUMBNAIL_ENABLED', default=True, cast=bool)
+THUMBNAIL_SIZE = config('THUMBNAIL_SIZE', default=384, cast=int)
+THUMBNAIL_QUALITY = config('THUMBNAIL_QUALITY', default=75, cast=int)
+THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+
+# Signed media URLs (see accounts.media_serving)
+MEDIA_URL_TTL = config('MEDIA_URL_TTL', default=3600, cast=int)
+MEDIA_SENDFILE_BACKEND = config('MEDIA_SENDFILE_BACKEND', default='')  # '', 'nginx' or 'apache'
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')  # Must be an nginx `internal` location
+
+# Image-to-video reference uploads
+REFERENCE_IMAGE_MAX_BYTES = config('REFERENCE_IMAGE_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+REFERENCE_IMAGE_URL_TTL = config('REFERENCE_IMAGE_URL_TTL', default=24 * 3600, cast=int)
+
+# Prometheus metrics (see accounts.metrics); scraped from /metrics
+METRICS_TOKEN = config('METRICS_TOKEN', default='')  # Bearer token the scraper sends; required unless DEBUG (then empty = IP allow-list)
+METRICS_ALLOWED_IPS_STR = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1')  # DEBUG only
+METRICS_ALLOWED_IPS = [ip.strip() for ip in METRICS_ALLOWED_IPS_STR.split(',')]
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='')  # Shared by gunicorn workers; empty = single process
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+# DB / outbound HTTP / serialization breakdown per request (see accounts.server_timing)
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+SERVER_TIMING_SAMPLE_RATE = config('SERVER_TIMING_SAMPLE_RATE', default=0.0, cast=float)  # Header share for non-staff
+# On-demand profiling (see accounts.profiling): staff send `X-Profile: 1|cprofile|sample`
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)  # Share of all requests profiled
+PROFILING_MODE = config('PROFILING_MODE', default='sample')  # 'sample' (low overhead) or 'cprofile'
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=200, cast=int)
+PROFILING_MAX_BYTES = config('PROFILING_MAX_BYTES', default=200 * 1024 * 1024, cast=int)
+# Slow-query log (see accounts.slow_queries); browse at /admin/slow-queries/
+SLOW_QUERY_ENABLED = config('SLOW_QUERY_ENABLED', default=True, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=float)
+SLOW_QUERY_LOG_SIZE = config('SLOW_QUERY_LOG_SIZE', default=500, cast=int)  # Ring buffer entries per process
+SLOW_QUERY_EXPLAIN = config('SLOW_QUERY_EXPLAIN', default=False, cast=bool)  # Re-run slow SELECTs under EXPLAIN
+SLOW_QUERY_EXPLAIN_INTERVAL = config('SLOW_QUERY_EXPLAIN_INTERVAL', default=300, cast=int)  # Seconds between plans per fingerprint
+# Cold-start budget for `manage.py check_startup_budget` (median import of config.wsgi)
+STARTUP_BUDGET_MS = config('STARTUP_BUDGET_MS', default=1500, cast=float)
+# Monthly generation partitions and cold archive (see accounts.generation_archive)
+GENERATION_ARCHIVE_DIR = config('GENERATION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+GENERATION_ARCHIVE_AFTER_MONTHS = config('GENERATION_ARCHIVE_AFTER_MONTHS', default=12, cast=int)
+GENERATION_PARTITION_MONTHS_AHEAD = config('GENERATION_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+GENERATION_ARCHIVE_RETENTION_MONTHS = config('GENERATION_ARCHIVE_RETENTION_MONTHS', default=0, cast=int)  # 0 keeps archives forever
+# Retention for `manage.py purge_retention` (see accounts.retention); 0 days keeps rows forever
+RETENTION_FAILED_GENERATION_DAYS = config('RETENTION_FAILED_GENERATION_DAYS', default=30, cast=int)
+RETENTION_SETTLED_HOLD_DAYS = config('RETENTION_SETTLED_HOLD_DAYS', default=90, cast=int)
+RETENTION_BATCH_SIZE = config('RETENTION_BATCH_SIZE', default=500, cast=int)
+RETENTION_SLEEP = config('RETENTION_SLEEP', default=0.1, cast=float)  # Seconds between delete batches
 
 # Frontend URL for redirects (user-facing pages)
 FRONTEND_URL = config('FRONTEND_URL', default='https://burlart.az')
@@ -66,6 +145,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.MetricsMiddleware',  # First, so latency covers every other middleware
+    'accounts.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,6 +155,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.ProfilingMiddleware',  # After auth, so staff sessions are known
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -165,6 +247,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'accounts.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -218,6 +304,16 @@ CORS_ALLOW_HEADERS = [
 ]
 
 # Logging configuration
+# Structured logging for the accounts app: JSON by default, 'verbose' for local reading
+LOG_FORMATTER = config('LOG_FORMATTER', default='json')
+
+# Keep-probability per log event (the `event` extra); unlisted events are always kept
+LOG_SAMPLING_RATES = {
+    'generation.request': config('LOG_SAMPLE_GENERATION_REQUEST', default=0.1, cast=float),
+    'generation.submitted': config('LOG_SAMPLE_GENERATION_SUBMITTED', default=0.1, cast=float),
+    'generation.completed': config('LOG_SAMPLE_GENERATION_COMPLETED', default=1.0, cast=float),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -230,12 +326,29 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'accounts.logging_utils.JSONFormatter',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'accounts.logging_utils.SamplingFilter',
+            'rates': LOG_SAMPLING_RATES,
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        # Request threads only enqueue; a listener thread formats and writes
+        'async_console': {
+            '()': 'accounts.logging_utils.AsyncHandler',
+            'target': 'logging.StreamHandler',
+            'maxsize': config('LOG_QUEUE_SIZE', default=10000, cast=int),
+            'formatter': LOG_FORMATTER,
+            'filters': ['sampling'],
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -248,8 +361,8 @@ LOGGING = {
             'propagate': False,
         },
         'accounts': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
+            'handlers': ['async_console'],
+            'level': config('LOG_LEVEL', default='INFO'),
             'propagate': False,
         },
     },
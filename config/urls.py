@@ -3,9 +3,15 @@ URL configuration for config project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from accounts.admin import slow_queries_view
+from accounts.views import MetricsView
 
 urlpatterns = [
+    path('admin/slow-queries/', admin.site.admin_view(slow_queries_view), name='admin-slow-queries'),
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
+# MEDIA_ROOT is never served by path: mirrored results, media blobs and reference uploads are only
+# reachable through SignedMediaView (api/auth/media/...), which hands off to an internal X-Accel location